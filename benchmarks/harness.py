@@ -0,0 +1,203 @@
+"""Timing, result files and baseline comparison shared by the benchmark suites.
+
+Each suite (``summarizer/benchmarks/suite.py`` and
+``flask_app/benchmarks/suite.py``) builds a list of ``Case`` objects and hands
+it to ``main``, which times every case, writes the results as JSON and
+compares them with the suite's stored baseline. A case is a regression when
+its fastest repetition is slower than the baseline's by more than the
+tolerance and by more than a minimum number of milliseconds, after scaling
+the baseline by the speed of the machine it was recorded on. Cases timed
+with fewer repetitions than the minimum are reported but never regress; any
+regression makes the run exit with status 1.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Cases timed fewer times than this are reported but never fail the run
+MIN_REPEAT = 5
+
+
+@dataclass
+class Case:
+    """One timed operation.
+
+    ``setup`` runs untimed before every repetition and its return value is
+    passed to ``run``, so operations that consume their input get a fresh
+    copy each time. Cases dominated by waiting, such as stubbed LLM latency,
+    set ``scaled`` to False so their baseline is not adjusted for the speed
+    of the machine.
+    """
+
+    name: str
+    run: Callable[..., Any]
+    setup: Optional[Callable[[], Tuple]] = None
+    repeat: int = 20
+    warmup: int = 1
+    scaled: bool = True
+
+
+def calibrate(repeat: int = 5) -> float:
+    """Time a fixed pure-Python workload, to compare machines with each other."""
+    rng = random.Random(0)
+    data = [
+        {"id": i, "title": f"Episode {i}", "score": rng.random()} for i in range(20000)
+    ]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json.loads(json.dumps(sorted(data, key=lambda row: row["score"])))
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(case: Case, repeat: Optional[int] = None) -> Dict[str, float]:
+    """Time a case and return its median, p95 and minimum in milliseconds.
+
+    The garbage collector is paused while a repetition runs, as in
+    ``timeit``, so that collections triggered by earlier cases' large heaps
+    do not land in arbitrary repetitions.
+    """
+    timings = []
+    repeat = repeat or case.repeat
+    for iteration in range(case.warmup + repeat):
+        args = case.setup() if case.setup else ()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            case.run(*args)
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        if iteration >= case.warmup:
+            timings.append(elapsed * 1000)
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        "min_ms": round(timings[0], 4),
+        "repeat": repeat,
+        "scaled": case.scaled,
+    }
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    min_delta_ms: float,
+    min_repeat: int = MIN_REPEAT,
+) -> Tuple[List[str], List[str]]:
+    """Return report lines for every compared case and the regressed case names.
+
+    The fastest repetitions are compared, since noise on a shared machine
+    only ever adds time. Cases missing from either side are skipped. The
+    baseline timings of scaled cases are multiplied by the ratio of the two
+    calibration timings. A case timed fewer than ``min_repeat`` times is
+    marked unchecked instead, as its fastest repetition may still be noise.
+    """
+    scale = results["calibration"] / baseline["calibration"]
+    lines, regressions = [], []
+    for name, current in results["cases"].items():
+        previous = baseline["cases"].get(name)
+        if previous is None:
+            continue
+        expected = previous["min_ms"] * (scale if current["scaled"] else 1.0)
+        change = current["min_ms"] / expected - 1 if expected else 0.0
+        slower = change > tolerance and current["min_ms"] - expected > min_delta_ms
+        note = ""
+        if current["repeat"] < min_repeat:
+            note = "  unchecked"
+        elif slower:
+            regressions.append(name)
+            note = "  REGRESSION"
+        lines.append(
+            f"{name:<44} {expected:>10.3f} {current['min_ms']:>10.3f} "
+            f"{change:>+8.1%}{note}"
+        )
+    return lines, regressions
+
+
+def main(cases: List[Case], baseline_path: str, description: str):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--filter", default="", help="Only run cases containing this.")
+    parser.add_argument("--repeat", type=int, help="Repetitions of every case.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument(
+        "--baseline", default=baseline_path, help="Baseline to compare with."
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="Allowed slowdown over the scaled baseline, as a fraction.",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=0.5,
+        help="Slowdowns below this many milliseconds are never regressions.",
+    )
+    parser.add_argument(
+        "--min-repeat",
+        type=int,
+        default=MIN_REPEAT,
+        help="Cases timed fewer times than this are never regressions.",
+    )
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "calibration": calibrate(),
+        "cases": {},
+    }
+    print(f"{'case':<44} {'median ms':>10} {'p95 ms':>10}")
+    for case in cases:
+        if args.filter not in case.name:
+            continue
+        stats = measure(case, args.repeat)
+        results["cases"][case.name] = stats
+        print(f"{case.name:<44} {stats['median_ms']:>10.3f} {stats['p95_ms']:>10.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+            file.write("\n")
+        print(f"Baseline written to {args.baseline}.")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline.")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    lines, regressions = compare(
+        results, baseline, args.tolerance, args.min_delta_ms, args.min_repeat
+    )
+    print(f"\n{'case':<44} {'base min':>10} {'min ms':>10} {'change':>8}")
+    print("\n".join(lines))
+    if regressions:
+        print(
+            f"\n{len(regressions)} cases regressed by more than "
+            f"{args.tolerance:.0%}: {', '.join(regressions)}"
+        )
+        sys.exit(1)
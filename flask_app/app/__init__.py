@@ -1,14 +1,63 @@
 from flask import Flask
+from app.catalog import SummaryCatalog
 from app.config import ProdConfig
+from app.entities import EntityIndex
+from app.fragments import FragmentCache
+from app.metrics import init_metrics
+from app.pack import SummaryPack
+from app.storage import create_storage
+from app.vectors import VectorIndex, create_embedder
 
 
-def create_app(config_object: callable = ProdConfig) -> Flask:
+def create_app(config_object: callable = ProdConfig, overrides: dict = None) -> Flask:
     app = Flask(__name__)
     app.config.from_object(config_object)
+    if overrides:
+        app.config.update(overrides)
+
+    storage = create_storage(app.config)
+    pack = None
+    if app.config["SUMMARY_PACK_PATH"]:
+        pack = SummaryPack(
+            storage, app.config["SUMMARY_PACK_PATH"], ttl=app.config["CATALOG_TTL"]
+        )
+    app.extensions["summary_catalog"] = SummaryCatalog(
+        storage,
+        app.config["SUM_PREFIX"],
+        ttl=app.config["CATALOG_TTL"],
+        max_bytes=app.config["CATALOG_MAX_BYTES"],
+        manifest=app.config["MANIFEST_PATH"],
+        pack=pack,
+    )
+    app.extensions["fragment_cache"] = FragmentCache(
+        app.config["FRAGMENT_CACHE_MAX_BYTES"]
+    )
+    app.extensions["entity_index"] = EntityIndex(
+        storage, app.config["ENTITIES_PATH"], ttl=app.config["CATALOG_TTL"]
+    )
+    # Semantic search is only served with an embedding provider to embed queries
+    embedder = create_embedder(app.config)
+    app.extensions["vector_index"] = None
+    if embedder is not None:
+        app.extensions["vector_index"] = VectorIndex(
+            storage,
+            app.config["EMBEDDINGS_PATH"],
+            embedder,
+            ttl=app.config["CATALOG_TTL"],
+        )
+
+    # Request timings on /metrics and optional per-request profiling
+    if app.config["METRICS_ENABLED"]:
+        init_metrics(app)
 
     # Registering Blueprints
     from app.views import main as main_blueprint
 
     app.register_blueprint(main_blueprint)
 
+    # Pre-rendering for static hosting: flask build-static OUTPUT_DIR
+    from app.static_site import build_static_command
+
+    app.cli.add_command(build_static_command)
+
     return app
@@ -0,0 +1,371 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.metrics import timed
+from app.query import Page, SortedListings, page_of_ranked
+from app.search import SearchIndex
+from app.utils import convert_date
+
+LISTING_KEYS = ("metadata", "topics", "conclusions")
+
+
+class _Entry:
+    __slots__ = ("generation", "size", "listing", "search")
+
+    def __init__(
+        self,
+        generation: str,
+        size: int,
+        listing: Dict[str, Any],
+        search: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.generation = generation
+        self.size = size
+        self.listing = listing
+        self.search = search or {}
+
+
+def search_fields(document: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Extract the quote texts and term names of a summary for the search index."""
+    return {
+        "quotes": [
+            quote.get("quote", "") if isinstance(quote, dict) else str(quote)
+            for quote in document.get("quotes") or []
+        ],
+        "terms": list(document.get("terms") or {}),
+    }
+
+
+def _index_fields(entry: _Entry) -> Dict[str, str]:
+    listing = entry.listing
+    return {
+        "title": (listing.get("metadata") or {}).get("title") or "",
+        "topics": " ".join(listing.get("topics") or []),
+        "conclusions": listing.get("conclusions") or "",
+        "terms": " ".join(entry.search.get("terms", [])),
+        "quotes": " ".join(entry.search.get("quotes", [])),
+    }
+
+
+class SummaryCatalog:
+    """In-memory cache of the summaries stored under a bucket prefix.
+
+    The catalog keeps the fields needed by the listing page for every summary
+    and full documents for the most recently used ones, up to ``max_bytes``.
+    Listing fields come from the manifest written by the summarizer when it
+    exists, and from the summaries themselves otherwise. Once ``ttl`` seconds
+    have passed since the last refresh, the next read triggers a background
+    refresh that only downloads objects whose generation changed, while
+    readers keep being served from the previous snapshot. Titles, topics,
+    conclusions, quotes and terms are kept in a search index that is updated
+    with the summaries that changed, and listings are kept sorted by date and
+    grouped by podcast so that a page is served without scanning them all.
+    Full documents are read from a memory-mapped ``pack`` when it holds the
+    current generation of a summary.
+    """
+
+    def __init__(
+        self,
+        storage,
+        prefix: str,
+        ttl: float = 300,
+        max_bytes: int = 0,
+        manifest: Optional[str] = None,
+        pack=None,
+    ):
+        self.storage = storage
+        self.prefix = prefix
+        self.manifest = manifest
+        self.pack = pack
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: Dict[str, _Entry] = {}
+        self._documents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._document_bytes = 0
+        self._index = SearchIndex()
+        self._sorted = SortedListings([])
+        self._manifest_generation: Optional[str] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._first_load_lock = threading.Lock()
+
+    def _summary_id(self, name: str) -> str:
+        return os.path.splitext(os.path.basename(name))[0]
+
+    def _blob_name(self, summary_id: str) -> str:
+        return f"{self.prefix}{summary_id}.json"
+
+    def _load(self, name: str) -> Dict[str, Any]:
+        with timed("download"):
+            text = self.storage.download_text(name)
+        with timed("json_parse"):
+            return self._normalize(json.loads(text))
+
+    def _remember(self, summary_id: str, document: Dict[str, Any], size: int):
+        """Keep a full document, evicting the least recently used ones."""
+        if self.max_bytes and size > self.max_bytes:
+            return
+        if summary_id in self._documents:
+            self._documents.move_to_end(summary_id)
+            return
+        self._documents[summary_id] = document
+        self._document_bytes += size
+        while self.max_bytes and self._document_bytes > self.max_bytes:
+            evicted_id, _ = self._documents.popitem(last=False)
+            evicted = self._entries.get(evicted_id)
+            self._document_bytes -= evicted.size if evicted else 0
+
+    def _forget(self, summary_id: str):
+        if self._documents.pop(summary_id, None) is not None:
+            self._document_bytes -= self._entries[summary_id].size
+
+    def _normalize(self, listing: Dict[str, Any]) -> Dict[str, Any]:
+        metadata = listing.get("metadata") or {}
+        if "date" in metadata:
+            metadata["date"] = convert_date(metadata["date"])
+        return listing
+
+    def _entries_from_manifest(
+        self, manifest
+    ) -> Tuple[Optional[Dict[str, _Entry]], Dict[str, Any]]:
+        """Build entries from the manifest, or None if it is unchanged."""
+        if manifest.generation == self._manifest_generation:
+            return None, {}
+        with timed("download"):
+            text = self.storage.download_text(manifest.name)
+        entries = {}
+        with timed("json_parse"):
+            for line in text.splitlines():
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                listing = self._normalize({key: row.get(key) for key in LISTING_KEYS})
+                entries[listing["metadata"]["id"]] = _Entry(
+                    str(row.get("generation")),
+                    row.get("size", 0),
+                    listing,
+                    row.get("search"),
+                )
+        return entries, {}
+
+    def _entries_from_listing(self) -> Tuple[Dict[str, _Entry], Dict[str, Any]]:
+        """Build entries by listing the prefix and fetching changed summaries.
+
+        Changed summaries are downloaded concurrently.
+        """
+        with self._lock:
+            known = dict(self._entries)
+
+        entries, changed = {}, []
+        with timed("storage_list"):
+            blobs = self.storage.list_blobs(self.prefix)
+        for blob in blobs:
+            if not blob.name.endswith(".json"):
+                continue
+            summary_id = self._summary_id(blob.name)
+            entry = known.get(summary_id)
+            if entry is None or entry.generation != blob.generation:
+                changed.append(blob)
+            else:
+                entries[summary_id] = entry
+
+        documents = {}
+        with timed("download"):
+            texts = self.storage.download_many(blob.name for blob in changed)
+        for blob in changed:
+            summary_id = self._summary_id(blob.name)
+            with timed("json_parse"):
+                document = self._normalize(json.loads(texts[blob.name]))
+            listing = {key: document.get(key) for key in LISTING_KEYS}
+            entries[summary_id] = _Entry(
+                blob.generation, blob.size, listing, search_fields(document)
+            )
+            documents[summary_id] = document
+        return entries, documents
+
+    def refresh(self):
+        """Synchronise the catalog with storage, fetching only changed objects.
+
+        When a manifest is configured and present it is the only object
+        downloaded; otherwise every summary under the prefix is listed.
+        """
+        with self._refresh_lock:
+            self._refresh()
+
+    def _refresh(self):
+        with timed("storage_list"):
+            manifest = self.storage.stat(self.manifest) if self.manifest else None
+        if manifest is not None:
+            entries, documents = self._entries_from_manifest(manifest)
+        else:
+            entries, documents = self._entries_from_listing()
+
+        if entries is not None:
+            self._replace_entries(entries, documents)
+        with self._lock:
+            self._manifest_generation = manifest.generation if manifest else None
+            self._loaded_at = time.monotonic()
+
+    def _replace_entries(self, entries: Dict[str, _Entry], documents: Dict[str, Any]):
+        """Swap in new entries with a search index and sorted listings for them.
+
+        The index and the listings are built outside the lock, on a copy of
+        the current index, so readers are only held up by the swap itself.
+        Only refresh changes them, under the refresh lock.
+        """
+        with self._lock:
+            previous, index = self._entries, self._index
+        stale = {
+            summary_id
+            for summary_id, entry in previous.items()
+            if summary_id not in entries
+            or entries[summary_id].generation != entry.generation
+        }
+        fresh = [
+            summary_id
+            for summary_id in entries
+            if summary_id in stale or summary_id not in index
+        ]
+
+        if stale or fresh:
+            index = index.copy() if previous else SearchIndex()
+            for summary_id in stale:
+                index.remove(summary_id)
+            index.update(
+                (summary_id, _index_fields(entries[summary_id])) for summary_id in fresh
+            )
+        listings = None
+        if stale or len(entries) != len(previous):
+            listings = SortedListings(entry.listing for entry in entries.values())
+
+        with self._lock:
+            for summary_id in stale:
+                self._forget(summary_id)
+            self._index = index
+            if listings is not None:
+                self._sorted = listings
+            self._entries = entries
+            for summary_id, document in documents.items():
+                self._remember(summary_id, document, entries[summary_id].size)
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None:
+            # Requests arriving during the first load wait for it instead of
+            # each loading the catalog again
+            with self._first_load_lock:
+                if self._loaded_at is None:
+                    self.refresh()
+        elif time.monotonic() - self._loaded_at > self.ttl:
+            if not self._refresh_lock.locked():
+                threading.Thread(target=self._refresh_quietly, daemon=True).start()
+
+    def _refresh_quietly(self):
+        # A refresh already running answers for this one too
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._refresh()
+        except Exception as exc:
+            print(f"Catalog refresh failed: {exc}")
+        finally:
+            self._refresh_lock.release()
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """Return the listing fields of every known summary."""
+        self._ensure_fresh()
+        with self._lock:
+            return [entry.listing for entry in self._entries.values()]
+
+    def listings(self, summary_ids: List[str]) -> List[Dict[str, Any]]:
+        """Return the listing fields of the given summaries that still exist."""
+        self._ensure_fresh()
+        with self._lock:
+            entries = [self._entries.get(summary_id) for summary_id in summary_ids]
+        return [entry.listing for entry in entries if entry is not None]
+
+    def generation(self, summary_id: str) -> Optional[str]:
+        """Return the stored generation of a summary without downloading it."""
+        self._ensure_fresh()
+        with self._lock:
+            entry = self._entries.get(summary_id)
+        return entry.generation if entry is not None else None
+
+    def get(self, summary_id: str) -> Optional[Dict[str, Any]]:
+        """Return the full summary for an ID, or None if it does not exist."""
+        self._ensure_fresh()
+        with self._lock:
+            entry = self._entries.get(summary_id)
+            if entry is None:
+                return None
+            document = self._documents.get(summary_id)
+            if document is not None:
+                self._documents.move_to_end(summary_id)
+                return document
+            generation = entry.generation
+
+        document = None
+        if self.pack is not None:
+            with timed("pack_read"):
+                document = self.pack.get(summary_id, generation)
+        if document is None:
+            document = self._load(self._blob_name(summary_id))
+        else:
+            document = self._normalize(document)
+        with self._lock:
+            entry = self._entries.get(summary_id)
+            if entry is not None and entry.generation == generation:
+                self._remember(summary_id, document, entry.size)
+        return document
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        """Return the listing fields of the summaries matching a query, best first."""
+        self._ensure_fresh()
+        with self._lock:
+            index, entries = self._index, self._entries
+        with timed("filter_sort"):
+            return [entries[summary_id].listing for summary_id in index.search(query)]
+
+    def page(
+        self,
+        query: str = "",
+        podcast: Optional[str] = None,
+        page: int = 1,
+        per_page: int = 10,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        """Return one page of listings for the index route.
+
+        Without a query the listings are the newest first, paged by offset or
+        cursor; with a query they are ranked by relevance and paged by offset.
+        """
+        self._ensure_fresh()
+        if query:
+            with self._lock:
+                index, entries = self._index, self._entries
+            with timed("filter_sort"):
+                ranking = None if podcast else index.ranking(query)
+                if ranking is not None:
+                    start = (max(page, 1) - 1) * per_page
+                    return Page(
+                        [
+                            entries[summary_id].listing
+                            for summary_id in ranking[start : start + per_page]
+                        ],
+                        len(ranking),
+                    )
+                return page_of_ranked(
+                    index.scores(query),
+                    lambda summary_id: entries[summary_id].listing,
+                    podcast,
+                    page,
+                    per_page,
+                )
+        with self._lock:
+            listings = self._sorted
+        with timed("filter_sort"):
+            return listings.page(podcast, page, per_page, cursor)
@@ -1,9 +1,48 @@
+import os
+
+
 class Config:
     DEBUG = False
     TESTING = False
     BUCKET_NAME = "ai-podcast-cards"
     SUM_PREFIX = "summaries/"
+    # JSON-lines listing written by the summarizer, one row per episode
+    MANIFEST_PATH = "manifest.jsonl"
     PODCASTS = ["Dwarkesh Podcast", "Latent Space"]
+    # "gcs" reads from BUCKET_NAME, "local" from the LOCAL_STORAGE_DIR directory
+    STORAGE_BACKEND = "gcs"
+    LOCAL_STORAGE_DIR = None
+    # Maximum number of concurrent downloads, e.g. on a cold catalog load
+    STORAGE_CONCURRENCY = 16
+    # Seconds before the summary catalog is refreshed in the background
+    CATALOG_TTL = 300
+    # Upper bound for full summary documents kept in memory (0 = unbounded)
+    CATALOG_MAX_BYTES = 64 * 1024 * 1024
+    # Seconds browsers and CDNs may serve a summary page without revalidating
+    SUMMARY_MAX_AGE = 3600
+    # Upper bound for rendered summary pages kept in memory (0 = unbounded)
+    FRAGMENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    # Every summary in one file, memory-mapped and read one summary at a time;
+    # summaries missing from it or changed since it was built are read as JSON
+    SUMMARY_PACK_PATH = "summaries.pack"
+    # Topics, terms and people deduplicated across episodes by the summarizer,
+    # behind the /topic/ and /person/ pages
+    ENTITIES_PATH = "entities.json"
+    # Summary vectors written by the summarizer, for semantic search
+    EMBEDDINGS_PATH = "embeddings.npz"
+    # Has to match the summarizer's embeddings provider, model and dimensions
+    EMBEDDING_PROVIDER = "openai"
+    EMBEDDING_MODEL = "text-embedding-3-small"
+    EMBEDDING_DIMENSIONS = 256
+    # /search answers 503 without a key for the "openai" provider
+    OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+    # Request counts and per-stage timings, served unauthenticated on /metrics;
+    # off unless the METRICS_ENABLED environment variable is set to "true"
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "").lower() in ("1", "true")
+    # Run every request under cProfile; needs METRICS_ENABLED
+    PROFILING = False
+    # Directory for one .prof file per request; None prints the top functions
+    PROFILE_DIR = None
 
 
 class ProdConfig(Config):
@@ -13,3 +52,5 @@ class ProdConfig(Config):
 class TestConfig(Config):
     DEBUG = True
     TESTING = True
+    STORAGE_BACKEND = "local"
+    EMBEDDING_PROVIDER = "hashing"
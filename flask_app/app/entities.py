@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from podcast_shared.entities import entity_key
+
+from app.metrics import timed
+
+__all__ = ["EntityIndex", "entity_key"]
+
+
+class EntityIndex:
+    """In-memory copy of the entity index written by the summarizer.
+
+    The index maps every topic, term and person key to its display name, its
+    other spellings and the IDs of its episodes, newest first, so an entity
+    page is a dictionary lookup and a slice. The file is reloaded when its
+    generation changes, checked in the background at most every ``ttl``
+    seconds.
+    """
+
+    def __init__(self, storage, path: str, ttl: float = 300):
+        self.storage = storage
+        self.path = path
+        self.ttl = ttl
+        self._entities: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._generation: Optional[str] = None
+        self._checked_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+        self._first_load_lock = threading.Lock()
+
+    def refresh(self):
+        """Reload the entity index if it changed since the last load."""
+        with timed("storage_list"):
+            blob = self.storage.stat(self.path)
+        generation = blob.generation if blob else None
+        if generation != self._generation:
+            entities = {}
+            if blob is not None:
+                with timed("download"):
+                    entities = json.loads(self.storage.download_text(self.path))[
+                        "entities"
+                    ]
+            # Readers see either the old or the new index, never a mix
+            self._entities, self._generation = entities, generation
+        self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._checked_at is None:
+            with self._first_load_lock:
+                if self._checked_at is None:
+                    self.refresh()
+        elif time.monotonic() - self._checked_at > self.ttl:
+            # Readers keep the current copy while the check runs
+            if not self._refresh_lock.locked():
+                threading.Thread(target=self._refresh_quietly, daemon=True).start()
+
+    def _refresh_quietly(self):
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self.refresh()
+        except Exception as exc:
+            print(f"Entity index refresh failed: {exc}")
+        finally:
+            self._refresh_lock.release()
+
+    def get(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """Return an entity by kind ("topic", "term" or "person") and key."""
+        self._ensure_fresh()
+        return self._entities.get(kind, {}).get(key)
+
+    def keys(self, kind: str) -> List[str]:
+        """Return the keys of every entity of a kind."""
+        self._ensure_fresh()
+        return list(self._entities.get(kind, {}))
@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+
+class FragmentCache:
+    """Thread-safe LRU cache of rendered HTML, bounded by ``max_bytes``.
+
+    Keys include the generation of the summary they were rendered from, so a
+    rewritten summary is rendered afresh and its old fragment ages out.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._fragments: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            html = self._fragments.get(key)
+            if html is not None:
+                self._fragments.move_to_end(key)
+            return html
+
+    def put(self, key: Hashable, html: str):
+        size = len(html.encode("utf-8"))
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._fragments.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.encode("utf-8"))
+            self._fragments[key] = html
+            self._bytes += size
+            while self.max_bytes and self._bytes > self.max_bytes:
+                _, evicted = self._fragments.popitem(last=False)
+                self._bytes -= len(evicted.encode("utf-8"))
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self._bytes = 0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> str:
+        """Return the cached HTML for a key, rendering and storing it if missing."""
+        html = self.get(key)
+        if html is None:
+            html = render()
+            self.put(key, html)
+        return html
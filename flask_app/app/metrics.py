@@ -0,0 +1,223 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from flask import Blueprint, Flask, current_app, g, has_request_context, request
+from werkzeug.middleware.profiler import ProfilerMiddleware
+
+# Parts of a request that are timed separately
+STAGES = ("storage_list", "download", "json_parse", "filter_sort", "render")
+
+# Upper bounds in seconds, as used by the Prometheus client libraries
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(BUCKETS, value)
+        if index < len(BUCKETS):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms of one process.
+
+    Metrics are identified by name and a tuple of label pairs and rendered in
+    the Prometheus text exposition format. Every gunicorn worker keeps its
+    own registry.
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = defaultdict(dict)
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1.0):
+        with self._lock:
+            series = self._counters[name]
+            series[labels] = series.get(labels, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: Labels = ()):
+        with self._lock:
+            series = self._histograms[name]
+            if labels not in series:
+                series[labels] = _Histogram()
+            series[labels].observe(value)
+
+    def counter(self, name: str, labels: Labels = ()) -> float:
+        with self._lock:
+            return self._counters[name].get(labels, 0.0)
+
+    def histogram_count(self, name: str, labels: Labels = ()) -> int:
+        with self._lock:
+            histogram = self._histograms[name].get(labels)
+            return histogram.count if histogram else 0
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + (("le", f"{bound:g}"),)
+                        lines.append(
+                            f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+                        )
+                    inf_labels = labels + (("le", "+Inf"),)
+                    lines.append(
+                        f"{name}_bucket{_format_labels(inf_labels)} {histogram.count}"
+                    )
+                    lines.append(
+                        f"{name}_sum{_format_labels(labels)} {histogram.sum:g}"
+                    )
+                    lines.append(
+                        f"{name}_count{_format_labels(labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Add the time spent in the block to a stage of the current request.
+
+    Outside of a request, or with metrics disabled, the block is not timed,
+    so background catalog refreshes do not count towards any request.
+    """
+    timings = g.get("stage_timings") if has_request_context() else None
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] += time.perf_counter() - started
+
+
+metrics = Blueprint("metrics", __name__)
+
+
+@metrics.route("/metrics")
+def export():
+    registry = current_app.extensions["metrics"]
+    return current_app.response_class(
+        registry.render(), mimetype="text/plain; version=0.0.4"
+    )
+
+
+def _start_request():
+    g.stage_timings = defaultdict(float)
+    g.request_started = time.perf_counter()
+
+
+def _finish_request(response):
+    started = g.pop("request_started", None)
+    timings = g.pop("stage_timings", None)
+    if started is None or request.endpoint == "metrics.export":
+        return response
+
+    registry = current_app.extensions["metrics"]
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    elapsed = time.perf_counter() - started
+    registry.inc(
+        "http_requests_total",
+        (
+            ("endpoint", endpoint),
+            ("method", request.method),
+            ("status", str(response.status_code)),
+        ),
+    )
+    registry.observe(
+        "http_request_duration_seconds", elapsed, (("endpoint", endpoint),)
+    )
+    for stage, seconds in timings.items():
+        registry.observe(
+            "http_request_stage_seconds",
+            seconds,
+            (("endpoint", endpoint), ("stage", stage)),
+        )
+
+    # Per-request breakdown for the browser's developer tools
+    response.headers["Server-Timing"] = ", ".join(
+        [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+        + [f"total;dur={elapsed * 1000:.1f}"]
+    )
+    return response
+
+
+def init_metrics(app: Flask):
+    """Time every request and serve the results on ``/metrics``.
+
+    Each request is counted by endpoint, method and status, and its duration
+    and the time spent in each of ``STAGES`` go into histograms. With
+    ``PROFILING`` every request is also run under cProfile, writing one
+    ``.prof`` file per request to ``PROFILE_DIR`` or printing the slowest
+    functions when no directory is set.
+    """
+    registry = MetricsRegistry()
+    registry.describe("http_requests_total", "Requests by endpoint, method and status.")
+    registry.describe("http_request_duration_seconds", "Time spent handling a request.")
+    registry.describe(
+        "http_request_stage_seconds",
+        "Time spent in storage listing, downloads, JSON parsing, "
+        "filtering and sorting, and template rendering per request.",
+    )
+    app.extensions["metrics"] = registry
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.register_blueprint(metrics)
+
+    if app.config["PROFILING"]:
+        profile_dir = app.config["PROFILE_DIR"]
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        app.wsgi_app = ProfilerMiddleware(
+            app.wsgi_app,
+            stream=None if profile_dir else sys.stdout,
+            restrictions=[30],
+            profile_dir=profile_dir,
+        )
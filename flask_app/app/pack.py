@@ -0,0 +1,135 @@
+import json
+import mmap
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.metrics import timed
+
+# Header of the summarizer's pack format: magic, flags, number of summaries,
+# width of the ID column, a reserved word and the offset of the index
+MAGIC = b"SUMPACK1"
+HEADER = struct.Struct("<8sIIIIQ")
+COMPRESSED = 1
+
+
+class SummaryPack:
+    """Memory-mapped copy of the summary pack written by the summarizer.
+
+    The pack holds every summary as a compact, optionally compressed record
+    followed by a columnar index of IDs, offsets, lengths and generations.
+    It is downloaded to a temporary file once per generation and mapped, so
+    the index columns are numpy views of the mapping, an ID is found with a
+    binary search and only that summary's record is read and decoded. The
+    generation of the pack is checked in the background at most every
+    ``ttl`` seconds.
+    """
+
+    def __init__(self, storage, path: str, ttl: float = 300):
+        self.storage = storage
+        self.path = path
+        self.ttl = ttl
+        self._view = None
+        self._generation: Optional[str] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._first_load_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        view = self._view
+        return len(view[1]) if view else 0
+
+    def _map(self) -> tuple:
+        with tempfile.TemporaryFile() as file:
+            with timed("download"):
+                self.storage.download_to_file(self.path, file)
+            file.flush()
+            # The mapping outlives the file, which is deleted when closed
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, flags, count, width, _, index_offset = HEADER.unpack_from(mapping)
+        if magic != MAGIC:
+            raise RuntimeError(f"{self.path} is not a summary pack")
+        return (
+            mapping,
+            np.frombuffer(mapping, f"S{width}", count, index_offset + 20 * count),
+            np.frombuffer(mapping, "<u8", count, index_offset),
+            np.frombuffer(mapping, "<u4", count, index_offset + 16 * count),
+            np.frombuffer(mapping, "<i8", count, index_offset + 8 * count),
+            bool(flags & COMPRESSED),
+        )
+
+    def refresh(self):
+        """Map the pack again if it changed since the last load.
+
+        A failed attempt counts as a check too, so the pack is not downloaded
+        again before ``ttl`` seconds have passed.
+        """
+        try:
+            with timed("storage_list"):
+                blob = self.storage.stat(self.path)
+            generation = blob.generation if blob else None
+            if generation != self._generation:
+                view = self._map() if blob is not None else None
+                with self._lock:
+                    # Readers still holding the previous view keep its mapping open
+                    self._view, self._generation = view, generation
+        finally:
+            self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._checked_at is None:
+            with self._first_load_lock:
+                if self._checked_at is None:
+                    # Without a pack, summaries are read from storage instead
+                    self._refresh_quietly()
+        elif time.monotonic() - self._checked_at > self.ttl:
+            # Readers keep the current copy while the check runs
+            if not self._refresh_lock.locked():
+                threading.Thread(target=self._refresh_quietly, daemon=True).start()
+
+    def _refresh_quietly(self):
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self.refresh()
+        except Exception as exc:
+            print(f"Summary pack refresh failed: {exc}")
+        finally:
+            self._refresh_lock.release()
+
+    def get(
+        self, summary_id: str, generation: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return a packed summary, or None if it is missing.
+
+        With a ``generation``, a summary packed at another generation is
+        treated as missing.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            view = self._view
+        if view is None:
+            return None
+        mapping, ids, offsets, lengths, generations, compressed = view
+
+        key = summary_id.encode("utf-8")
+        if len(key) > ids.dtype.itemsize:
+            return None
+        position = int(np.searchsorted(ids, key))
+        if position == len(ids) or ids[position] != key:
+            return None
+        if generation is not None and str(generations[position]) != generation:
+            return None
+
+        start = int(offsets[position])
+        record = memoryview(mapping)[start : start + int(lengths[position])]
+        if compressed:
+            record = zlib.decompress(record)
+        return json.loads(str(record, "utf-8"))
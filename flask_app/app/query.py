@@ -0,0 +1,139 @@
+import base64
+import bisect
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.search import rank
+
+Key = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class Page:
+    """One page of listings, the total number of matches and the next cursor."""
+
+    summaries: List[Dict[str, Any]]
+    total: int
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(key: Key) -> str:
+    """Turn the (date, ID) of the last listing on a page into an opaque token."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode()
+
+
+def decode_cursor(cursor: str) -> Key:
+    """Reverse ``encode_cursor``, raising ValueError for malformed tokens."""
+    try:
+        date, summary_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
+    return str(date), str(summary_id)
+
+
+def _key(listing: Dict[str, Any]) -> Key:
+    metadata = listing["metadata"]
+    return metadata.get("date") or "", metadata["id"]
+
+
+class _Group:
+    __slots__ = ("listings", "keys")
+
+    def __init__(self, listings: List[Dict[str, Any]]):
+        # Oldest first, so that cursors can be located with bisect
+        self.listings = listings
+        self.keys = [_key(listing) for listing in listings]
+
+    def page(self, end: int, per_page: int) -> Page:
+        start = max(end - per_page, 0)
+        summaries = self.listings[start:end][::-1]
+        next_cursor = encode_cursor(self.keys[start]) if start > 0 else None
+        return Page(summaries, len(self.listings), next_cursor)
+
+
+class SortedListings:
+    """Listings pre-sorted by normalized date and pre-grouped by podcast.
+
+    Built once per catalog snapshot. Pages are read newest first by offset
+    or by cursor, and only the listings on the requested page are touched.
+    """
+
+    def __init__(self, listings: Iterable[Dict[str, Any]]):
+        ordered = sorted(listings, key=_key)
+        by_podcast: Dict[str, List[Dict[str, Any]]] = {}
+        for listing in ordered:
+            podcast = listing["metadata"].get("podcast") or ""
+            by_podcast.setdefault(podcast, []).append(listing)
+        self._all = _Group(ordered)
+        self._podcasts = {
+            podcast: _Group(group) for podcast, group in by_podcast.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._all.listings)
+
+    def _group(self, podcast: Optional[str]) -> _Group:
+        if not podcast:
+            return self._all
+        return self._podcasts.get(podcast) or _Group([])
+
+    def page(
+        self,
+        podcast: Optional[str] = None,
+        page: int = 1,
+        per_page: int = 10,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        """Return a page of listings, newest first.
+
+        With a ``cursor`` the page starts right after the listing it was
+        created from, which stays stable while new summaries are added;
+        otherwise ``page`` is a 1-based offset.
+        """
+        group = self._group(podcast)
+        if cursor:
+            end = bisect.bisect_left(group.keys, decode_cursor(cursor))
+        else:
+            end = len(group.listings) - (max(page, 1) - 1) * per_page
+        if end <= 0:
+            return Page([], len(group.listings))
+        return group.page(end, per_page)
+
+
+def page_window(current: int, total: int, radius: int = 3) -> List[Optional[int]]:
+    """Page numbers to link around the current page, None marking a gap.
+
+    The first and last pages are always included, so the pagination bar stays
+    the same size however many pages there are.
+    """
+    pages = {1, total} | set(range(current - radius, current + radius + 1))
+    window: List[Optional[int]] = []
+    for number in sorted(page for page in pages if 1 <= page <= total):
+        if window and number - window[-1] > 1:
+            window.append(None)
+        window.append(number)
+    return window
+
+
+def page_of_ranked(
+    scores: Dict[str, float],
+    listing: Callable[[str], Dict[str, Any]],
+    podcast: Optional[str] = None,
+    page: int = 1,
+    per_page: int = 10,
+) -> Page:
+    """Filter search scores by podcast and return one page of the best matches.
+
+    Only the matches up to the end of the page are ranked, and the total is
+    a count of the matches, so a page costs one pass over them.
+    """
+    if podcast:
+        scores = {
+            summary_id: score
+            for summary_id, score in scores.items()
+            if listing(summary_id)["metadata"].get("podcast") == podcast
+        }
+    start = (max(page, 1) - 1) * per_page
+    ranked = rank(scores, start + per_page)[start:]
+    return Page([listing(summary_id) for summary_id in ranked], len(scores))
@@ -0,0 +1,227 @@
+import bisect
+import heapq
+import math
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# How much a match in each field counts towards the score of a summary
+FIELD_WEIGHTS = {
+    "title": 5.0,
+    "topics": 3.0,
+    "terms": 3.0,
+    "conclusions": 1.0,
+    "quotes": 1.0,
+}
+# Share of the score kept when a query term only matches a token's prefix
+PREFIX_WEIGHT = 0.5
+# Upper bound of tokens a query term is expanded to by prefix matching
+MAX_PREFIX_EXPANSIONS = 64
+# Tokens in at least this many documents keep their ranking once queried
+RANKING_CACHE_MIN_POSTINGS = 1000
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(text.casefold()) if text else []
+
+
+def rank(scores: Dict[str, float], limit: Optional[int] = None) -> List[str]:
+    """Order document IDs by score, best first, keeping the best ``limit``.
+
+    With a limit, the ``limit``-th best score is found on a heap. Only the
+    documents scoring better are sorted, and documents tied with it are
+    picked by ID on another heap, so many equal scores are cheap too.
+    """
+    key = lambda doc_id: (-scores[doc_id], doc_id)  # noqa: E731
+    if limit is None or limit >= len(scores):
+        return sorted(scores, key=key)
+    if limit <= 0:
+        return []
+    threshold = heapq.nlargest(limit, scores.values())[-1]
+    better, tied = [], []
+    for doc_id, score in scores.items():
+        if score > threshold:
+            better.append(doc_id)
+        elif score == threshold:
+            tied.append(doc_id)
+    return sorted(better, key=key) + heapq.nsmallest(limit - len(better), tied)
+
+
+class SearchIndex:
+    """Inverted index from tokens to weighted term frequencies per summary.
+
+    Documents are added, replaced and removed one at a time or in bulk, so
+    the index can follow the catalog incrementally; the catalog changes a
+    copy and swaps it in. Every query term has to match a token, either
+    exactly or as a prefix, and results are ranked by the sum of the
+    field-weighted, idf-scaled matches.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._doc_tokens: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._rankings: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_tokens)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_tokens
+
+    def copy(self) -> "SearchIndex":
+        """Return an index that can be changed without affecting this one."""
+        index = SearchIndex()
+        index._postings = defaultdict(
+            dict, {token: dict(postings) for token, postings in self._postings.items()}
+        )
+        # Token sets are replaced, never changed, so they can be shared
+        index._doc_tokens = dict(self._doc_tokens)
+        index._vocabulary = list(self._vocabulary)
+        index._rankings = dict(self._rankings)
+        return index
+
+    def add(self, doc_id: str, fields: Dict[str, str]):
+        """Index a document's fields, replacing an earlier version of it."""
+        self._add(doc_id, fields, insort=True)
+
+    def update(self, documents: Iterable[Tuple[str, Dict[str, str]]]):
+        """Index many documents, sorting the vocabulary once at the end."""
+        for doc_id, fields in documents:
+            self._add(doc_id, fields, insort=False)
+        self._vocabulary = sorted(self._postings)
+
+    def _add(self, doc_id: str, fields: Dict[str, str], insort: bool):
+        self.remove(doc_id)
+        weights: Dict[str, float] = defaultdict(float)
+        for field, text in fields.items():
+            for token in tokenize(text):
+                weights[token] += FIELD_WEIGHTS.get(field, 1.0)
+
+        for token, weight in weights.items():
+            self._rankings.pop(token, None)
+            postings = self._postings[token]
+            if not postings and insort:
+                bisect.insort(self._vocabulary, token)
+            postings[doc_id] = weight
+        self._doc_tokens[doc_id] = set(weights)
+
+    def remove(self, doc_id: str):
+        """Drop a document from the index if it is present."""
+        for token in self._doc_tokens.pop(doc_id, ()):
+            self._rankings.pop(token, None)
+            postings = self._postings[token]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[token]
+                index = bisect.bisect_left(self._vocabulary, token)
+                # Tokens added by update are only in the vocabulary once it ends
+                if self._vocabulary[index : index + 1] == [token]:
+                    del self._vocabulary[index]
+
+    def _expand(self, term: str) -> List[str]:
+        start = bisect.bisect_left(self._vocabulary, term)
+        tokens = []
+        for token in self._vocabulary[start : start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(term):
+                break
+            tokens.append(token)
+        return tokens
+
+    def ranking(self, query: str) -> Optional[List[str]]:
+        """Return every match of a query, best first, if it is a common token.
+
+        A query that expands to a single token is ranked by that token's
+        weights alone. The ranking of a token in many documents is kept until
+        the token changes, so any page of it is a slice. Other queries return
+        None and are scored instead.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        tokens = self._expand(terms[0]) if len(terms) == 1 else []
+        if len(tokens) != 1:
+            return None
+        postings = self._postings[tokens[0]]
+        if len(postings) < RANKING_CACHE_MIN_POSTINGS:
+            return None
+        ranking = self._rankings.get(tokens[0])
+        if ranking is None:
+            ranking = sorted(postings, key=lambda doc_id: (-postings[doc_id], doc_id))
+            self._rankings[tokens[0]] = ranking
+        return ranking
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """Score the documents matching every query term.
+
+        Terms are matched rarest first: the first one scores its postings and
+        every other term only looks up the documents still matching, so a
+        common term costs little once a rare one narrowed the candidates.
+        """
+        terms = []
+        for term in dict.fromkeys(tokenize(query)):
+            tokens = [(token, self._postings[token]) for token in self._expand(term)]
+            if not tokens:
+                return {}
+            size = sum(len(postings) for _, postings in tokens)
+            terms.append((size, term, tokens))
+        terms.sort(key=lambda item: item[0])
+
+        total = len(self._doc_tokens)
+        scores: Optional[Dict[str, float]] = None
+        for _, term, tokens in terms:
+            factors = []
+            for token, postings in tokens:
+                idf = math.log(1 + total / len(postings))
+                factors.append(
+                    (postings, idf if token == term else idf * PREFIX_WEIGHT)
+                )
+            if scores is None:
+                # Factors start with the largest posting list, scored in one go
+                factors.sort(key=lambda item: -len(item[0]))
+                postings, factor = factors[0]
+                scores = {
+                    doc_id: weight * factor for doc_id, weight in postings.items()
+                }
+                for postings, factor in factors[1:]:
+                    for doc_id, weight in postings.items():
+                        score = weight * factor
+                        if score > scores.get(doc_id, 0.0):
+                            scores[doc_id] = score
+                continue
+
+            if len(factors) == 1:
+                postings, factor = factors[0]
+                scores = {
+                    doc_id: score + postings[doc_id] * factor
+                    for doc_id, score in scores.items()
+                    if doc_id in postings
+                }
+                if not scores:
+                    return {}
+                continue
+
+            narrowed = {}
+            for doc_id, score in scores.items():
+                best = max(
+                    (
+                        postings[doc_id] * factor
+                        for postings, factor in factors
+                        if doc_id in postings
+                    ),
+                    default=None,
+                )
+                if best is not None:
+                    narrowed[doc_id] = score + best
+            scores = narrowed
+            if not scores:
+                return {}
+        return scores or {}
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Return the IDs of documents matching every query term, best first."""
+        ranking = self.ranking(query)
+        if ranking is not None:
+            return ranking[:limit] if limit is not None else list(ranking)
+        return rank(self.scores(query), limit)
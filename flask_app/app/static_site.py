@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from typing import Dict, List
+from urllib.parse import unquote
+
+import click
+from flask import Flask, current_app, url_for
+from flask.cli import with_appcontext
+
+from app.views import PER_PAGE
+
+# Records the fingerprint each page was rendered from, inside the output
+BUILD_MANIFEST = ".build.json"
+
+
+@dataclass
+class BuildResult:
+    """Pages written, left untouched and deleted by a static build."""
+
+    rendered: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+
+def output_path(url: str) -> str:
+    """Map a page URL to the file that serves it, ``<path>/index.html``."""
+    return os.path.join(*unquote(url).strip("/").split("/"), "index.html")
+
+
+def _templates_hash(app: Flask) -> str:
+    digest = hashlib.sha256()
+    for directory in [app.template_folder, app.static_folder]:
+        root = os.path.join(app.root_path, directory)
+        for dirpath, _, filenames in sorted(os.walk(root)):
+            for filename in sorted(filenames):
+                with open(os.path.join(dirpath, filename), "rb") as file:
+                    digest.update(filename.encode() + b"\0" + file.read())
+    return digest.hexdigest()
+
+
+def site_pages(app: Flask) -> Dict[str, str]:
+    """Return every page of the static site with a fingerprint of its inputs.
+
+    A summary page depends on the summary's generation. An index page
+    depends on the summaries it lists and on the page count of its podcast,
+    and a topic or person page on its entry in the entity index and the
+    summaries it lists. The templates and static files are part of every
+    fingerprint.
+    """
+    catalog = app.extensions["summary_catalog"]
+    entities = app.extensions["entity_index"]
+    version = _templates_hash(app)
+    pages = {}
+
+    with app.test_request_context():
+        index_url = app.jinja_env.globals["index_url"]
+        for podcast in [""] + app.config["PODCASTS"]:
+            page_number = 1
+            while True:
+                page = catalog.page(
+                    podcast=podcast, page=page_number, per_page=PER_PAGE
+                )
+                inputs = [
+                    [
+                        listing["metadata"]["id"],
+                        catalog.generation(listing["metadata"]["id"]),
+                    ]
+                    for listing in page.summaries
+                ]
+                pages[index_url(page_number, podcast)] = json.dumps(
+                    [version, podcast, page_number, page.total, inputs]
+                )
+                if page_number * PER_PAGE >= page.total:
+                    break
+                page_number += 1
+
+        for listing in catalog.summaries():
+            summary_id = listing["metadata"]["id"]
+            url = url_for("main.summary", summary_id=summary_id)
+            pages[url] = json.dumps(
+                [version, summary_id, catalog.generation(summary_id)]
+            )
+
+        entity_url = app.jinja_env.globals["entity_url"]
+        # Terms that are never listed as topics get a topic page, see views.topic
+        topic_keys = set(entities.keys("topic")) | set(entities.keys("term"))
+        for kind, keys in [("topic", topic_keys), ("person", entities.keys("person"))]:
+            for key in sorted(keys):
+                entity = entities.get(kind, key) or entities.get("term", key)
+                episodes = entity["episodes"]
+                for start in range(0, max(len(episodes), 1), PER_PAGE):
+                    page_number = start // PER_PAGE + 1
+                    inputs = [
+                        [summary_id, catalog.generation(summary_id)]
+                        for summary_id in episodes[start : start + PER_PAGE]
+                    ]
+                    pages[entity_url(kind, key, page_number)] = json.dumps(
+                        [version, kind, key, page_number, entity, inputs]
+                    )
+
+    return {
+        url: hashlib.sha256(inputs.encode("utf-8")).hexdigest()
+        for url, inputs in pages.items()
+    }
+
+
+def build_static_site(app: Flask, output_dir: str, force: bool = False) -> BuildResult:
+    """Pre-render the site into ``output_dir`` with the app's own views.
+
+    Only pages whose fingerprint changed since the last build are rendered,
+    and pages that no longer exist are deleted. Static files are copied to
+    ``static/``.
+    """
+    manifest_path = os.path.join(output_dir, BUILD_MANIFEST)
+    previous = {}
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            previous = json.load(file)
+
+    app.extensions["summary_catalog"].refresh()
+    app.extensions["entity_index"].refresh()
+    pages = site_pages(app)
+    result = BuildResult()
+    client = app.test_client()
+    for url, fingerprint in pages.items():
+        path = os.path.join(output_dir, output_path(url))
+        if previous.get(url) == fingerprint and os.path.exists(path):
+            result.unchanged.append(url)
+            continue
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"Rendering {url} returned {response.status_code}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(response.data)
+        result.rendered.append(url)
+
+    for url in sorted(set(previous) - set(pages)):
+        path = os.path.join(output_dir, output_path(url))
+        if os.path.exists(path):
+            os.remove(path)
+        result.removed.append(url)
+
+    shutil.copytree(
+        app.static_folder, os.path.join(output_dir, "static"), dirs_exist_ok=True
+    )
+    with open(manifest_path, "w", encoding="utf-8") as file:
+        json.dump(pages, file, indent=2, sort_keys=True)
+    return result
+
+
+@click.command("build-static")
+@click.argument("output_dir", type=click.Path(file_okay=False))
+@click.option("--force", is_flag=True, help="Render every page again.")
+@with_appcontext
+def build_static_command(output_dir, force):
+    """Pre-render every summary, index, topic and person page into OUTPUT_DIR."""
+    result = build_static_site(current_app._get_current_object(), output_dir, force)
+    click.echo(
+        f"Rendered {len(result.rendered)} pages, {len(result.unchanged)} unchanged, "
+        f"removed {len(result.removed)}."
+    )
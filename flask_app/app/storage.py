@@ -0,0 +1,14 @@
+from podcast_shared.storage import BlobInfo, GCSStorage, LocalStorage, gcs_client
+
+__all__ = ["BlobInfo", "GCSStorage", "LocalStorage", "create_storage", "gcs_client"]
+
+
+def create_storage(config) -> "GCSStorage | LocalStorage":
+    """Build the storage backend selected by ``STORAGE_BACKEND``."""
+    backend = config.get("STORAGE_BACKEND", "gcs")
+    concurrency = config.get("STORAGE_CONCURRENCY", 16)
+    if backend == "gcs":
+        return GCSStorage(config["BUCKET_NAME"], concurrency=concurrency)
+    if backend == "local":
+        return LocalStorage(config["LOCAL_STORAGE_DIR"], concurrency)
+    raise ValueError(f"Unknown storage backend: {backend}")
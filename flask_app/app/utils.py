@@ -2,7 +2,7 @@ import json
 from datetime import datetime
 from typing import Any, Dict, List
 
-from google.cloud import storage
+from app.storage import GCSStorage
 
 
 def convert_date(date_str: str) -> str:
@@ -22,30 +22,23 @@ def convert_date(date_str: str) -> str:
 
 def list_files(bucket_name: str, prefix: str) -> List[str]:
     """List files in a Google Cloud Storage bucket with a given prefix."""
-    bucket = storage.Client().bucket(bucket_name)
-    files = [
+    return [
         blob.name
-        for blob in bucket.list_blobs(prefix=prefix)
+        for blob in GCSStorage(bucket_name).list_blobs(prefix)
         if blob.name.endswith(".json")
     ]
-    return files
 
 
 def load_summaries(bucket_name: str, file_paths: List[str]) -> List[Dict[str, Any]]:
-    bucket = storage.Client().bucket(bucket_name)
-    summaries = []
-
-    for file_path in file_paths:
-        blob = bucket.blob(file_path)
-        summary = json.loads(blob.download_as_text())
-        summaries.append(summary)
-
-    return summaries
+    """Download summaries concurrently, in the order of ``file_paths``."""
+    texts = GCSStorage(bucket_name).download_many(file_paths)
+    return [json.loads(texts[file_path]) for file_path in file_paths]
 
 
 def load_summary_by_id(
     bucket_name: str, prefix: str, summary_id: str
 ) -> Dict[str, Any]:
     """Load a summary by its ID from Google Cloud Storage within the specified bucket and prefix."""
-    blob = storage.Client().bucket(bucket_name).blob(f"{prefix}{summary_id}.json")
-    return json.loads(blob.download_as_text())
+    return json.loads(
+        GCSStorage(bucket_name).download_text(f"{prefix}{summary_id}.json")
+    )
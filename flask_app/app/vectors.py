@@ -0,0 +1,231 @@
+import hashlib
+import io
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.metrics import timed
+from app.search import tokenize
+
+
+class EmbeddingModelMismatch(RuntimeError):
+    """The vector file was embedded with another model than queries are."""
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class HashingEmbedder:
+    """Deterministic local embedding provider, used for tests and offline runs.
+
+    Mirrors the summarizer's hashing provider, so queries land in the same
+    space as the stored summary vectors.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8)
+                value = int.from_bytes(digest.digest(), "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dimensions] += sign
+        return _normalize(vectors)
+
+
+class OpenAIEmbedder:
+    """Embed queries with the OpenAI embeddings endpoint.
+
+    The client is created on the first query, so the app starts even if the
+    endpoint is unreachable.
+    """
+
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        dimensions: int = 256,
+        api_key: Optional[str] = None,
+    ):
+        self.model = model
+        self.dimensions = dimensions
+        self.api_key = api_key
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                from openai import OpenAI
+
+                self._client = OpenAI(api_key=self.api_key)
+            return self._client
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = self.client.embeddings.create(
+            model=self.model, input=texts, dimensions=self.dimensions
+        )
+        vectors = np.array([item.embedding for item in response.data], np.float32)
+        return _normalize(vectors.reshape(-1, self.dimensions))
+
+
+def create_embedder(config) -> "HashingEmbedder | OpenAIEmbedder | None":
+    """Build the embedding provider selected by ``EMBEDDING_PROVIDER``.
+
+    Returns None, which turns semantic search off, if no provider is set or
+    the OpenAI provider has no API key.
+    """
+    provider = config.get("EMBEDDING_PROVIDER")
+    dimensions = config.get("EMBEDDING_DIMENSIONS", 256)
+    if not provider:
+        return None
+    if provider == "hashing":
+        return HashingEmbedder(dimensions)
+    if provider == "openai":
+        if not config.get("OPENAI_API_KEY"):
+            return None
+        return OpenAIEmbedder(
+            config["EMBEDDING_MODEL"], dimensions, config["OPENAI_API_KEY"]
+        )
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+
+class VectorIndex:
+    """In-memory copy of the summary vectors written by the summarizer.
+
+    Rows are grouped by podcast on load, so filtering by podcast scores a
+    contiguous slice of the matrix instead of masking or copying it. All
+    queries of a call are scored with one matrix product and the top ``k``
+    rows are picked with a partial sort. The vector file is reloaded when its
+    generation changes, checked in the background at most every ``ttl``
+    seconds so that slow storage never holds up a search.
+    """
+
+    def __init__(self, storage, path: str, embedder, ttl: float = 300):
+        self.storage = storage
+        self.path = path
+        self.embedder = embedder
+        self.ttl = ttl
+        self._ids = np.array([], dtype=str)
+        self._vectors = np.zeros((0, embedder.dimensions), dtype=np.float32)
+        self._slices: Dict[str, slice] = {}
+        self._generation: Optional[str] = None
+        self._checked_at: Optional[float] = None
+        self._mismatch: Optional[str] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._first_load_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def refresh(self):
+        """Reload the vector file if it changed since the last load."""
+        with timed("storage_list"):
+            blob = self.storage.stat(self.path)
+        generation = blob.generation if blob else None
+        if generation != self._generation:
+            if blob is None:
+                ids, podcasts = np.array([], dtype=str), np.array([], dtype=str)
+                vectors = np.zeros((0, self.embedder.dimensions), dtype=np.float32)
+            else:
+                with timed("download"):
+                    data = self.storage.download_bytes(self.path)
+                with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+                    model = str(arrays["model"])
+                    if model != self.embedder.model:
+                        # Not downloaded again until the file changes; the
+                        # vectors already loaded, if any, are kept
+                        self._mismatch = (
+                            f"{self.path} was embedded with {model}, "
+                            f"but queries are embedded with {self.embedder.model}"
+                        )
+                        with self._lock:
+                            self._generation = generation
+                        self._checked_at = time.monotonic()
+                        raise EmbeddingModelMismatch(self._mismatch)
+                    ids, podcasts = arrays["ids"], arrays["podcasts"]
+                    vectors = arrays["vectors"].astype(np.float32)
+
+            order = np.lexsort((ids, podcasts))
+            ids, podcasts, vectors = ids[order], podcasts[order], vectors[order]
+            names, starts, counts = np.unique(
+                podcasts, return_index=True, return_counts=True
+            )
+            slices = {
+                str(name): slice(start, start + count)
+                for name, start, count in zip(names, starts, counts)
+            }
+            with self._lock:
+                self._ids, self._vectors, self._slices = ids, vectors, slices
+                self._generation = generation
+            self._mismatch = None
+        self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._checked_at is None:
+            with self._first_load_lock:
+                if self._checked_at is None:
+                    self.refresh()
+        elif time.monotonic() - self._checked_at > self.ttl:
+            # Readers keep the current copy while the check runs
+            if not self._refresh_lock.locked():
+                threading.Thread(target=self._refresh_quietly, daemon=True).start()
+
+    def _refresh_quietly(self):
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self.refresh()
+        except Exception as exc:
+            print(f"Vector index refresh failed: {exc}")
+        finally:
+            self._refresh_lock.release()
+
+    def top_k(
+        self, queries: np.ndarray, k: int = 10, podcast: Optional[str] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """Return the ``k`` most similar summary IDs and scores for each query row.
+
+        Raises EmbeddingModelMismatch while the only vector file seen was
+        embedded with another model.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            ids, vectors = self._ids, self._vectors
+            if self._mismatch is not None and not len(ids):
+                raise EmbeddingModelMismatch(self._mismatch)
+            if podcast:
+                rows = self._slices.get(podcast, slice(0, 0))
+                ids, vectors = ids[rows], vectors[rows]
+
+        count = min(k, len(ids))
+        if count <= 0:
+            return [[] for _ in range(len(queries))]
+        scores = np.asarray(queries, dtype=np.float32) @ vectors.T
+        if count < len(ids):
+            best = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        else:
+            best = np.broadcast_to(np.arange(len(ids)), scores.shape)
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        ranking = np.argsort(-best_scores, axis=1, kind="stable")
+        best = np.take_along_axis(best, ranking, axis=1)
+        best_scores = np.take_along_axis(best_scores, ranking, axis=1)
+        return [
+            [(str(ids[i]), float(score)) for i, score in zip(row, row_scores)]
+            for row, row_scores in zip(best, best_scores)
+        ]
+
+    def search(
+        self, query: str, k: int = 10, podcast: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """Embed a query and return the IDs and scores of the closest summaries."""
+        return self.top_k(self.embedder.embed([query]), k, podcast)[0]
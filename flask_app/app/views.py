@@ -1,63 +1,200 @@
-from flask import Blueprint, render_template, request, abort, current_app, g
-from app.utils import list_files, load_summaries, load_summary_by_id, convert_date
+from flask import (
+    Blueprint,
+    render_template,
+    request,
+    abort,
+    current_app,
+    g,
+    jsonify,
+    redirect,
+    url_for,
+)
+from werkzeug.http import is_resource_modified
+
+from app.entities import entity_key
+from app.metrics import timed
+from app.query import page_window
+from app.vectors import EmbeddingModelMismatch
 
 main = Blueprint("main", __name__)
 
+PER_PAGE = 10
+
 
 @main.before_request
 def load_config():
     g.bucket_name = current_app.config["BUCKET_NAME"]
     g.sum_prefix = current_app.config["SUM_PREFIX"]
     g.podcasts = current_app.config["PODCASTS"]
+    g.catalog = current_app.extensions["summary_catalog"]
+    g.fragments = current_app.extensions["fragment_cache"]
+    g.vectors = current_app.extensions["vector_index"]
+    g.entities = current_app.extensions["entity_index"]
+
+
+@main.app_template_global()
+def index_url(page=1, podcast="", query="", cursor=None):
+    """Build an index URL with the podcast and page in the path.
+
+    Path-style URLs are what the static build writes to disk; only the
+    search query and the cursor stay query arguments.
+    """
+    values = {"podcast": podcast, "page": page if page > 1 else None}
+    values.update(query=query, cursor=cursor)
+    return url_for(
+        "main.index", **{key: value for key, value in values.items() if value}
+    )
+
+
+@main.app_template_global()
+def entity_url(kind, name, page=1):
+    """Link a topic or participant to its page; names without words search."""
+    key = entity_key(name, kind)
+    if not key:
+        return index_url(query=name)
+    return url_for(f"main.{kind}", name=key, page=page if page > 1 else None)
 
 
 @main.route("/")
-def index():
+@main.route("/page/<int:page>/")
+@main.route("/podcast/<podcast>/")
+@main.route("/podcast/<podcast>/page/<int:page>/")
+def index(podcast=None, page=None):
+    query = request.args.get("query", "")
+    podcast_filter = podcast or request.args.get("podcast", "")
+    page = page or int(request.args.get("page", 1))
+    cursor = request.args.get("cursor")
+    per_page = PER_PAGE
+
+    try:
+        result = g.catalog.page(query, podcast_filter, page, per_page, cursor)
+    except ValueError as exc:
+        abort(400, description=str(exc))
+    total_pages = (result.total + per_page - 1) // per_page
+
+    with timed("render"):
+        return render_template(
+            "index.html",
+            summaries=result.summaries,
+            podcast_names=g.podcasts,
+            page_numbers=page_window(page, total_pages),
+            current_page=page,
+            query=query,
+            podcast_filter=podcast_filter,
+            next_cursor=result.next_cursor,
+        )
+
+
+@main.route("/topic/<name>/")
+@main.route("/topic/<name>/page/<int:page>/")
+def topic(name, page=1):
+    # Terms share the topic pages, so a term never listed as a topic has one too
+    return entity_page("topic", name, page, fallback="term")
+
+
+@main.route("/person/<name>/")
+@main.route("/person/<name>/page/<int:page>/")
+def person(name, page=1):
+    return entity_page("person", name, page)
+
+
+def entity_page(kind, name, page, fallback=None):
+    """Render one page of an entity's episodes from the entity index."""
+    key = entity_key(name, kind)
+    if key != name:
+        return redirect(entity_url(kind, name, page), 301)
+
+    entity = g.entities.get(kind, key)
+    if entity is None and fallback:
+        entity = g.entities.get(fallback, key)
+    if entity is None:
+        abort(404, description=f"No episodes found for this {kind}")
+
+    per_page = PER_PAGE
+    total_pages = max((entity["count"] + per_page - 1) // per_page, 1)
+    if page < 1 or page > total_pages:
+        abort(404, description="Page not found")
+    start = (page - 1) * per_page
+    # Episodes that left the catalog since the index was written are skipped
+    summaries = g.catalog.listings(entity["episodes"][start : start + per_page])
+
+    with timed("render"):
+        return render_template(
+            "entity.html",
+            kind=kind,
+            key=key,
+            entity=entity,
+            summaries=summaries,
+            page_numbers=page_window(page, total_pages),
+            current_page=page,
+        )
+
+
+def search_unavailable(query):
+    return jsonify(query=query, error="Semantic search is not configured"), 503
+
+
+@main.route("/search")
+def search():
     query = request.args.get("query", "")
     podcast_filter = request.args.get("podcast", "")
-    page = int(request.args.get("page", 1))
-    per_page = 10
-
-    file_paths = list_files(g.bucket_name, g.sum_prefix)
-    all_summaries = load_summaries(g.bucket_name, file_paths)
-
-    filtered_summaries = [
-        summary
-        for summary in all_summaries
-        if (not query or query.lower() in summary["metadata"]["title"].lower())
-        and (not podcast_filter or summary["metadata"]["podcast"] == podcast_filter)
-    ]
-
-    for summary in filtered_summaries:
-        summary["metadata"]["date"] = convert_date(summary["metadata"]["date"])
-
-    filtered_summaries.sort(key=lambda x: x["metadata"]["date"], reverse=True)
-
-    total_summaries = len(filtered_summaries)
-    total_pages = (total_summaries + per_page - 1) // per_page
-    displayed_summaries = filtered_summaries[(page - 1) * per_page : page * per_page]
-
-    return render_template(
-        "index.html",
-        summaries=displayed_summaries,
-        podcast_names=g.podcasts,
-        total_pages=total_pages,
-        current_page=page,
+    k = min(max(request.args.get("k", 10, type=int), 1), 100)
+    if g.vectors is None:
+        return search_unavailable(query)
+
+    # Summaries that left the catalog since the vectors were written are skipped
+    try:
+        matches = g.vectors.search(query, k, podcast_filter) if query.strip() else []
+    except EmbeddingModelMismatch as exc:
+        current_app.logger.warning("Semantic search is unavailable: %s", exc)
+        return search_unavailable(query)
+    scores = dict(matches)
+    listings = g.catalog.listings([summary_id for summary_id, _ in matches])
+
+    return jsonify(
         query=query,
-        podcast_filter=podcast_filter,
+        results=[
+            {
+                "id": listing["metadata"]["id"],
+                "title": listing["metadata"]["title"],
+                "date": listing["metadata"]["date"],
+                "podcast": listing["metadata"]["podcast"],
+                "score": round(scores[listing["metadata"]["id"]], 4),
+            }
+            for listing in listings
+        ],
     )
 
 
 @main.route("/summary/<summary_id>")
 def summary(summary_id):
-    summary = load_summary_by_id(
-        g.bucket_name,
-        g.sum_prefix,
-        summary_id,
-    )
-    if summary is None:
+    generation = g.catalog.generation(summary_id)
+    if generation is None:
         abort(404, description="Summary not found")
+
+    # A summary only changes when it is rewritten, which bumps its generation,
+    # so validators are known before the document is fetched or rendered
+    etag = f"{summary_id}-{generation}"
+    last_modified = g.catalog.storage.modified_at(generation)
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        html = g.fragments.get_or_render(
+            (summary_id, generation), lambda: render_summary(summary_id)
+        )
+        response = current_app.response_class(html, mimetype="text/html")
     else:
-        summary["metadata"]["date"] = convert_date(summary["metadata"]["date"])
+        response = current_app.response_class(status=304)
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["SUMMARY_MAX_AGE"]
+    return response
+
+
+def render_summary(summary_id):
+    summary = g.catalog.get(summary_id)
+    if summary is None:
+        abort(404, description="Summary not found")
 
-    return render_template("summary.html", data=summary)
+    with timed("render"):
+        return render_template("summary.html", data=summary)
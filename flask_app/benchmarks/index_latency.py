@@ -0,0 +1,91 @@
+"""Measure index route latency as the catalog grows.
+
+Run from the flask_app directory:
+
+    python benchmarks/index_latency.py --sizes 100 1000 10000 100000
+
+Every catalog is served from a synthetic manifest in a temporary local
+bucket. The table shows the median latency of the first page, a deep page
+filtered by podcast and the page after a cursor; all three should stay flat
+as the catalog grows, since only the rows of the requested page are touched.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.config import TestConfig  # noqa: E402
+from app.storage import LocalStorage  # noqa: E402
+
+PODCASTS = ["Dwarkesh Podcast", "Latent Space"]
+
+
+def write_catalog(root: str, count: int, seed: int = 0):
+    """Write a manifest of ``count`` synthetic summaries below ``root``."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        rows.append(
+            {
+                "metadata": {
+                    "id": f"episode_{i}",
+                    "title": f"Episode {i}",
+                    "date": f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-"
+                    f"{rng.randint(2015, 2024)}",
+                    "participants": ["Dwarkesh Patel"],
+                    "podcast": rng.choice(PODCASTS),
+                },
+                "topics": ["AGI", "Scaling laws"],
+                "conclusions": "A conclusion.",
+                "generation": 1,
+                "size": 2048,
+            }
+        )
+    LocalStorage(root).upload_text(
+        "manifest.jsonl", "".join(json.dumps(row) + "\n" for row in rows)
+    )
+
+
+def median_ms(client, url: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, url
+    return statistics.median(timings) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000]
+    )
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'summaries':>10} {'first ms':>9} {'deep ms':>9} {'cursor ms':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as root:
+            write_catalog(root, size)
+            app = create_app(TestConfig, {"LOCAL_STORAGE_DIR": root})
+            client = app.test_client()
+            client.get("/")
+
+            deep_page = max(size // (2 * 10) - 1, 1)
+            catalog = app.extensions["summary_catalog"]
+            cursor = catalog.page(podcast=PODCASTS[0]).next_cursor or ""
+            print(
+                f"{size:>10} "
+                f"{median_ms(client, '/', args.repeat):>9.2f} "
+                f"{median_ms(client, f'/?podcast={PODCASTS[1]}&page={deep_page}', args.repeat):>9.2f} "
+                f"{median_ms(client, f'/?podcast={PODCASTS[0]}&cursor={cursor}', args.repeat):>10.2f}"
+            )
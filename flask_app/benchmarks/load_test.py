@@ -0,0 +1,135 @@
+"""Compare request throughput of a single-threaded and a threaded server.
+
+Run from the flask_app directory:
+
+    python benchmarks/load_test.py --latency 0.1 --clients 8 --requests 200
+
+The app is served from a synthetic catalog in a temporary local bucket whose
+every read is delayed by ``--latency`` seconds, standing in for a slow GCS.
+Concurrent clients request a mix of summary pages that are not cached yet,
+so each one waits on storage, and index pages served from memory. With a
+single-threaded server, like a synchronous gunicorn worker, every request
+queues behind the storage reads of the others; with threads, as in
+app.yaml, requests only wait on their own reads.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from urllib.request import urlopen
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from app import create_app  # noqa: E402
+from app.config import TestConfig  # noqa: E402
+from app.storage import LocalStorage  # noqa: E402
+from index_latency import write_catalog  # noqa: E402
+from suite import write_summary  # noqa: E402
+
+
+class SlowStorage(LocalStorage):
+    """Local storage that waits ``latency`` seconds before every read."""
+
+    def __init__(self, root: str, latency: float):
+        super().__init__(root)
+        self.latency = latency
+
+    def list_blobs(self, prefix):
+        time.sleep(self.latency)
+        return super().list_blobs(prefix)
+
+    def stat(self, name):
+        time.sleep(self.latency)
+        return super().stat(name)
+
+    def download_text(self, name):
+        time.sleep(self.latency)
+        return super().download_text(name)
+
+    def download_bytes(self, name):
+        time.sleep(self.latency)
+        return super().download_bytes(name)
+
+    def download_to_file(self, name, file):
+        time.sleep(self.latency)
+        return super().download_to_file(name, file)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args):
+        pass
+
+
+def run(root: str, threaded: bool, args) -> dict:
+    """Serve the app in one mode and time the clients' requests."""
+    with patch("app.create_storage", lambda config: SlowStorage(root, args.latency)):
+        app = create_app(TestConfig, {"LOCAL_STORAGE_DIR": root})
+    server = make_server(
+        "127.0.0.1", 0, app, threaded=threaded, request_handler=QuietHandler
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    def get(path: str) -> float:
+        start = time.perf_counter()
+        with urlopen(base + path) as response:
+            response.read()
+        return time.perf_counter() - start
+
+    # The catalog and the summary pack are loaded before timing
+    get("/")
+    get("/summary/episode_0")
+    paths = [
+        f"/summary/episode_{index + 1}" if index % 2 else f"/page/{index % 5 + 1}/"
+        for index in range(args.requests)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        timings = sorted(pool.map(get, paths))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    return {
+        "seconds": elapsed,
+        "throughput": len(paths) / elapsed,
+        "p50_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95) - 1] * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--summaries", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        write_catalog(root, args.summaries)
+        for index in range(args.requests + 1):
+            write_summary(root, f"episode_{index}")
+
+        results = {}
+        print(f"{'server':<16} {'seconds':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, threaded in [("single-threaded", False), ("threaded", True)]:
+            results[name] = run(root, threaded, args)
+            stats = results[name]
+            print(
+                f"{name:<16} {stats['seconds']:>8.2f} {stats['throughput']:>8.1f} "
+                f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f}"
+            )
+        gain = (
+            results["threaded"]["throughput"] / results["single-threaded"]["throughput"]
+        )
+        print(f"\nThreaded serving handles {gain:.1f}x the requests per second.")
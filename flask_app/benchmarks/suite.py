@@ -0,0 +1,107 @@
+"""Benchmark the web app's hot paths against the stored baseline.
+
+Run from the flask_app directory:
+
+    python benchmarks/suite.py
+    python benchmarks/suite.py --update-baseline
+
+For catalogs of 10 to 100k summaries, served from a synthetic manifest in a
+temporary local bucket, it times a cold catalog load, index pages with and
+without a filter or query, and summary pages rendered, served from the
+fragment cache and revalidated with a 304.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(HERE)), "benchmarks"))
+
+from app import create_app  # noqa: E402
+from app.catalog import SummaryCatalog  # noqa: E402
+from app.config import TestConfig  # noqa: E402
+from app.storage import LocalStorage  # noqa: E402
+from harness import MIN_REPEAT, Case, main  # noqa: E402
+from index_latency import PODCASTS, write_catalog  # noqa: E402
+
+SIZES = [10, 1000, 100000]
+
+
+def write_summary(root: str, summary_id: str):
+    """Store the full document of one manifest row, for the summary page."""
+    summary = {
+        "metadata": {
+            "id": summary_id,
+            "title": f"Episode {summary_id}",
+            "date": "01-01-2024",
+            "participants": ["Dwarkesh Patel", "Ilya Sutskever"],
+            "podcast": PODCASTS[0],
+        },
+        "summary": "A summary. " * 40,
+        "topics": ["AGI", "Scaling laws", "Alignment"],
+        "quotes": [
+            {"quote": "A quote. " * 10, "speaker": "Ilya Sutskever"} for _ in range(3)
+        ],
+        "terms": {f"Term {i}": "A definition. " * 5 for i in range(6)},
+        "recommendations": ["A recommendation."] * 5,
+        "conclusions": "A conclusion. " * 10,
+    }
+    LocalStorage(root).upload_text(f"summaries/{summary_id}.json", json.dumps(summary))
+
+
+def get(client, url: str, **kwargs):
+    def run():
+        response = client.get(url, **kwargs)
+        assert response.status_code in (200, 304), (url, response.status_code)
+
+    return run
+
+
+def size_cases(root: str, size: int):
+    write_catalog(root, size)
+    write_summary(root, "episode_0")
+    app = create_app(TestConfig, {"LOCAL_STORAGE_DIR": root})
+    client = app.test_client()
+    client.get("/")
+
+    deep_page = max(size // (2 * 10) - 1, 1)
+    etag = client.get("/summary/episode_0").headers["ETag"]
+    fragments = app.extensions["fragment_cache"]
+    # The largest catalog is slow to load, but still timed often enough to gate
+    repeat = MIN_REPEAT if size >= 100000 else 20
+
+    def load_catalog():
+        SummaryCatalog(
+            LocalStorage(root), "summaries/", manifest="manifest.jsonl"
+        ).refresh()
+
+    return [
+        Case(f"catalog_load/{size}", load_catalog, repeat=repeat),
+        Case(f"index/first/{size}", get(client, "/")),
+        Case(
+            f"index/podcast_deep/{size}",
+            get(client, f"/podcast/{PODCASTS[1]}/page/{deep_page}/"),
+        ),
+        Case(f"index/query/{size}", get(client, "/?query=scaling"), repeat=repeat),
+        Case(
+            f"summary/render/{size}",
+            get(client, "/summary/episode_0"),
+            setup=lambda: fragments.clear() or (),
+        ),
+        Case(f"summary/cached/{size}", get(client, "/summary/episode_0")),
+        Case(
+            f"summary/not_modified/{size}",
+            get(client, "/summary/episode_0", headers={"If-None-Match": etag}),
+        ),
+    ]
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as root:
+        cases = []
+        for size in SIZES:
+            cases += size_cases(os.path.join(root, str(size)), size)
+        main(cases, os.path.join(HERE, "baseline.json"), __doc__.splitlines()[0])
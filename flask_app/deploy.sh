@@ -0,0 +1,10 @@
+#!/bin/sh
+# Deploy the app to App Engine. Only this directory is uploaded, so the shared
+# package (../shared) is copied next to the app for the upload and removed
+# again afterwards; locally it is installed with `pip install -e shared`.
+set -e
+cd "$(dirname "$0")"
+rm -rf podcast_shared
+cp -r ../shared/podcast_shared podcast_shared
+trap 'rm -rf podcast_shared' EXIT
+gcloud app deploy "$@"
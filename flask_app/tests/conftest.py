@@ -2,11 +2,22 @@ import pytest
 
 from app import create_app
 from app.config import TestConfig
+from app.storage import LocalStorage
 
 
 @pytest.fixture
-def app():
-    app = create_app(TestConfig)
+def storage_dir(tmp_path):
+    return str(tmp_path / "bucket")
+
+
+@pytest.fixture
+def bucket(storage_dir):
+    return LocalStorage(storage_dir)
+
+
+@pytest.fixture
+def app(storage_dir):
+    app = create_app(TestConfig, {"LOCAL_STORAGE_DIR": storage_dir})
     yield app
 
 
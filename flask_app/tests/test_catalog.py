@@ -0,0 +1,260 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.catalog import SummaryCatalog
+from app.search import SearchIndex
+from app.storage import LocalStorage
+
+
+class CountingStorage(LocalStorage):
+    """Local storage that records which objects were downloaded"""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.downloads = []
+
+    def download_text(self, name):
+        self.downloads.append(name)
+        return super().download_text(name)
+
+
+def make_summary(summary_id, date="27-03-2023", podcast="Dwarkesh Podcast"):
+    return {
+        "metadata": {
+            "title": f"Episode {summary_id}",
+            "date": date,
+            "participants": ["Dwarkesh Patel"],
+            "id": summary_id,
+            "podcast": podcast,
+        },
+        "summary": "A summary.",
+        "topics": ["AGI"],
+        "quotes": [],
+        "terms": {},
+        "recommendations": [],
+        "conclusions": "A conclusion.",
+    }
+
+
+def write_summary(storage, summary, generation=None):
+    name = f"summaries/{summary['metadata']['id']}.json"
+    storage.upload_text(name, json.dumps(summary))
+    if generation is not None:
+        path = os.path.join(
+            storage.root, "summaries", f"{summary['metadata']['id']}.json"
+        )
+        os.utime(path, ns=(generation, generation))
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return CountingStorage(str(tmp_path))
+
+
+def test_summaries_are_loaded_once_and_dates_normalized(storage):
+    write_summary(storage, make_summary("ep1"))
+    write_summary(storage, make_summary("ep2", date="2024-01-05"))
+    catalog = SummaryCatalog(storage, "summaries/")
+
+    summaries = catalog.summaries()
+    catalog.summaries()
+
+    assert sorted(s["metadata"]["date"] for s in summaries) == [
+        "2023-03-27",
+        "2024-01-05",
+    ]
+    assert set(summaries[0]) == {"metadata", "topics", "conclusions"}
+    assert len(storage.downloads) == 2
+
+
+def test_refresh_only_downloads_changed_summaries(storage):
+    write_summary(storage, make_summary("ep1"), generation=1)
+    write_summary(storage, make_summary("ep2"), generation=1)
+    catalog = SummaryCatalog(storage, "summaries/")
+    catalog.refresh()
+    storage.downloads.clear()
+
+    changed = make_summary("ep2")
+    changed["metadata"]["title"] = "Renamed"
+    write_summary(storage, changed, generation=2)
+    write_summary(storage, make_summary("ep3"), generation=1)
+    os.remove(os.path.join(storage.root, "summaries", "ep1.json"))
+    catalog.refresh()
+
+    assert sorted(storage.downloads) == ["summaries/ep2.json", "summaries/ep3.json"]
+    titles = sorted(s["metadata"]["title"] for s in catalog.summaries())
+    assert titles == ["Episode ep3", "Renamed"]
+    assert catalog.get("ep1") is None
+
+
+def test_search_index_follows_refreshes(storage):
+    first = make_summary("ep1")
+    first["quotes"] = [{"quote": "Compute is all you need.", "speaker": "Ilya"}]
+    write_summary(storage, first, generation=1)
+    write_summary(storage, make_summary("ep2"), generation=1)
+    catalog = SummaryCatalog(storage, "summaries/")
+
+    assert [s["metadata"]["id"] for s in catalog.search("compute")] == ["ep1"]
+    assert len(catalog.search("agi")) == 2
+
+    changed = make_summary("ep2")
+    changed["metadata"]["title"] = "Compute clusters"
+    write_summary(storage, changed, generation=2)
+    os.remove(os.path.join(storage.root, "summaries", "ep1.json"))
+    catalog.refresh()
+
+    assert [s["metadata"]["id"] for s in catalog.search("comp")] == ["ep2"]
+    assert catalog.search("episode ep1") == []
+
+
+def test_search_index_is_built_without_holding_the_catalog_lock(storage, monkeypatch):
+    for index in range(3):
+        write_summary(storage, make_summary(f"ep{index}"))
+    catalog = SummaryCatalog(storage, "summaries/")
+    update = SearchIndex.update
+    held = []
+
+    def checked_update(index, documents):
+        held.append(catalog._lock.locked())
+        update(index, documents)
+
+    monkeypatch.setattr(SearchIndex, "update", checked_update)
+    catalog.refresh()
+    write_summary(storage, make_summary("ep3"))
+    catalog.refresh()
+
+    assert held == [False, False]
+    assert len(catalog.search("agi")) == 4
+
+
+def test_stale_catalog_refreshes_in_background(storage):
+    write_summary(storage, make_summary("ep1"))
+    catalog = SummaryCatalog(storage, "summaries/", ttl=0)
+    assert len(catalog.summaries()) == 1
+
+    write_summary(storage, make_summary("ep2"))
+    time.sleep(0.01)
+    catalog.summaries()
+    for _ in range(100):
+        if len(catalog.summaries()) == 2:
+            break
+        time.sleep(0.01)
+
+    assert len(catalog.summaries()) == 2
+
+
+def test_concurrent_stale_reads_start_one_refresh(storage):
+    write_summary(storage, make_summary("ep1"))
+    catalog = SummaryCatalog(storage, "summaries/", ttl=0.02)
+    catalog.refresh()
+    list_blobs, listed = storage.list_blobs, []
+
+    def slow_list_blobs(prefix):
+        listed.append(prefix)
+        time.sleep(0.05)
+        return list_blobs(prefix)
+
+    storage.list_blobs = slow_list_blobs
+    time.sleep(0.03)
+    barrier = threading.Barrier(8)
+
+    def read(_):
+        barrier.wait()
+        return len(catalog.summaries())
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert list(pool.map(read, range(8))) == [1] * 8
+    time.sleep(0.2)
+
+    assert listed == ["summaries/"]
+
+
+def test_concurrent_first_requests_load_the_catalog_once(storage):
+    write_summary(storage, make_summary("ep1"))
+    write_manifest(storage, [make_summary("ep1")])
+    catalog = SummaryCatalog(storage, "summaries/", manifest="manifest.jsonl")
+    stat, stats = storage.stat, []
+
+    def slow_stat(name):
+        stats.append(name)
+        time.sleep(0.05)
+        return stat(name)
+
+    storage.stat = slow_stat
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        counts = list(pool.map(lambda _: len(catalog.summaries()), range(8)))
+
+    assert counts == [1] * 8
+    assert stats == ["manifest.jsonl"]
+    assert storage.downloads == ["manifest.jsonl"]
+
+
+def test_memory_cap_evicts_documents_but_keeps_listing(storage):
+    for summary_id in ["ep1", "ep2", "ep3"]:
+        write_summary(storage, make_summary(summary_id))
+    size = os.path.getsize(os.path.join(storage.root, "summaries", "ep1.json"))
+    catalog = SummaryCatalog(storage, "summaries/", max_bytes=size * 2)
+    catalog.refresh()
+    storage.downloads.clear()
+
+    assert len(catalog.summaries()) == 3
+    assert catalog.get("ep3")["summary"] == "A summary."
+    assert storage.downloads == []
+
+    assert catalog.get("ep1")["metadata"]["date"] == "2023-03-27"
+    assert storage.downloads == ["summaries/ep1.json"]
+
+
+def write_manifest(storage, summaries):
+    rows = [
+        {
+            "metadata": summary["metadata"],
+            "topics": summary["topics"],
+            "conclusions": summary["conclusions"],
+            "search": {"quotes": [], "terms": list(summary["terms"])},
+            "generation": 1,
+            "size": 100,
+        }
+        for summary in summaries
+    ]
+    storage.upload_text("manifest.jsonl", "".join(json.dumps(r) + "\n" for r in rows))
+
+
+def test_listing_is_served_from_manifest(storage):
+    summaries = [make_summary("ep1"), make_summary("ep2")]
+    for summary in summaries:
+        write_summary(storage, summary)
+    write_manifest(storage, summaries)
+    catalog = SummaryCatalog(storage, "summaries/", manifest="manifest.jsonl")
+
+    listing = catalog.summaries()
+    catalog.refresh()
+
+    assert storage.downloads == ["manifest.jsonl"]
+    assert [s["metadata"]["date"] for s in listing] == ["2023-03-27", "2023-03-27"]
+    assert catalog.get("ep2")["summary"] == "A summary."
+    assert catalog.get("missing") is None
+    assert storage.downloads == ["manifest.jsonl", "summaries/ep2.json"]
+
+
+def test_manifest_rows_are_searchable(storage):
+    summary = make_summary("ep1")
+    summary["terms"] = {"RLHF": "Reinforcement learning from human feedback"}
+    write_manifest(storage, [summary, make_summary("ep2")])
+    catalog = SummaryCatalog(storage, "summaries/", manifest="manifest.jsonl")
+
+    assert [s["metadata"]["id"] for s in catalog.search("rlhf")] == ["ep1"]
+    assert storage.downloads == ["manifest.jsonl"]
+
+
+def test_missing_manifest_falls_back_to_listing(storage):
+    write_summary(storage, make_summary("ep1"))
+    catalog = SummaryCatalog(storage, "summaries/", manifest="manifest.jsonl")
+
+    assert len(catalog.summaries()) == 1
+    assert storage.downloads == ["summaries/ep1.json"]
@@ -0,0 +1,126 @@
+import json
+import os
+import time
+
+import pytest
+
+from app.entities import EntityIndex, entity_key
+from app.static_site import build_static_site
+from tests.test_static_site import make_summary, upload
+
+
+def write_entities(storage, entities, generation=None):
+    """Write {kind: {key: entity}} in the summarizer's entity index format."""
+    storage.upload_text("entities.json", json.dumps({"entities": entities}))
+    if generation is not None:
+        path = os.path.join(storage.root, "entities.json")
+        os.utime(path, ns=(generation, generation))
+
+
+def entity(name, episodes, aliases=()):
+    return {
+        "name": name,
+        "aliases": list(aliases),
+        "count": len(episodes),
+        "episodes": episodes,
+    }
+
+
+@pytest.fixture
+def episodes(bucket):
+    for day in range(1, 13):
+        upload(bucket, make_summary(f"ep{day:02d}", day), generation=1)
+    newest_first = [f"ep{day:02d}" for day in range(12, 0, -1)]
+    write_entities(
+        bucket,
+        {
+            "topic": {"agi": entity("AGI", newest_first, ["agi"])},
+            "term": {"rlhf": entity("RLHF", ["ep03"])},
+            "person": {"dwarkesh-patel": entity("Dwarkesh Patel", newest_first)},
+        },
+    )
+    return newest_first
+
+
+def test_entity_key_ignores_case_accents_punctuation_and_titles():
+    assert (
+        entity_key("Scaling Laws") == entity_key("  scaling-laws. ") == "scaling-laws"
+    )
+    assert entity_key("Dr. Kurt Gödel", "person") == "kurt-godel"
+    assert entity_key("Dr. Kurt Gödel") == "dr-kurt-godel"
+
+
+def test_missing_index_has_no_entities(bucket):
+    index = EntityIndex(bucket, "entities.json")
+
+    assert index.get("topic", "agi") is None
+    assert index.keys("topic") == []
+
+
+def test_changed_index_is_reloaded_in_background(bucket):
+    write_entities(bucket, {"topic": {"agi": entity("AGI", ["ep1"])}}, 10**18)
+    index = EntityIndex(bucket, "entities.json", ttl=0)
+    assert index.get("topic", "agi")["episodes"] == ["ep1"]
+
+    write_entities(bucket, {"topic": {"agi": entity("AGI", ["ep2"])}}, 2 * 10**18)
+    index.get("topic", "agi")
+    for _ in range(100):
+        if index.get("topic", "agi")["episodes"] == ["ep2"]:
+            break
+        time.sleep(0.01)
+
+    assert index.get("topic", "agi")["episodes"] == ["ep2"]
+
+
+def test_topic_page_lists_episodes_newest_first(client, episodes):
+    response = client.get("/topic/agi/")
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert "12 episodes" in text
+    assert "Also written as agi" in text
+    assert text.index("Episode ep12") < text.index("Episode ep03")
+    assert "Episode ep02" not in text
+    assert 'href="/topic/agi/page/2/"' in text
+    assert "Episode ep02" in client.get("/topic/agi/page/2/").get_data(as_text=True)
+    assert client.get("/topic/agi/page/3/").status_code == 404
+
+
+def test_terms_and_people_have_pages(client, episodes):
+    term = client.get("/topic/rlhf/").get_data(as_text=True)
+    person = client.get("/person/dwarkesh-patel/").get_data(as_text=True)
+
+    assert "Episode ep03" in term
+    assert "Episode ep04" not in term
+    assert "Dwarkesh Patel" in person
+    assert "Episode ep12" in person
+
+
+def test_entity_names_redirect_to_their_key(client, episodes):
+    response = client.get("/person/Dr.%20Dwarkesh%20Patel/")
+
+    assert response.status_code == 301
+    assert response.headers["Location"].endswith("/person/dwarkesh-patel/")
+    assert client.get("/topic/unknown/").status_code == 404
+
+
+def test_summary_links_topics_and_participants(client, episodes):
+    text = client.get("/summary/ep01").get_data(as_text=True)
+
+    assert 'href="/topic/agi/"' in text
+    assert 'href="/person/dwarkesh-patel/"' in text
+
+
+def test_static_build_renders_entity_pages(app, episodes, tmp_path):
+    site = str(tmp_path / "site")
+
+    result = build_static_site(app, site)
+
+    assert {
+        "/topic/agi/",
+        "/topic/agi/page/2/",
+        "/topic/rlhf/",
+        "/person/dwarkesh-patel/",
+        "/person/dwarkesh-patel/page/2/",
+    } <= set(result.rendered)
+    assert build_static_site(app, site).rendered == []
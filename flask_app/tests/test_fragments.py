@@ -0,0 +1,28 @@
+from app.fragments import FragmentCache
+
+
+def test_fragments_are_rendered_once():
+    cache = FragmentCache()
+    calls = []
+
+    def render():
+        calls.append(1)
+        return "<p>summary</p>"
+
+    assert cache.get_or_render(("ep1", "1"), render) == "<p>summary</p>"
+    assert cache.get_or_render(("ep1", "1"), render) == "<p>summary</p>"
+    assert len(calls) == 1
+
+
+def test_least_recently_used_fragments_are_evicted():
+    cache = FragmentCache(max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    cache.get("a")
+    cache.put("c", "cccc")
+    cache.put("huge", "x" * 11)
+
+    assert cache.get("b") is None
+    assert cache.get("huge") is None
+    assert (cache.get("a"), cache.get("c")) == ("aaaa", "cccc")
+    assert len(cache) == 2
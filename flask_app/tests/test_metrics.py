@@ -0,0 +1,143 @@
+import json
+import os
+
+import pytest
+
+from app import create_app
+from app.config import TestConfig
+from app.metrics import MetricsRegistry, timed
+
+
+def make_summary(summary_id, day):
+    return {
+        "metadata": {
+            "title": f"Episode {summary_id}",
+            "date": f"{day:02d}-01-2024",
+            "participants": ["Dwarkesh Patel"],
+            "id": summary_id,
+            "podcast": "Dwarkesh Podcast",
+        },
+        "summary": "A summary.",
+        "topics": ["AGI"],
+        "quotes": [],
+        "terms": {},
+        "recommendations": [],
+        "conclusions": "A conclusion.",
+    }
+
+
+@pytest.fixture
+def app(storage_dir):
+    return create_app(
+        TestConfig, {"LOCAL_STORAGE_DIR": storage_dir, "METRICS_ENABLED": True}
+    )
+
+
+@pytest.fixture
+def summaries(bucket):
+    for day in range(1, 4):
+        summary = make_summary(f"ep{day}", day)
+        bucket.upload_text(f"summaries/ep{day}.json", json.dumps(summary))
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.describe("requests_total", "Requests.")
+    registry.inc("requests_total", (("path", '/a"b'),))
+    registry.inc("requests_total", (("path", '/a"b'),))
+    for value in [0.003, 0.2, 20.0]:
+        registry.observe("latency_seconds", value)
+
+    lines = registry.render().splitlines()
+
+    assert "# HELP requests_total Requests." in lines
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{path="/a\\"b"} 2' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{le="0.005"} 1' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="0.25"} 2' in lines
+    assert 'latency_seconds_bucket{le="10"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_count 3" in lines
+
+
+def test_timed_is_a_no_op_outside_requests():
+    with timed("download"):
+        pass
+
+
+def test_index_request_is_counted_and_split_into_stages(app, client, summaries):
+    response = client.get("/")
+
+    assert response.status_code == 200
+    stages = response.headers["Server-Timing"]
+    for stage in ["storage_list", "download", "json_parse", "filter_sort", "render"]:
+        assert f"{stage};dur=" in stages
+    assert "total;dur=" in stages
+
+    registry = app.extensions["metrics"]
+    labels = (("endpoint", "/"), ("method", "GET"), ("status", "200"))
+    assert registry.counter("http_requests_total", labels) == 1
+    assert (
+        registry.histogram_count(
+            "http_request_stage_seconds", (("endpoint", "/"), ("stage", "download"))
+        )
+        == 1
+    )
+
+    # The catalog is warm now, so nothing is downloaded again
+    response = client.get("/")
+    assert "download;dur=" not in response.headers["Server-Timing"]
+
+
+def test_metrics_endpoint_exposes_request_metrics(client, summaries):
+    client.get("/")
+    client.get("/summary/ep1")
+    client.get("/summary/missing")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert (
+        'http_requests_total{endpoint="/summary/<summary_id>",method="GET",status="404"} 1'
+        in text
+    )
+    assert 'http_request_duration_seconds_count{endpoint="/"} 1' in text
+    assert (
+        'http_request_stage_seconds_count{endpoint="/summary/<summary_id>",'
+        'stage="render"} 1' in text
+    )
+    # Scrapes are not counted themselves
+    assert 'endpoint="/metrics"' not in text
+
+
+def test_metrics_are_off_by_default(storage_dir):
+    app = create_app(TestConfig, {"LOCAL_STORAGE_DIR": storage_dir})
+    client = app.test_client()
+
+    assert client.get("/metrics").status_code == 404
+    assert "Server-Timing" not in client.get("/").headers
+
+
+def test_profiling_writes_one_profile_per_request(storage_dir, tmp_path, summaries):
+    profile_dir = str(tmp_path / "profiles")
+    app = create_app(
+        TestConfig,
+        {
+            "LOCAL_STORAGE_DIR": storage_dir,
+            "METRICS_ENABLED": True,
+            "PROFILING": True,
+            "PROFILE_DIR": profile_dir,
+        },
+    )
+    client = app.test_client()
+
+    client.get("/")
+    client.get("/summary/ep1")
+
+    profiles = os.listdir(profile_dir)
+    assert len(profiles) == 2
+    assert all(name.endswith(".prof") for name in profiles)
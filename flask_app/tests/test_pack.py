@@ -0,0 +1,120 @@
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+from app.catalog import SummaryCatalog
+from app.pack import HEADER, MAGIC, SummaryPack
+from tests.test_catalog import CountingStorage, make_summary, write_manifest
+
+
+def write_pack(storage, documents, compress=True, generation=None):
+    """Write {id: (generation, summary)} in the summarizer's pack format."""
+    ids = sorted(documents, key=lambda summary_id: summary_id.encode("utf-8"))
+    records = [
+        json.dumps(documents[summary_id][1], separators=(",", ":")).encode("utf-8")
+        for summary_id in ids
+    ]
+    if compress:
+        records = [zlib.compress(record) for record in records]
+    offsets = HEADER.size + np.cumsum([0] + [len(record) for record in records])[:-1]
+    position = HEADER.size + sum(len(record) for record in records)
+    padding = -position % 8
+    width = max((len(summary_id.encode("utf-8")) for summary_id in ids), default=1)
+    data = b"".join(
+        [
+            HEADER.pack(MAGIC, int(compress), len(ids), width, 0, position + padding),
+            *records,
+            b"\0" * padding,
+            np.array(offsets, dtype="<u8").tobytes(),
+            np.array([documents[i][0] for i in ids], dtype="<i8").tobytes(),
+            np.array([len(record) for record in records], dtype="<u4").tobytes(),
+            np.array([i.encode("utf-8") for i in ids], dtype=f"S{width}").tobytes(),
+        ]
+    )
+    storage.upload_bytes("summaries.pack", data)
+    if generation is not None:
+        path = os.path.join(storage.root, "summaries.pack")
+        os.utime(path, ns=(generation, generation))
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return CountingStorage(str(tmp_path))
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_summaries_are_read_by_id(storage, compress):
+    documents = {
+        summary_id: (index + 1, make_summary(summary_id))
+        for index, summary_id in enumerate(["ep3", "ep1", "épisode_2"])
+    }
+    write_pack(storage, documents, compress)
+    pack = SummaryPack(storage, "summaries.pack")
+
+    assert len(pack) == 0
+    assert pack.get("ep1") == documents["ep1"][1]
+    assert pack.get("épisode_2", "3") == documents["épisode_2"][1]
+    assert len(pack) == 3
+    assert pack.get("ep1", generation="7") is None
+    assert pack.get("ep2") is None
+    assert pack.get("ep1-with-a-longer-id") is None
+
+
+def test_missing_pack_reads_nothing(storage):
+    assert SummaryPack(storage, "summaries.pack").get("ep1") is None
+
+
+def test_failed_first_load_backs_off_until_the_ttl(storage):
+    storage.upload_bytes("summaries.pack", b"not a pack" * 10)
+    pack = SummaryPack(storage, "summaries.pack", ttl=60)
+    fetches, download_to_file = [], storage.download_to_file
+
+    def counting_download_to_file(name, file):
+        fetches.append(name)
+        return download_to_file(name, file)
+
+    storage.download_to_file = counting_download_to_file
+
+    assert [pack.get("ep1") for _ in range(3)] == [None, None, None]
+    assert fetches == ["summaries.pack"]
+
+
+def test_changed_pack_is_mapped_again_in_background(storage):
+    write_pack(storage, {"ep1": (1, make_summary("ep1"))}, generation=10**18)
+    pack = SummaryPack(storage, "summaries.pack", ttl=0)
+    assert pack.get("ep2") is None
+
+    write_pack(storage, {"ep2": (1, make_summary("ep2"))}, generation=2 * 10**18)
+    pack.get("ep2")
+    for _ in range(100):
+        if pack.get("ep2") is not None:
+            break
+        time.sleep(0.01)
+
+    assert pack.get("ep2")["metadata"]["id"] == "ep2"
+    assert pack.get("ep1") is None
+
+
+def test_catalog_reads_current_summaries_from_the_pack(storage):
+    summaries = [make_summary("ep1"), make_summary("ep2")]
+    for summary in summaries:
+        storage.upload_text(
+            f"summaries/{summary['metadata']['id']}.json", json.dumps(summary)
+        )
+    write_manifest(storage, summaries)
+    # ep2 was rewritten after the pack was built
+    write_pack(storage, {"ep1": (1, summaries[0]), "ep2": (0, summaries[1])})
+    catalog = SummaryCatalog(
+        storage,
+        "summaries/",
+        manifest="manifest.jsonl",
+        pack=SummaryPack(storage, "summaries.pack"),
+    )
+
+    assert catalog.get("ep1")["metadata"]["date"] == "2023-03-27"
+    assert catalog.get("ep2")["metadata"]["date"] == "2023-03-27"
+    assert storage.downloads == ["manifest.jsonl", "summaries/ep2.json"]
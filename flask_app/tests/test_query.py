@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from app.query import (
+    SortedListings,
+    decode_cursor,
+    encode_cursor,
+    page_of_ranked,
+    page_window,
+)
+
+
+def listing(summary_id, date, podcast="Dwarkesh Podcast"):
+    return {"metadata": {"id": summary_id, "date": date, "podcast": podcast}}
+
+
+def ids(page):
+    return [summary["metadata"]["id"] for summary in page.summaries]
+
+
+@pytest.fixture
+def listings():
+    return SortedListings(
+        [
+            listing("ep1", "2023-01-01"),
+            listing("ep2", "2023-02-01", "Latent Space"),
+            listing("ep3", "2023-03-01"),
+            listing("ep4", "2023-03-01", "Latent Space"),
+            listing("ep5", "2023-05-01"),
+        ]
+    )
+
+
+def test_pages_are_newest_first(listings):
+    first = listings.page(per_page=2)
+    third = listings.page(page=3, per_page=2)
+
+    assert (ids(first), first.total) == (["ep5", "ep4"], 5)
+    assert ids(third) == ["ep1"]
+    assert third.next_cursor is None
+    assert ids(listings.page(page=4, per_page=2)) == []
+
+
+def test_pages_are_grouped_by_podcast(listings):
+    page = listings.page("Latent Space", per_page=10)
+
+    assert (ids(page), page.total) == (["ep4", "ep2"], 2)
+    assert listings.page("Unknown").total == 0
+
+
+def test_cursor_continues_after_last_listing(listings):
+    seen, cursor = [], None
+    while True:
+        page = listings.page("Dwarkesh Podcast", per_page=2, cursor=cursor)
+        seen.extend(ids(page))
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert seen == ["ep5", "ep3", "ep1"]
+
+
+def test_cursor_round_trip_and_validation():
+    assert decode_cursor(encode_cursor(("2023-03-01", "ep3"))) == ("2023-03-01", "ep3")
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor("not a cursor")
+
+
+def test_ranked_results_are_paged_best_first():
+    listings = {
+        "ep1": listing("ep1", "2023-01-01"),
+        "ep2": listing("ep2", "2023-02-01", "Latent Space"),
+        "ep3": listing("ep3", "2023-03-01"),
+    }
+    scores = {"ep1": 1.0, "ep2": 2.0, "ep3": 3.0}
+
+    assert ids(page_of_ranked(scores, listings.get)) == ["ep3", "ep2", "ep1"]
+    assert ids(page_of_ranked(scores, listings.get, "Latent Space")) == ["ep2"]
+    second = page_of_ranked(scores, listings.get, page=2, per_page=2)
+    assert ids(second) == ["ep1"]
+    assert second.total == 3
+
+
+def test_page_window_keeps_the_pagination_bar_short():
+    assert page_window(1, 3) == [1, 2, 3]
+    assert page_window(50, 10_000, radius=1) == [1, None, 49, 50, 51, None, 10_000]
+    assert page_window(1, 0) == []
+
+
+def test_page_latency_does_not_grow_with_the_catalog():
+    def page_time(count):
+        listings = SortedListings(
+            listing(f"ep{i}", f"20{10 + i % 14}-01-{1 + i % 28:02d}", f"p{i % 3}")
+            for i in range(count)
+        )
+        start = time.perf_counter()
+        for page in range(1, 201):
+            listings.page("p1", page=page)
+        return (time.perf_counter() - start) / 200
+
+    small, large = page_time(1_000), page_time(100_000)
+
+    assert large < 0.001
+    assert large < small * 10
@@ -0,0 +1,150 @@
+import heapq
+import random
+
+import pytest
+
+from app.search import SearchIndex, rank, tokenize
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.add(
+        "scaling",
+        {
+            "title": "Scaling laws and the path to AGI",
+            "topics": "Scaling laws Compute",
+            "conclusions": "Compute keeps paying off.",
+        },
+    )
+    index.add(
+        "alignment",
+        {
+            "title": "Alignment research",
+            "topics": "Alignment RLHF",
+            "conclusions": "Scaling alone is not enough.",
+            "terms": "RLHF",
+            "quotes": "We need to understand these models.",
+        },
+    )
+    index.add("chips", {"title": "Chips and export controls", "topics": "Compute"})
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Ilya Sutskever's AGI, 2024!") == [
+        "ilya",
+        "sutskever",
+        "s",
+        "agi",
+        "2024",
+    ]
+    assert tokenize(None) == []
+
+
+def test_results_are_ranked_by_field_weight(index):
+    assert index.search("scaling") == ["scaling", "alignment"]
+    assert index.search("chips") == ["chips"]
+    assert index.search("compute") == ["scaling", "chips"]
+
+
+def test_every_query_term_has_to_match(index):
+    assert index.search("scaling rlhf") == ["alignment"]
+    assert index.search("scaling chips") == []
+
+
+def test_prefix_matching_ranks_below_exact_matches(index):
+    index.add("scale", {"title": "Scale"})
+
+    assert index.search("scal") == ["scaling", "scale", "alignment"]
+    assert index.search("scale")[0] == "scale"
+    assert index.search("align") == ["alignment"]
+
+
+def test_quotes_and_terms_are_searchable(index):
+    assert index.search("understand models") == ["alignment"]
+    assert index.search("RLHF") == ["alignment"]
+
+
+def test_documents_are_replaced_and_removed(index):
+    index.add("chips", {"title": "Semiconductors"})
+    index.remove("alignment")
+    index.remove("missing")
+
+    assert index.search("chips") == []
+    assert index.search("semi") == ["chips"]
+    assert index.search("rlhf") == []
+    assert len(index) == 2
+
+
+@pytest.fixture
+def large_index():
+    """5,000 documents that all contain "common" and a few rare words."""
+    rng = random.Random(0)
+    words = [f"word{i}" for i in range(5000)]
+    index = SearchIndex()
+    index.update(
+        (
+            f"ep{doc}",
+            {
+                "title": " ".join(rng.choices(words, k=8) + ["common"]),
+                "conclusions": " ".join(
+                    rng.choices(words, k=40) + ["common"] * (doc % 7)
+                ),
+                "topics": "rare" if doc % 1000 == 0 else "",
+            },
+        )
+        for doc in range(5_000)
+    )
+    return index
+
+
+def test_a_page_of_matches_only_ranks_that_page(large_index, monkeypatch):
+    scores = large_index.scores("common word1")
+    limits = []
+    nlargest = heapq.nlargest
+
+    def counting_nlargest(n, iterable):
+        limits.append(n)
+        return nlargest(n, iterable)
+
+    monkeypatch.setattr(heapq, "nlargest", counting_nlargest)
+    best = rank(scores, 20)
+
+    assert len(scores) > 20
+    assert limits == [20]
+    assert best == sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))[:20]
+
+
+def test_tied_scores_are_ranked_by_id():
+    scores = {f"ep{i}": 1.0 for i in range(100)}
+    scores["ep99"] = 2.0
+
+    assert rank(scores, 3) == ["ep99", "ep0", "ep1"]
+
+
+def test_common_tokens_keep_their_ranking_until_they_change(large_index):
+    scores = large_index.scores("common")
+    expected = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+
+    assert large_index.search("common", limit=20) == expected[:20]
+    ranking = large_index.ranking("common")
+    assert ranking == expected
+    assert large_index.ranking("COMMON") is ranking
+
+    large_index.add("ep0", {"title": "common common common common"})
+    assert large_index.ranking("common") is not ranking
+    assert large_index.search("common", limit=1) == ["ep0"]
+    assert large_index.ranking("word1") is None
+
+
+def test_rare_terms_narrow_common_ones_without_scanning_them(large_index):
+    class Unscannable(dict):
+        def items(self):
+            raise AssertionError("the postings of a common term were scanned")
+
+    large_index._postings["common"] = Unscannable(large_index._postings["common"])
+
+    assert sorted(large_index.search("common rare")) == [
+        f"ep{doc}" for doc in (0, 1000, 2000, 3000, 4000)
+    ]
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+from app.static_site import build_static_site, output_path
+
+
+def make_summary(summary_id, day, podcast="Dwarkesh Podcast"):
+    return {
+        "metadata": {
+            "title": f"Episode {summary_id}",
+            "date": f"{day:02d}-01-2024",
+            "participants": ["Dwarkesh Patel"],
+            "id": summary_id,
+            "podcast": podcast,
+        },
+        "summary": "A summary.",
+        "topics": ["AGI"],
+        "quotes": [],
+        "terms": {},
+        "recommendations": [],
+        "conclusions": "A conclusion.",
+    }
+
+
+def upload(bucket, summary, generation):
+    summary_id = summary["metadata"]["id"]
+    bucket.upload_text(f"summaries/{summary_id}.json", json.dumps(summary))
+    path = os.path.join(bucket.root, "summaries", f"{summary_id}.json")
+    os.utime(path, ns=(generation, generation))
+
+
+@pytest.fixture
+def site(app, bucket, tmp_path):
+    for day in range(1, 13):
+        podcast = "Latent Space" if day % 4 == 0 else "Dwarkesh Podcast"
+        upload(bucket, make_summary(f"ep{day:02d}", day, podcast), generation=1)
+    return str(tmp_path / "site")
+
+
+def read(site, url):
+    with open(os.path.join(site, output_path(url)), encoding="utf-8") as file:
+        return file.read()
+
+
+def test_output_paths():
+    assert output_path("/") == "index.html"
+    assert output_path("/summary/ep1") == os.path.join("summary", "ep1", "index.html")
+    assert output_path("/podcast/Latent%20Space/page/2/") == os.path.join(
+        "podcast", "Latent Space", "page", "2", "index.html"
+    )
+
+
+def test_build_renders_every_summary_and_index_page(app, site):
+    result = build_static_site(app, site)
+
+    assert "/summary/ep01" in result.rendered
+    assert {"/", "/page/2/", "/podcast/Latent%20Space/"} <= set(result.rendered)
+    assert len(result.rendered) == 12 + 2 + 1 + 1
+    assert "Episode ep12" in read(site, "/")
+    assert "Episode ep01" in read(site, "/page/2/")
+    assert 'href="/page/2/"' in read(site, "/")
+    assert "Episode ep08" in read(site, "/podcast/Latent%20Space/")
+    assert os.path.exists(os.path.join(site, "static", "script.js"))
+
+
+def test_rebuild_only_renders_affected_pages(app, bucket, site):
+    build_static_site(app, site)
+
+    changed = make_summary("ep05", 5)
+    changed["metadata"]["title"] = "Rewritten"
+    upload(bucket, changed, generation=2)
+    os.remove(os.path.join(bucket.root, "summaries", "ep01.json"))
+    os.remove(os.path.join(bucket.root, "summaries", "ep02.json"))
+    result = build_static_site(app, site)
+
+    assert sorted(result.rendered) == [
+        "/",
+        "/podcast/Dwarkesh%20Podcast/",
+        "/summary/ep05",
+    ]
+    assert result.removed == ["/page/2/", "/summary/ep01", "/summary/ep02"]
+    assert "Rewritten" in read(site, "/summary/ep05")
+    assert not os.path.exists(os.path.join(site, output_path("/summary/ep01")))
+    assert build_static_site(app, site).rendered == []
+
+
+def test_build_command(app, site, runner):
+    result = runner.invoke(args=["build-static", site])
+
+    assert result.exit_code == 0
+    assert "Rendered 16 pages" in result.output
+    assert os.path.exists(os.path.join(site, "index.html"))
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from app.catalog import SummaryCatalog
+from app.storage import LocalStorage, create_storage
+
+
+class SlowStorage(LocalStorage):
+    """Local storage with a simulated round-trip per download"""
+
+    def __init__(self, root, concurrency, latency=0.02):
+        super().__init__(root, concurrency)
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def download_text(self, name):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return super().download_text(name)
+
+
+def test_cold_catalog_load_keeps_concurrency_transfers_in_flight(tmp_path):
+    storage = SlowStorage(str(tmp_path), concurrency=8)
+    storage.upload_many(
+        {
+            f"summaries/ep{i}.json": f'{{"metadata": {{"id": "ep{i}"}}}}'
+            for i in range(32)
+        }
+    )
+
+    catalog = SummaryCatalog(storage, "summaries/")
+
+    assert len(catalog.summaries()) == 32
+    assert storage.max_in_flight == 8
+
+
+def test_create_storage_selects_the_backend(tmp_path):
+    storage = create_storage(
+        {"STORAGE_BACKEND": "local", "LOCAL_STORAGE_DIR": str(tmp_path)}
+    )
+
+    assert isinstance(storage, LocalStorage) and storage.root == str(tmp_path)
+    with pytest.raises(ValueError, match="Unknown storage backend"):
+        create_storage({"STORAGE_BACKEND": "s3"})
@@ -8,8 +8,10 @@ from app.utils import convert_date, list_files, load_summaries, load_summary_by_
 class MockBlob:
     """Mock GCS blob storage"""
 
-    def __init__(self, name):
+    def __init__(self, name, generation=1, size=0):
         self.name = name
+        self.generation = generation
+        self.size = size
 
 
 @pytest.fixture
@@ -31,7 +33,7 @@ def test_convert_date(input, expected):
     assert convert_date(input) == expected
 
 
-@patch("app.utils.storage.Client")
+@patch("podcast_shared.storage.gcs_client")
 @pytest.mark.parametrize(
     "blobs, expected",
     [
@@ -59,7 +61,7 @@ def test_list_files(MockClient, config, blobs, expected):
     assert files == ["file1.json"]
 
 
-@patch("app.utils.storage.Client")
+@patch("podcast_shared.storage.gcs_client")
 @pytest.mark.parametrize(
     "file_paths, input_summaries, expected_summaries",
     [
@@ -97,7 +99,7 @@ def test_load_summaries(
     assert summaries == expected_summaries
 
 
-@patch("app.utils.storage.Client")
+@patch("podcast_shared.storage.gcs_client")
 @pytest.mark.parametrize(
     "summary_id, input_summary, expected_summary",
     [
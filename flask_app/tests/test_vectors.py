@@ -0,0 +1,150 @@
+import io
+import os
+import time
+
+import numpy as np
+import pytest
+
+from app.storage import LocalStorage
+from app.vectors import (
+    EmbeddingModelMismatch,
+    HashingEmbedder,
+    OpenAIEmbedder,
+    VectorIndex,
+    create_embedder,
+)
+
+
+def write_vectors(storage, rows, model="hashing-64", generation=None):
+    """Write (id, podcast, text) rows in the summarizer's vector file format."""
+    embedder = HashingEmbedder(64)
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        model=np.array(model),
+        ids=np.array([row[0] for row in rows], dtype=str),
+        podcasts=np.array([row[1] for row in rows], dtype=str),
+        vectors=embedder.embed([row[2] for row in rows]).astype(np.float16),
+    )
+    storage.upload_bytes("embeddings.npz", buffer.getvalue())
+    if generation is not None:
+        path = os.path.join(storage.root, "embeddings.npz")
+        os.utime(path, ns=(generation, generation))
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    write_vectors(
+        storage,
+        [
+            ("ep1", "Dwarkesh Podcast", "Scaling laws and compute"),
+            ("ep2", "Latent Space", "Scaling laws for agents"),
+            ("ep3", "Dwarkesh Podcast", "Export controls on chips"),
+        ],
+    )
+    return storage
+
+
+@pytest.fixture
+def index(storage):
+    return VectorIndex(storage, "embeddings.npz", HashingEmbedder(64))
+
+
+def test_search_ranks_by_similarity(index):
+    results = index.search("scaling laws compute", k=2)
+
+    assert [summary_id for summary_id, _ in results] == ["ep1", "ep2"]
+    assert results[0][1] > results[1][1]
+
+
+def test_search_filters_by_podcast(index):
+    results = index.search("scaling laws", k=5, podcast="Dwarkesh Podcast")
+
+    assert [summary_id for summary_id, _ in results] == ["ep1", "ep3"]
+    assert index.search("scaling", podcast="Unknown") == []
+
+
+def test_queries_are_scored_together(index):
+    queries = HashingEmbedder(64).embed(["export controls", "agents"])
+
+    results = index.top_k(queries, k=1)
+
+    assert [row[0][0] for row in results] == ["ep3", "ep2"]
+
+
+def test_openai_client_is_created_on_first_query():
+    config = {"EMBEDDING_PROVIDER": "openai", "EMBEDDING_MODEL": "model"}
+
+    assert create_embedder(config) is None
+    embedder = create_embedder({**config, "OPENAI_API_KEY": "key"})
+    assert isinstance(embedder, OpenAIEmbedder)
+    assert embedder._client is None
+
+
+def test_missing_vector_file_gives_no_results(tmp_path):
+    index = VectorIndex(
+        LocalStorage(str(tmp_path)), "embeddings.npz", HashingEmbedder(64)
+    )
+
+    assert index.search("scaling") == []
+
+
+def test_changed_vector_file_is_reloaded_in_background(storage):
+    write_vectors(storage, [("ep1", "", "Scaling")], generation=1)
+    index = VectorIndex(storage, "embeddings.npz", HashingEmbedder(64), ttl=0)
+    assert len(index.search("scaling")) == 1
+
+    write_vectors(storage, [("ep1", "", "Scaling"), ("ep2", "", "Chips")], generation=2)
+    index.search("scaling")
+    for _ in range(100):
+        if len(index) == 2:
+            break
+        time.sleep(0.01)
+
+    assert len(index.search("scaling")) == 2
+
+
+def test_vectors_of_another_model_are_rejected(storage):
+    write_vectors(storage, [("ep1", "", "Scaling")], model="text-embedding-3-small")
+    index = VectorIndex(storage, "embeddings.npz", HashingEmbedder(64))
+
+    with pytest.raises(EmbeddingModelMismatch, match="text-embedding-3-small"):
+        index.search("scaling")
+    downloads, download = [], storage.download_bytes
+    storage.download_bytes = lambda name: downloads.append(name) or download(name)
+    with pytest.raises(EmbeddingModelMismatch):
+        index.search("scaling")
+    assert downloads == []
+
+    write_vectors(storage, [("ep1", "", "Scaling")], model="hashing-64")
+    index.refresh()
+    assert index.search("scaling")[0][0] == "ep1"
+
+
+def test_top_k_stays_fast_for_large_archives(tmp_path):
+    rng = np.random.default_rng(0)
+    count, dimensions = 100_000, 256
+    vectors = rng.standard_normal((count, dimensions), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        model=np.array(f"hashing-{dimensions}"),
+        ids=np.array([f"ep{i}" for i in range(count)], dtype=str),
+        podcasts=np.array(["Dwarkesh Podcast", "Latent Space"] * (count // 2)),
+        vectors=vectors.astype(np.float16),
+    )
+    storage = LocalStorage(str(tmp_path))
+    storage.upload_bytes("embeddings.npz", buffer.getvalue())
+    index = VectorIndex(storage, "embeddings.npz", HashingEmbedder(dimensions))
+    index.refresh()
+
+    queries = vectors[:40:2]
+    start = time.perf_counter()
+    for query in queries:
+        results = index.top_k(query[None, :], k=10, podcast="Dwarkesh Podcast")
+    elapsed = (time.perf_counter() - start) / len(queries)
+
+    assert results[0][0] == ("ep38", pytest.approx(1.0, abs=1e-2))
+    assert elapsed < 0.05
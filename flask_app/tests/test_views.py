@@ -1,5 +1,14 @@
+import copy
+import io
+import json
+import os
+
+import numpy as np
 import pytest
-from unittest.mock import patch
+
+from app import create_app
+from app.config import ProdConfig, TestConfig
+from app.vectors import HashingEmbedder
 
 
 @pytest.fixture
@@ -51,37 +60,183 @@ def summary_data():
     }
 
 
-@patch("app.views.load_summaries")
-@patch("app.views.list_files")
-def test_index(mock_list_files, mock_load_summaries, client, summary_data):
-    mock_list_files.return_value = ["summaries/summary1.json"]
-    mock_load_summaries.return_value = [summary_data]
+def upload_summary(bucket, summary):
+    summary_id = summary["metadata"]["id"]
+    bucket.upload_text(f"summaries/{summary_id}.json", json.dumps(summary))
+
+
+def test_index(client, bucket, summary_data):
+    upload_summary(bucket, summary_data)
     response = client.get("/?query=Ilya Sutskever")
     assert response.status_code == 200
     assert b"Ilya Sutskever" in response.data
 
 
-@patch("app.views.load_summaries")
-@patch("app.views.list_files")
-def test_index_pagination(mock_list_files, mock_load_summaries, client, summary_data):
-    mock_list_files.return_value = ["summaries/summary1.json"] * 20
-    mock_load_summaries.return_value = [summary_data.copy() for _ in range(20)]
+def test_index_pagination(client, bucket, summary_data):
+    for i in range(20):
+        summary = copy.deepcopy(summary_data)
+        summary["metadata"]["id"] = f"dwarkesh_podcast_{i}"
+        upload_summary(bucket, summary)
     response = client.get("/?page=2")
     assert response.status_code == 200
     assert b"Ilya Sutskever" in response.data
 
 
-@patch("app.views.load_summary_by_id")
-def test_summary_valid_id(mock_load_summary_by_id, client, summary_data):
-    mock_load_summary_by_id.return_value = summary_data
+def test_summary_valid_id(client, bucket, summary_data):
+    upload_summary(bucket, summary_data)
     response = client.get("/summary/dwarkesh_podcast_230327")
     assert response.status_code == 200
     assert b"Ilya Sutskever" in response.data
 
 
-@patch("app.views.load_summary_by_id")
-def test_summary_invalid_id(mock_load_summary_by_id, client, summary_data):
-    mock_load_summary_by_id.return_value = None
+def test_summary_invalid_id(client, bucket, summary_data):
+    upload_summary(bucket, summary_data)
     response = client.get("/summary/invalid_id")
     assert response.status_code == 404
     assert "Summary not found" in response.get_data(as_text=True)
+
+
+def test_index_search_ranks_title_matches_first(client, bucket, summary_data):
+    upload_summary(bucket, summary_data)
+    other = copy.deepcopy(summary_data)
+    other["metadata"]["id"] = "latent_space_240101"
+    other["metadata"]["title"] = "Interpretability of language models"
+    upload_summary(bucket, other)
+
+    response = client.get("/?query=align")
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert text.index("Building AGI") < text.index("Interpretability")
+
+
+def test_search_endpoint_returns_closest_summaries(client, bucket, summary_data):
+    upload_summary(bucket, summary_data)
+    embedder = HashingEmbedder(256)
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        model=np.array(embedder.model),
+        ids=np.array(["dwarkesh_podcast_230327", "deleted_episode"]),
+        podcasts=np.array(["Dwarkesh Podcast", "Dwarkesh Podcast"]),
+        vectors=embedder.embed(["Time to AGI", "AGI"]).astype(np.float16),
+    )
+    bucket.upload_bytes("embeddings.npz", buffer.getvalue())
+
+    response = client.get("/search?query=agi&podcast=Dwarkesh Podcast")
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["id"] for result in results] == ["dwarkesh_podcast_230327"]
+    assert results[0]["date"] == "2023-03-27"
+    assert client.get("/search?query=agi&podcast=Latent Space").json["results"] == []
+    assert client.get("/search?query=agi&k=many").status_code == 200
+
+
+def test_search_without_an_embedding_provider_is_unavailable(
+    monkeypatch, storage_dir, bucket, summary_data
+):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    upload_summary(bucket, summary_data)
+    overrides = {"STORAGE_BACKEND": "local", "LOCAL_STORAGE_DIR": storage_dir}
+    overrides["OPENAI_API_KEY"] = None
+    app = create_app(TestConfig, {**overrides, "EMBEDDING_PROVIDER": "openai"})
+
+    response = app.test_client().get("/search?query=agi")
+    assert response.status_code == 503
+    assert response.get_json()["error"] == "Semantic search is not configured"
+    assert app.test_client().get("/").status_code == 200
+    assert create_app(ProdConfig, overrides).extensions["vector_index"] is None
+
+
+def test_search_with_vectors_of_another_model_is_unavailable(
+    client, bucket, summary_data, caplog
+):
+    upload_summary(bucket, summary_data)
+    embedder = HashingEmbedder(64)
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        model=np.array(embedder.model),
+        ids=np.array(["dwarkesh_podcast_230327"]),
+        podcasts=np.array(["Dwarkesh Podcast"]),
+        vectors=embedder.embed(["Time to AGI"]).astype(np.float16),
+    )
+    bucket.upload_bytes("embeddings.npz", buffer.getvalue())
+
+    responses = [client.get("/search?query=agi") for _ in range(2)]
+
+    assert [response.status_code for response in responses] == [503, 503]
+    assert responses[0].get_json() == responses[1].get_json()
+    assert "was embedded with hashing-64" in caplog.text
+
+
+def test_index_cursor_links_to_the_next_page(client, bucket, summary_data):
+    for day in range(1, 13):
+        summary = copy.deepcopy(summary_data)
+        summary["metadata"]["id"] = f"dwarkesh_podcast_{day}"
+        summary["metadata"]["title"] = f"Episode {day}"
+        summary["metadata"]["date"] = f"{day:02d}-01-2024"
+        upload_summary(bucket, summary)
+
+    first = client.get("/").get_data(as_text=True)
+    next_url = first.split('rel="next"')[1].split('href="')[1].split('"')[0]
+    second = client.get(next_url.replace("&amp;", "&")).get_data(as_text=True)
+
+    assert "Episode 12" in first and "Episode 3<" in first
+    assert "Episode 2<" in second and "Episode 1<" in second
+    assert "Episode 12" not in second
+    assert client.get("/?cursor=invalid").status_code == 400
+
+
+def test_summary_sets_validators_and_cache_headers(client, bucket, summary_data):
+    upload_summary(bucket, summary_data)
+
+    response = client.get("/summary/dwarkesh_podcast_230327")
+
+    assert response.headers["ETag"].startswith('"dwarkesh_podcast_230327-')
+    assert response.headers["Last-Modified"]
+    assert "public" in response.headers["Cache-Control"]
+    assert "max-age=3600" in response.headers["Cache-Control"]
+
+
+def test_conditional_summary_requests_skip_the_body(
+    app, client, bucket, summary_data, monkeypatch
+):
+    upload_summary(bucket, summary_data)
+    first = client.get("/summary/dwarkesh_podcast_230327")
+    catalog = app.extensions["summary_catalog"]
+    monkeypatch.setattr(catalog, "get", lambda summary_id: pytest.fail("fetched"))
+
+    by_etag = client.get(
+        "/summary/dwarkesh_podcast_230327",
+        headers={"If-None-Match": first.headers["ETag"]},
+    )
+    by_date = client.get(
+        "/summary/dwarkesh_podcast_230327",
+        headers={"If-Modified-Since": first.headers["Last-Modified"]},
+    )
+    repeat = client.get("/summary/dwarkesh_podcast_230327")
+
+    assert (by_etag.status_code, by_etag.data) == (304, b"")
+    assert by_date.status_code == 304
+    assert repeat.status_code == 200 and repeat.data == first.data
+
+
+def test_rewritten_summary_gets_a_new_etag(app, client, bucket, summary_data):
+    upload_summary(bucket, summary_data)
+    first = client.get("/summary/dwarkesh_podcast_230327")
+
+    summary_data["metadata"]["title"] = "Rewritten title"
+    upload_summary(bucket, summary_data)
+    path = os.path.join(bucket.root, "summaries", "dwarkesh_podcast_230327.json")
+    os.utime(path, ns=(2 * 10**18, 2 * 10**18))
+    app.extensions["summary_catalog"].refresh()
+    second = client.get(
+        "/summary/dwarkesh_podcast_230327",
+        headers={"If-None-Match": first.headers["ETag"]},
+    )
+
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert b"Rewritten title" in second.data
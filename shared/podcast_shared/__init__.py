@@ -0,0 +1,6 @@
+"""Code shared by the summarizer and the Flask app.
+
+Installed into both environments with ``pip install -e shared``; the Flask
+app's deploy script copies it next to the app, since App Engine only uploads
+that directory.
+"""
@@ -0,0 +1,24 @@
+import re
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Titles dropped from the start of participant names
+HONORIFICS = {"dr", "mr", "mrs", "ms", "prof", "professor", "sir"}
+
+
+def entity_key(name: str, kind: str = "topic") -> str:
+    """Normalize a topic, term or person name to the key it is indexed under.
+
+    Case, accents, punctuation and spacing are ignored, and titles such as
+    "Dr." are dropped from people's names, so "Scaling Laws" and "scaling
+    laws." or "Dr. Kurt Gödel" and "Kurt Godel" share a key. Keys are
+    lowercase words joined by hyphens and double as URL segments. The
+    summarizer indexes names with it and the web app links them with it.
+    """
+    decomposed = unicodedata.normalize("NFKD", str(name).casefold())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    tokens = TOKEN_PATTERN.findall(stripped)
+    if kind == "person":
+        while len(tokens) > 1 and tokens[0] in HONORIFICS:
+            tokens = tokens[1:]
+    return "-".join(tokens)
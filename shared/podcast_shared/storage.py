@@ -0,0 +1,260 @@
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, TypeVar
+
+import google.auth
+from google.api_core.exceptions import PreconditionFailed
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import storage
+from requests.adapters import HTTPAdapter
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_client: Optional[storage.Client] = None
+_session: Optional[AuthorizedSession] = None
+_pool_size = 0
+_client_lock = threading.Lock()
+
+
+def gcs_client(max_connections: int = 32) -> storage.Client:
+    """Return the process-wide GCS client, creating it on first use.
+
+    The client is handed an authorized session whose adapter keeps up to
+    ``max_connections`` connections alive, so concurrent transfers reuse
+    connections instead of opening new ones. A caller asking for more
+    connections than the pool has grows it, so the pool always fits the
+    largest request made so far.
+    """
+    global _client, _session, _pool_size
+    with _client_lock:
+        if _client is None:
+            credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+            _session = AuthorizedSession(credentials)
+            # Without a project in the credentials the client looks it up
+            kwargs = {"project": project} if project else {}
+            _client = storage.Client(credentials=credentials, _http=_session, **kwargs)
+        if max_connections > _pool_size:
+            _session.mount(
+                "https://",
+                HTTPAdapter(
+                    pool_connections=max_connections, pool_maxsize=max_connections
+                ),
+            )
+            _pool_size = max_connections
+        return _client
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    """Name and version of a stored object, as returned by a listing."""
+
+    name: str
+    generation: str
+    size: int
+
+
+class _BulkTransfers:
+    """Bulk downloads and uploads on top of the single-object methods.
+
+    At most ``concurrency`` transfers are in flight, so moving N objects
+    takes about N / concurrency round-trips.
+    """
+
+    concurrency = 16
+
+    def _map(self, function: Callable[[T], R], items: List[T]) -> List[R]:
+        if self.concurrency <= 1 or len(items) <= 1:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(
+            max_workers=min(self.concurrency, len(items)),
+            thread_name_prefix="storage",
+        ) as pool:
+            return list(pool.map(function, items))
+
+    def download_many(self, names: Iterable[str]) -> Dict[str, str]:
+        """Download several objects concurrently, keyed by name."""
+        names = list(names)
+        return dict(zip(names, self._map(self.download_text, names)))
+
+    def upload_many(self, texts: Dict[str, str]):
+        """Upload several objects concurrently."""
+        self._map(lambda item: self.upload_text(*item), list(texts.items()))
+
+
+class GCSStorage(_BulkTransfers):
+    """Read and write objects in a Google Cloud Storage bucket.
+
+    Every instance shares the process-wide client from ``gcs_client``, with
+    a connection pool at least as large as its ``concurrency``.
+    """
+
+    def __init__(
+        self, bucket_name: str, client: storage.Client = None, concurrency: int = 16
+    ):
+        self.concurrency = concurrency
+        self.bucket = (client or gcs_client(max(concurrency, 10))).bucket(bucket_name)
+
+    def list_blobs(self, prefix: str) -> List[BlobInfo]:
+        """List objects under a prefix together with their generation."""
+        return [
+            BlobInfo(blob.name, str(blob.generation), blob.size or 0)
+            for blob in self.bucket.list_blobs(prefix=prefix)
+        ]
+
+    def list_names(self, prefix: str) -> List[str]:
+        """List the names of the objects under a prefix."""
+        return [blob.name for blob in self.bucket.list_blobs(prefix=prefix)]
+
+    def list_generations(self, prefix: str) -> Dict[str, str]:
+        """Map the names of the objects under a prefix to their generation."""
+        return {
+            blob.name: str(blob.generation)
+            for blob in self.bucket.list_blobs(prefix=prefix)
+        }
+
+    def stat(self, name: str) -> Optional[BlobInfo]:
+        """Return the generation and size of an object, or None if it is missing."""
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            return None
+        return BlobInfo(blob.name, str(blob.generation), blob.size or 0)
+
+    def generation(self, name: str) -> Optional[int]:
+        """Return the generation of an object, or None if it does not exist."""
+        blob = self.bucket.get_blob(name)
+        return None if blob is None else blob.generation
+
+    def modified_at(self, generation: str) -> Optional[datetime]:
+        """Return when an object generation was written, in microseconds since the epoch."""
+        try:
+            return datetime.fromtimestamp(int(generation) / 1e6, timezone.utc)
+        except (TypeError, ValueError):
+            return None
+
+    def download_text(self, name: str) -> str:
+        """Download an object and decode it as text."""
+        return self.bucket.blob(name).download_as_text()
+
+    def download_bytes(self, name: str) -> bytes:
+        """Download an object as raw bytes."""
+        return self.bucket.blob(name).download_as_bytes()
+
+    def download_to_file(self, name: str, file: BinaryIO):
+        """Stream an object into an open binary file."""
+        self.bucket.blob(name).download_to_file(file)
+
+    def upload_text(
+        self, name: str, text: str, if_generation_match: Optional[int] = None
+    ) -> storage.Blob:
+        """Upload text, as JSON for ``.json`` objects, and return the blob.
+
+        With ``if_generation_match`` the upload only succeeds while the object
+        is at that generation, 0 meaning that it must not exist yet.
+        """
+        content_type = "application/json" if name.endswith(".json") else "text/plain"
+        blob = self.bucket.blob(name)
+        blob.upload_from_string(
+            text, content_type=content_type, if_generation_match=if_generation_match
+        )
+        return blob
+
+
+class LocalStorage(_BulkTransfers):
+    """Filesystem stand-in for a bucket, used for tests and offline runs.
+
+    Object names map to paths below ``root`` and the file's modification time
+    plays the role of the GCS generation.
+    """
+
+    def __init__(self, root: str, concurrency: int = 16):
+        self.root = root
+        self.concurrency = concurrency
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split("/"))
+
+    def list_blobs(self, prefix: str) -> List[BlobInfo]:
+        """List files whose relative path starts with the prefix."""
+        blobs = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if name.startswith(prefix):
+                    stat = os.stat(path)
+                    blobs.append(BlobInfo(name, str(stat.st_mtime_ns), stat.st_size))
+        return sorted(blobs, key=lambda blob: blob.name)
+
+    def list_names(self, prefix: str) -> List[str]:
+        """List files whose relative path starts with the prefix."""
+        return [blob.name for blob in self.list_blobs(prefix)]
+
+    def list_generations(self, prefix: str) -> Dict[str, str]:
+        """Map files under a prefix to their modification time, as generation."""
+        return {blob.name: blob.generation for blob in self.list_blobs(prefix)}
+
+    def stat(self, name: str) -> Optional[BlobInfo]:
+        """Return the modification time and size of a file, or None if it is missing."""
+        try:
+            stat = os.stat(self._path(name))
+        except FileNotFoundError:
+            return None
+        return BlobInfo(name, str(stat.st_mtime_ns), stat.st_size)
+
+    def generation(self, name: str) -> Optional[int]:
+        """Return a file's modification time as generation, or None if missing."""
+        try:
+            return os.stat(self._path(name)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def modified_at(self, generation: str) -> Optional[datetime]:
+        """Return the modification time that serves as a file's generation."""
+        try:
+            return datetime.fromtimestamp(int(generation) / 1e9, timezone.utc)
+        except (TypeError, ValueError):
+            return None
+
+    def download_text(self, name: str) -> str:
+        """Read a file and return its content."""
+        with open(self._path(name), "r", encoding="utf-8") as file:
+            return file.read()
+
+    def download_bytes(self, name: str) -> bytes:
+        """Read a file as raw bytes."""
+        with open(self._path(name), "rb") as file:
+            return file.read()
+
+    def download_to_file(self, name: str, file: BinaryIO):
+        """Copy a file into an open binary file."""
+        with open(self._path(name), "rb") as source:
+            shutil.copyfileobj(source, file)
+
+    def upload_text(
+        self, name: str, text: str, if_generation_match: Optional[int] = None
+    ):
+        """Write a file, creating intermediate directories as needed.
+
+        The ``if_generation_match`` precondition is checked as in a bucket,
+        but not atomically.
+        """
+        if if_generation_match is not None and if_generation_match != (
+            self.generation(name) or 0
+        ):
+            raise PreconditionFailed(f"{name} is not at {if_generation_match}")
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+    def upload_bytes(self, name: str, data: bytes):
+        """Write raw bytes to a file, creating intermediate directories as needed."""
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(data)
@@ -0,0 +1,9 @@
+from podcast_shared.entities import entity_key
+
+
+def test_entity_key_ignores_case_accents_punctuation_and_titles():
+    assert entity_key("Scaling Laws") == entity_key("  scaling-laws. ")
+    assert entity_key("Gödel's theorem") == "godel-s-theorem"
+    assert entity_key("Dr. Kurt Gödel", "person") == "kurt-godel"
+    assert entity_key("Dr. Kurt Gödel") == "dr-kurt-godel"
+    assert entity_key("Dr.", "person") == "dr"
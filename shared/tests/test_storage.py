@@ -0,0 +1,103 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from google.api_core.exceptions import PreconditionFailed
+
+from podcast_shared import storage as storage_module
+from podcast_shared.storage import GCSStorage, LocalStorage, gcs_client
+
+
+class SlowStorage(LocalStorage):
+    """Local storage with a simulated round-trip per download"""
+
+    def __init__(self, root, concurrency, latency=0.02):
+        super().__init__(root, concurrency)
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def download_text(self, name):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return super().download_text(name)
+
+
+@pytest.fixture
+def pooled_client():
+    with patch.object(storage_module, "_client", None), patch.object(
+        storage_module, "_pool_size", 0
+    ), patch("podcast_shared.storage.AuthorizedSession") as MockSession, patch(
+        "podcast_shared.storage.google.auth.default",
+        return_value=("credentials", "project"),
+    ), patch("podcast_shared.storage.storage.Client") as MockClient:
+        yield MockClient, MockSession.return_value
+
+
+def test_bulk_transfers_round_trip(tmp_path):
+    storage = LocalStorage(str(tmp_path), concurrency=4)
+    texts = {f"summaries/ep{i}.json": f'{{"id": {i}}}' for i in range(10)}
+
+    storage.upload_many(texts)
+
+    assert storage.list_names("summaries/") == sorted(texts)
+    assert [blob.name for blob in storage.list_blobs("summaries/")] == sorted(texts)
+    assert storage.download_many(reversed(list(texts))) == texts
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_downloads_in_flight_are_bounded(tmp_path, concurrency):
+    storage = SlowStorage(str(tmp_path), concurrency)
+    storage.upload_many({f"ep{i}.json": "{}" for i in range(8)})
+
+    storage.download_many(f"ep{i}.json" for i in range(8))
+
+    assert storage.max_in_flight == concurrency
+
+
+def test_local_upload_checks_the_generation_precondition(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+
+    storage.upload_text("summaries/ep1.json", "{}", if_generation_match=0)
+    generation = storage.generation("summaries/ep1.json")
+
+    with pytest.raises(PreconditionFailed):
+        storage.upload_text("summaries/ep1.json", "{}", if_generation_match=0)
+    storage.upload_text("summaries/ep1.json", "[]", if_generation_match=generation)
+    assert storage.download_text("summaries/ep1.json") == "[]"
+    assert storage.generation("summaries/ep2.json") is None
+    assert storage.stat("summaries/ep1.json").generation == str(
+        storage.generation("summaries/ep1.json")
+    )
+
+
+def test_gcs_storages_share_one_pooled_client(pooled_client):
+    MockClient, session = pooled_client
+
+    first = GCSStorage("bucket-a")
+    second = GCSStorage("bucket-b", concurrency=4)
+
+    MockClient.assert_called_once_with(
+        credentials="credentials", _http=session, project="project"
+    )
+    session.mount.assert_called_once()
+    assert session.mount.call_args.args[1]._pool_maxsize == 16
+    assert first.bucket is not None and second.concurrency == 4
+
+
+def test_the_pool_grows_to_the_largest_request(pooled_client):
+    MockClient, session = pooled_client
+
+    gcs_client(16)
+    gcs_client(64)
+    gcs_client(32)
+
+    MockClient.assert_called_once()
+    sizes = [call.args[1]._pool_maxsize for call in session.mount.call_args_list]
+    assert sizes == [16, 64]
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from openai import OpenAI
+
+# Batch states after which polling stops without results
+FAILED_STATES = {"failed"}
+# Batch states after which polling stops with the results of finished requests
+PARTIAL_STATES = {"expired", "cancelled"}
+# Limits of one Batch API input file
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+
+
+def parse_batch_output(text: str) -> Dict[str, Optional[str]]:
+    """Map each ``custom_id`` of a batch output file to its message content.
+
+    Requests that failed or did not finish map to None.
+    """
+    results = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        response = row.get("response") or {}
+        content = None
+        if response.get("status_code") == 200:
+            choice = response["body"]["choices"][0]
+            if choice.get("finish_reason", "stop") == "stop":
+                content = choice["message"]["content"]
+        results[row["custom_id"]] = content
+    return results
+
+
+class OpenAIBatchBackend:
+    """Run request files through the OpenAI Batch API."""
+
+    def __init__(self, client: OpenAI):
+        self.client = client
+
+    def submit(self, requests_path: str) -> str:
+        """Upload a JSONL request file and start a batch, returning its ID."""
+        with open(requests_path, "rb") as file:
+            uploaded = self.client.files.create(file=file, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        batch = self.client.batches.retrieve(batch_id)
+        results = {}
+        for file_id in [batch.output_file_id, batch.error_file_id]:
+            if file_id:
+                results.update(
+                    parse_batch_output(self.client.files.content(file_id).text)
+                )
+        return results
+
+
+class LocalBatchBackend:
+    """File-based stand-in for the Batch API, used for tests and offline runs.
+
+    Request files are copied to ``directory`` and answered with ``client``
+    the first time their status is polled; the output file is written in the
+    Batch API format.
+    """
+
+    def __init__(self, directory: str, client: Any):
+        self.directory = directory
+        self.client = client
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, batch_id: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{batch_id}.{kind}.jsonl")
+
+    def submit(self, requests_path: str) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        with open(requests_path, "r", encoding="utf-8") as source, open(
+            self._path(batch_id, "input"), "w", encoding="utf-8"
+        ) as target:
+            target.write(source.read())
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        if os.path.exists(self._path(batch_id, "output")):
+            return "completed"
+        with open(self._path(batch_id, "input"), "r", encoding="utf-8") as file:
+            requests = [json.loads(line) for line in file if line.strip()]
+        with open(self._path(batch_id, "output"), "w", encoding="utf-8") as file:
+            for request in requests:
+                row = {"custom_id": request["custom_id"], "response": None}
+                try:
+                    response = self.client.chat.completions.create(**request["body"])
+                    choice = response.choices[0]
+                    row["response"] = {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [
+                                {
+                                    "message": {
+                                        "role": "assistant",
+                                        "content": choice.message.content,
+                                    },
+                                    "finish_reason": getattr(
+                                        choice, "finish_reason", "stop"
+                                    ),
+                                }
+                            ]
+                        },
+                    }
+                except Exception as exc:
+                    row["error"] = {"message": str(exc)}
+                file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return "in_progress"
+
+    def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        with open(self._path(batch_id, "output"), "r", encoding="utf-8") as file:
+            return parse_batch_output(file.read())
+
+
+def split_requests(
+    lines: Dict[str, str], max_requests: int, max_bytes: int
+) -> List[List[str]]:
+    """Group request lines, keyed by custom ID, into files within the limits."""
+    parts: List[List[str]] = []
+    size = 0
+    for custom_id, line in lines.items():
+        line_bytes = len(line.encode("utf-8")) + 1
+        if not parts or len(parts[-1]) >= max_requests or size + line_bytes > max_bytes:
+            parts.append([])
+            size = 0
+        parts[-1].append(custom_id)
+        size += line_bytes
+    return parts
+
+
+def _part_path(requests_path: str, attempt: int, index: int, count: int) -> str:
+    if attempt == 0 and count == 1:
+        return requests_path
+    root, extension = os.path.splitext(requests_path)
+    suffix = f"-{index}" if count > 1 else ""
+    if attempt:
+        suffix = f"-retry{attempt}{suffix}"
+    return f"{root}{suffix}{extension}"
+
+
+def run_batch(
+    backend,
+    requests: Dict[str, Dict[str, Any]],
+    requests_path: str,
+    poll_interval: float = 60,
+    sleep: Callable[[float], None] = time.sleep,
+    checkpoints=None,
+    max_requests: int = MAX_BATCH_REQUESTS,
+    max_bytes: int = MAX_BATCH_BYTES,
+    max_resubmits: int = 2,
+) -> Dict[str, Optional[str]]:
+    """Submit request bodies keyed by custom ID as batches and wait for them.
+
+    The requests are written to ``requests_path`` in the Batch API JSONL
+    format, split into several files when they exceed the per-batch limits.
+    With a ``checkpoints`` store every submitted batch is recorded under the
+    hash of its file, so a run restarted with the same requests polls the
+    batch again instead of submitting it twice. The finished requests of an
+    expired or cancelled batch are kept and the others are submitted again,
+    up to ``max_resubmits`` times. Returns the content of every response, or
+    None for requests that failed.
+    """
+    directory = os.path.dirname(requests_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lines = {
+        custom_id: json.dumps(
+            {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            },
+            ensure_ascii=False,
+        )
+        for custom_id, body in requests.items()
+    }
+
+    results: Dict[str, Optional[str]] = {}
+    remaining = list(lines)
+    for attempt in range(max_resubmits + 1):
+        parts = split_requests(
+            {custom_id: lines[custom_id] for custom_id in remaining},
+            max_requests,
+            max_bytes,
+        )
+        batches = {}
+        for index, part in enumerate(parts):
+            text = "".join(lines[custom_id] + "\n" for custom_id in part)
+            path = _part_path(requests_path, attempt, index, len(parts))
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(text)
+            request_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            batch_id = checkpoints.batch(request_hash) if checkpoints else None
+            if batch_id is None:
+                batch_id = backend.submit(path)
+                if checkpoints is not None:
+                    checkpoints.save_batch(request_hash, batch_id)
+                print(f"Submitted batch {batch_id} with {len(part)} requests.")
+            else:
+                print(f"Resuming batch {batch_id} with {len(part)} requests.")
+            batches[batch_id] = (request_hash, part)
+
+        # Poll every batch of this round until each has ended
+        statuses: Dict[str, str] = {}
+        while True:
+            for batch_id in batches.keys() - statuses.keys():
+                status = backend.status(batch_id)
+                if status == "completed" or status in PARTIAL_STATES:
+                    statuses[batch_id] = status
+                elif status in FAILED_STATES:
+                    if checkpoints is not None:
+                        checkpoints.drop_batch(batches[batch_id][0])
+                    raise RuntimeError(f"Batch {batch_id} ended with status {status}")
+            if len(statuses) == len(batches):
+                break
+            sleep(poll_interval)
+
+        remaining = []
+        for batch_id, (request_hash, part) in batches.items():
+            batch_results = backend.results(batch_id)
+            for custom_id in part:
+                results[custom_id] = batch_results.get(custom_id)
+            if statuses[batch_id] in PARTIAL_STATES:
+                remaining += [
+                    custom_id for custom_id in part if results[custom_id] is None
+                ]
+            if checkpoints is not None:
+                checkpoints.drop_batch(request_hash)
+        if not remaining:
+            break
+        if attempt < max_resubmits:
+            print(f"Submitting {len(remaining)} unfinished requests again.")
+
+    return {custom_id: results.get(custom_id) for custom_id in requests}
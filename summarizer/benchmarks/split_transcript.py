@@ -0,0 +1,104 @@
+"""Compare the character and token splitters on large synthetic transcripts.
+
+Run from the summarizer directory:
+
+    python benchmarks/split_transcript.py --size-mb 20
+
+For every transcript style the table shows the number of chunks, the mean and
+maximum share of the token budget each chunk uses, the number of chunks over
+budget and the time taken to split.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import split_transcript, split_transcript_tokens, token_counter  # noqa: E402
+
+SPEAKERS = ["Dwarkesh Patel", "Ilya Sutskever", "Swyx", "Alessio Fanelli"]
+WORDS = {
+    "english": "the model scaling laws data compute alignment we think really "
+    "interesting question about training inference research".split(),
+    "german": "Rechenleistung Skalierungsgesetze Trainingsdaten Sprachmodell "
+    "Ausrichtungsforschung Wahrscheinlichkeitsverteilung und die der".split(),
+    "chinese": "模型 扩展 定律 数据 计算 对齐 我们 认为 非常 有趣 的 问题 训练 推理 研究".split(),
+}
+
+
+def synthetic_transcript(style: str, size: int, seed: int = 0) -> str:
+    """Generate roughly ``size`` characters of speaker turns in one style."""
+    rng = random.Random(seed)
+    words = WORDS["english" if style == "monologue" else style]
+    separator = "" if style == "chinese" else " "
+    parts, length = [], 0
+    while length < size:
+        sentences = [
+            separator.join(rng.choices(words, k=rng.randint(5, 25))) + "."
+            for _ in range(rng.randint(1, 12))
+        ]
+        if style == "monologue":
+            turn = " ".join(sentences) + " "
+        else:
+            turn = f"{rng.choice(SPEAKERS)}: {' '.join(sentences)}\n"
+            if rng.random() < 0.2:
+                turn += "\n"
+        parts.append(turn)
+        length += len(turn)
+    return "".join(parts)
+
+
+def measure(
+    name: str,
+    split: Callable[[], List[str]],
+    count_tokens: Callable[[str], int],
+    max_tokens: int,
+) -> str:
+    start = time.perf_counter()
+    chunks = split()
+    elapsed = time.perf_counter() - start
+    usage = [count_tokens(chunk) / max_tokens for chunk in chunks]
+    over = sum(share > 1 for share in usage)
+    return (
+        f"{name:<8} {len(chunks):>7} {sum(usage) / len(usage):>9.1%} "
+        f"{max(usage):>9.1%} {over:>6} {elapsed:>9.3f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--model", default="gpt-3.5-turbo-0125")
+    parser.add_argument("--max-tokens", type=int, default=14000)
+    parser.add_argument("--max-chars", type=int, default=56000)
+    args = parser.parse_args()
+
+    count_tokens = token_counter(args.model)
+    size = int(args.size_mb * 1024 * 1024)
+    print(
+        f"{'style':<10} {'splitter':<8} {'chunks':>7} {'mean use':>9} "
+        f"{'max use':>9} {'over':>6} {'seconds':>9}"
+    )
+    for style in ["english", "german", "chinese", "monologue"]:
+        transcript = synthetic_transcript(style, size)
+        for row in [
+            measure(
+                "chars",
+                lambda: split_transcript(transcript, args.max_chars),
+                count_tokens,
+                args.max_tokens,
+            ),
+            measure(
+                "tokens",
+                lambda: split_transcript_tokens(
+                    transcript, args.max_tokens, count_tokens
+                ),
+                count_tokens,
+                args.max_tokens,
+            ),
+        ]:
+            print(f"{style:<10} {row}")
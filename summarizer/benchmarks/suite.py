@@ -0,0 +1,189 @@
+"""Benchmark the summarizer's hot paths against the stored baseline.
+
+Run from the summarizer directory:
+
+    python benchmarks/suite.py
+    python benchmarks/suite.py --update-baseline
+
+Covers splitting large transcripts, combining hundreds of chunk summaries,
+finding pending transcripts in large directories and a whole run with a
+stubbed LLM whose latency is fixed. Storage is a local directory, so no
+bucket or API key is needed.
+"""
+
+import copy
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(HERE)), "benchmarks"))
+
+from blob_storage import LocalStorage  # noqa: E402
+from harness import Case, main  # noqa: E402
+from process import process_transcripts  # noqa: E402
+from split_transcript import synthetic_transcript  # noqa: E402
+from transcript_state import TranscriptState  # noqa: E402
+from utils import (  # noqa: E402
+    combine_summaries,
+    dedupe_summary,
+    find_unsummarized_transcripts,
+    split_transcript,
+    split_transcript_stream,
+)
+
+# Seconds every stubbed chat completion takes
+LLM_LATENCY = 0.02
+
+
+def chunk_summary(index: int) -> dict:
+    return {
+        "metadata": {"title": "Episode", "date": "01-01-2024", "participants": []},
+        "summary": f"Summary of part {index}.",
+        "topics": [f"Topic {index % 40}", "Scaling laws"],
+        "quotes": [
+            {"quote": f"Quote {index % 60}", "speaker": "Dwarkesh Patel"},
+            {"quote": f"Quote {index}", "speaker": "Ilya Sutskever"},
+        ],
+        "terms": {f"Term {index % 30}": "A definition.", "AGI": "A definition."},
+        "recommendations": [f"Recommendation {index % 50}"],
+        "conclusions": f"Conclusion {index}.",
+    }
+
+
+class StubClient:
+    """OpenAI client stand-in that answers every prompt after ``latency``."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._count = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self._count += 1
+            index = self._count
+        content = json.dumps(chunk_summary(index))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+
+def split_cases():
+    cases = []
+    for size_mb in [1, 10]:
+        transcript = synthetic_transcript("english", size_mb * 1024 * 1024)
+        cases += [
+            Case(
+                f"split_transcript/{size_mb}mb",
+                lambda transcript=transcript: split_transcript(transcript),
+                repeat=10,
+            ),
+            Case(
+                f"split_transcript_stream/{size_mb}mb",
+                lambda transcript=transcript: list(
+                    split_transcript_stream(StringIO(transcript))
+                ),
+                repeat=10,
+            ),
+        ]
+    return cases
+
+
+def combine_cases():
+    cases = []
+    for count in [100, 500]:
+        summaries = [chunk_summary(index) for index in range(count)]
+        cases.append(
+            Case(
+                f"combine_summaries/{count}",
+                lambda summaries: dedupe_summary(combine_summaries(summaries)),
+                setup=lambda summaries=summaries: (copy.deepcopy(summaries),),
+            )
+        )
+    return cases
+
+
+def pending_cases(root: str):
+    """Cases for finding pending transcripts, half of them summarized.
+
+    The state cases claim the pending transcripts like ``run`` does, and the
+    manifest stays unchanged between repeats.
+    """
+    cases = []
+    for count in [1000, 10000]:
+        transcripts = os.path.join(root, f"transcripts-{count}")
+        bucket = LocalStorage(os.path.join(root, f"bucket-{count}"))
+        os.makedirs(transcripts)
+        for index in range(count):
+            with open(os.path.join(transcripts, f"episode_{index}.txt"), "w") as file:
+                file.write(f"Transcript {index}\n")
+            if index % 2:
+                bucket.upload_text(f"summaries/episode_{index}.json", "{}")
+        bucket.upload_text("manifest.jsonl", "")
+
+        state = TranscriptState(os.path.join(root, f"state-{count}.sqlite3"))
+
+        def find(state=None, bucket=bucket, transcripts=transcripts):
+            with patch("utils.GCSStorage", lambda bucket_name: bucket), patch(
+                "utils.list_files_gcs",
+                lambda bucket_name, prefix: bucket.list_names(prefix),
+            ):
+                return find_unsummarized_transcripts(
+                    transcripts, "bucket", "summaries/", state, "manifest.jsonl"
+                )
+
+        cases += [
+            Case(f"find_unsummarized/{count}", find, repeat=5),
+            Case(
+                f"find_unsummarized_state/{count}",
+                lambda find=find, state=state: find(state),
+                repeat=5,
+            ),
+        ]
+    return cases
+
+
+def pipeline_cases(root: str):
+    """A run of eight four-chunk episodes with four requests in flight."""
+    config = {
+        "prompts": {"user_chunk": "{content}", "user_combined": "{content}"},
+        "models": {"chunk": "chunk-model", "combined": "combined-model"},
+        "paths": {"bucket_name": "bucket", "summaries": "summaries/"},
+    }
+    paths = []
+    for index in range(8):
+        path = os.path.join(root, f"pipeline_{index}.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(synthetic_transcript("english", 4 * 55000, seed=index))
+        paths.append(path)
+
+    def run():
+        # Progress output would drown the results table
+        quiet = StringIO()
+        with patch("process.write_summary"), redirect_stdout(quiet), redirect_stderr(
+            quiet
+        ):
+            process_transcripts(
+                StubClient(LLM_LATENCY), config, "system", paths, workers=4
+            )
+
+    return [Case("process_transcripts/8x4-stub-llm", run, repeat=5, scaled=False)]
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as root:
+        cases = (
+            split_cases() + combine_cases() + pending_cases(root) + pipeline_cases(root)
+        )
+        main(cases, os.path.join(HERE, "baseline.json"), __doc__.splitlines()[0])
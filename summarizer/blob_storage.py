@@ -0,0 +1,4 @@
+# Storage lives in the shared package, which the Flask app uses as well
+from podcast_shared.storage import GCSStorage, LocalStorage, gcs_client
+
+__all__ = ["GCSStorage", "LocalStorage", "gcs_client"]
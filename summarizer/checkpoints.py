@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def chunks_fingerprint(chunks: Iterable[str]) -> Tuple[str, int]:
+    """Hash and count the chunks of a transcript in one pass.
+
+    Chunks are hashed as they are yielded, so a lazily split transcript is
+    never held in memory. The hash changes when the transcript is edited or
+    split differently, so that stale checkpoints are dropped.
+    """
+    digest = hashlib.sha256()
+    count = 0
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+        count += 1
+    return digest.hexdigest(), count
+
+
+def chunks_hash(chunks: Iterable[str]) -> str:
+    """Fingerprint the chunks of a transcript so that stale checkpoints are dropped."""
+    return chunks_fingerprint(chunks)[0]
+
+
+class CheckpointStore:
+    """Local SQLite record of per-episode progress.
+
+    Every chunk summary and the combined summary are stored as soon as they
+    are generated, so an interrupted run resumes at the first missing chunk
+    of each episode. Once the final summary is written to the bucket the
+    episode is marked as written and its chunk summaries are dropped. The
+    batches of a ``--batch`` run are recorded until their results are
+    collected, so a restarted run polls them instead of paying again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS episodes (
+                episode_id TEXT PRIMARY KEY,
+                transcript_path TEXT,
+                transcript_hash TEXT,
+                chunk_count INTEGER,
+                combined TEXT,
+                written INTEGER DEFAULT 0,
+                updated REAL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                episode_id TEXT,
+                chunk_index INTEGER,
+                summary TEXT,
+                PRIMARY KEY (episode_id, chunk_index)
+            );
+            CREATE TABLE IF NOT EXISTS batches (
+                request_hash TEXT PRIMARY KEY,
+                batch_id TEXT,
+                submitted REAL
+            );
+            """
+        )
+        self._db.commit()
+
+    def start_episode(
+        self, episode_id: str, transcript_path: str, digest: str, chunk_count: int
+    ) -> Dict[int, Dict[str, Any]]:
+        """Register an episode and return the chunk summaries already stored.
+
+        Progress recorded for a different version of the transcript is
+        discarded.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT transcript_hash, chunk_count FROM episodes "
+                "WHERE episode_id = ?",
+                (episode_id,),
+            ).fetchone()
+            if row != (digest, chunk_count):
+                self._db.execute(
+                    "DELETE FROM chunks WHERE episode_id = ?", (episode_id,)
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO episodes "
+                    "(episode_id, transcript_path, transcript_hash, chunk_count, "
+                    "combined, written, updated) VALUES (?, ?, ?, ?, NULL, 0, ?)",
+                    (episode_id, transcript_path, digest, chunk_count, time.time()),
+                )
+                self._db.commit()
+                return {}
+            rows = self._db.execute(
+                "SELECT chunk_index, summary FROM chunks WHERE episode_id = ?",
+                (episode_id,),
+            ).fetchall()
+        return {index: json.loads(summary) for index, summary in rows}
+
+    def save_chunk(self, episode_id: str, index: int, summary: Dict[str, Any]):
+        """Store the summary of one chunk."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)",
+                (episode_id, index, json.dumps(summary, ensure_ascii=False)),
+            )
+            self._touch(episode_id)
+
+    def save_combined(self, episode_id: str, summary: Dict[str, Any]):
+        """Store the final summary of an episode before it is written."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE episodes SET combined = ? WHERE episode_id = ?",
+                (json.dumps(summary, ensure_ascii=False), episode_id),
+            )
+            self._touch(episode_id)
+
+    def combined(self, episode_id: str) -> Optional[Dict[str, Any]]:
+        """Return the stored final summary of an episode, if any."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT combined FROM episodes WHERE episode_id = ?", (episode_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def mark_written(self, episode_id: str):
+        """Record that the final summary is in the bucket and drop its chunks."""
+        with self._lock:
+            self._db.execute("DELETE FROM chunks WHERE episode_id = ?", (episode_id,))
+            self._db.execute(
+                "UPDATE episodes SET written = 1 WHERE episode_id = ?", (episode_id,)
+            )
+            self._touch(episode_id)
+
+    def batch(self, request_hash: str) -> Optional[str]:
+        """Return the ID of the batch submitted for a request file, if any."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT batch_id FROM batches WHERE request_hash = ?",
+                (request_hash,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_batch(self, request_hash: str, batch_id: str):
+        """Record the batch submitted for a request file, to resume polling it."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO batches VALUES (?, ?, ?)",
+                (request_hash, batch_id, time.time()),
+            )
+            self._db.commit()
+
+    def drop_batch(self, request_hash: str):
+        """Forget a batch once its results were collected."""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM batches WHERE request_hash = ?", (request_hash,)
+            )
+            self._db.commit()
+
+    def _touch(self, episode_id: str):
+        self._db.execute(
+            "UPDATE episodes SET updated = ? WHERE episode_id = ?",
+            (time.time(), episode_id),
+        )
+        self._db.commit()
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Return the progress of every checkpointed episode, by episode ID."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT e.episode_id, e.transcript_path, e.chunk_count, "
+                "COUNT(c.chunk_index), e.combined IS NOT NULL, e.written, e.updated "
+                "FROM episodes e LEFT JOIN chunks c ON c.episode_id = e.episode_id "
+                "GROUP BY e.episode_id ORDER BY e.episode_id"
+            ).fetchall()
+        return [
+            {
+                "episode_id": episode_id,
+                "transcript_path": path,
+                "chunks_total": chunk_count,
+                "chunks_done": chunk_count if written else chunks_done,
+                "combined": bool(combined),
+                "written": bool(written),
+                "updated": updated,
+            }
+            for (
+                episode_id,
+                path,
+                chunk_count,
+                chunks_done,
+                combined,
+                written,
+                updated,
+            ) in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def format_status(rows: List[Dict[str, Any]], pending_paths: List[str]) -> str:
+    """Render checkpoint progress and not yet started transcripts as a table."""
+    pending_ids = {
+        os.path.splitext(os.path.basename(path))[0] for path in pending_paths
+    }
+    in_progress = [row for row in rows if not row["written"]]
+    not_started = sorted(pending_ids - {row["episode_id"] for row in rows})
+    written = len(rows) - len(in_progress)
+
+    episode_ids = [row["episode_id"] for row in in_progress] + not_started
+    width = max([len("Episode")] + [len(episode_id) for episode_id in episode_ids])
+    lines = [f"{'Episode':<{width}}  Chunks     Combined"]
+    for row in in_progress:
+        chunks = f"{row['chunks_done']}/{row['chunks_total']}"
+        combined = "yes" if row["combined"] else "no"
+        lines.append(f"{row['episode_id']:<{width}}  {chunks:<9}  {combined}")
+    for episode_id in not_started:
+        lines.append(f"{episode_id:<{width}}  {'-':<9}  no")
+    lines.append(
+        f"{len(in_progress)} in progress, {len(not_started)} not started, "
+        f"{written} written."
+    )
+    return "\n".join(lines)
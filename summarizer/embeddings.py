@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import io
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from google.api_core.exceptions import PreconditionFailed
+from openai import OpenAI
+
+from blob_storage import GCSStorage, gcs_client
+from utils import load_yaml
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def embedding_text(summary: Dict[str, Any]) -> str:
+    """Return the text of a summary that is embedded: its topics and conclusions."""
+    topics = "; ".join(summary.get("topics") or [])
+    return f"Topics: {topics}\nConclusions: {summary.get('conclusions') or ''}"
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so that dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class HashingEmbedder:
+    """Deterministic local embedding provider, used for tests and offline runs.
+
+    Every lowercase word token is hashed to a dimension and a sign, so texts
+    that share words end up close to each other. The Flask app implements
+    the same hashing to embed queries.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.casefold()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8)
+                value = int.from_bytes(digest.digest(), "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dimensions] += sign
+        return normalize(vectors)
+
+
+class OpenAIEmbedder:
+    """Embed texts with the OpenAI embeddings endpoint, ``batch_size`` at a time."""
+
+    def __init__(
+        self,
+        client: OpenAI,
+        model: str = "text-embedding-3-small",
+        dimensions: int = 256,
+        batch_size: int = 256,
+    ):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=texts[start : start + self.batch_size],
+                dimensions=self.dimensions,
+            )
+            rows.extend(item.embedding for item in response.data)
+        vectors = np.array(rows, dtype=np.float32).reshape(-1, self.dimensions)
+        return normalize(vectors)
+
+
+def create_embedder(config: Dict[str, Any], client: Optional[OpenAI] = None):
+    """Build the embedding provider selected by the ``embeddings`` config section."""
+    provider = config.get("provider", "openai")
+    dimensions = config.get("dimensions", 256)
+    if provider == "hashing":
+        return HashingEmbedder(dimensions)
+    if provider == "openai":
+        return OpenAIEmbedder(
+            client or OpenAI(),
+            config.get("model", "text-embedding-3-small"),
+            dimensions,
+            config.get("batch_size", 256),
+        )
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+
+class VectorTable:
+    """Summary IDs, podcasts and unit-length vectors, as stored in the bucket.
+
+    The table is serialized as an uncompressed ``.npz`` file with the vectors
+    in float16, which keeps 100k episodes at 256 dimensions around 50 MB.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        ids: List[str],
+        podcasts: List[str],
+        vectors: np.ndarray,
+    ):
+        self.model = model
+        self.ids = list(ids)
+        self.podcasts = list(podcasts)
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def empty(cls, model: str, dimensions: int) -> "VectorTable":
+        return cls(model, [], [], np.zeros((0, dimensions), dtype=np.float32))
+
+    @classmethod
+    def loads(cls, data: bytes) -> "VectorTable":
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            return cls(
+                str(arrays["model"]),
+                arrays["ids"].tolist(),
+                arrays["podcasts"].tolist(),
+                arrays["vectors"],
+            )
+
+    def dumps(self) -> bytes:
+        order = sorted(range(len(self.ids)), key=self.ids.__getitem__)
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            model=np.array(self.model),
+            ids=np.array([self.ids[i] for i in order], dtype=str),
+            podcasts=np.array([self.podcasts[i] for i in order], dtype=str),
+            vectors=self.vectors[order].astype(np.float16),
+        )
+        return buffer.getvalue()
+
+    def upsert(self, ids: List[str], podcasts: List[str], vectors: np.ndarray):
+        """Insert or replace the vectors of the given summaries."""
+        if vectors.shape[1] != self.vectors.shape[1]:
+            raise ValueError(
+                f"Vectors have {vectors.shape[1]} dimensions, "
+                f"the table has {self.vectors.shape[1]}"
+            )
+        positions = {summary_id: i for i, summary_id in enumerate(self.ids)}
+        new_rows = []
+        for summary_id, podcast, vector in zip(ids, podcasts, vectors):
+            if summary_id in positions:
+                self.vectors[positions[summary_id]] = vector
+                self.podcasts[positions[summary_id]] = podcast
+            else:
+                positions[summary_id] = len(self.ids)
+                self.ids.append(summary_id)
+                self.podcasts.append(podcast)
+                new_rows.append(vector)
+        if new_rows:
+            self.vectors = np.vstack([self.vectors, np.asarray(new_rows)])
+
+
+def embed_summaries(embedder, summaries: List[Dict[str, Any]]) -> VectorTable:
+    """Embed summaries into a table keyed by their episode IDs."""
+    table = VectorTable.empty(embedder.model, embedder.dimensions)
+    if summaries:
+        table.upsert(
+            [summary["metadata"]["id"] for summary in summaries],
+            [summary["metadata"].get("podcast") or "" for summary in summaries],
+            embedder.embed([embedding_text(summary) for summary in summaries]),
+        )
+    return table
+
+
+def update_vectors(
+    bucket_name: str,
+    vectors_path: str,
+    summary: Dict[str, Any],
+    embedder,
+    max_attempts: int = 5,
+):
+    """Embed a freshly written summary and add it to the vector table in GCS.
+
+    Like the manifest, the read-modify-write is guarded by a generation
+    precondition. A table built with another model is replaced.
+    """
+    bucket = gcs_client().bucket(bucket_name)
+    row = embed_summaries(embedder, [summary])
+
+    for _ in range(max_attempts):
+        blob = bucket.get_blob(vectors_path)
+        table, expected_generation = row, 0
+        if blob is not None:
+            expected_generation = blob.generation
+            existing = VectorTable.loads(blob.download_as_bytes())
+            if existing.model == embedder.model:
+                existing.upsert(row.ids, row.podcasts, row.vectors)
+                table = existing
+        try:
+            bucket.blob(vectors_path).upload_from_string(
+                table.dumps(),
+                content_type="application/octet-stream",
+                if_generation_match=expected_generation,
+            )
+            return
+        except PreconditionFailed:
+            continue
+    raise RuntimeError(f"Could not update {vectors_path} after {max_attempts} tries")
+
+
+def rebuild_vectors(
+    bucket_name: str, summaries_dir: str, vectors_path: str, embedder
+) -> int:
+    """Embed every summary stored under a prefix and replace the vector table.
+
+    Summaries are downloaded concurrently.
+    """
+    storage = GCSStorage(bucket_name)
+    names = [
+        name for name in storage.list_names(summaries_dir) if name.endswith(".json")
+    ]
+    summaries = [json.loads(text) for text in storage.download_many(names).values()]
+    table = embed_summaries(embedder, summaries)
+    storage.bucket.blob(vectors_path).upload_from_string(
+        table.dumps(), content_type="application/octet-stream"
+    )
+    return len(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the summary vectors from the summaries in the bucket."
+    )
+    parser.add_argument("--config", default="config.yml")
+    args = parser.parse_args()
+
+    config = load_yaml(args.config)
+    count = rebuild_vectors(
+        config["paths"]["bucket_name"],
+        config["paths"]["summaries"],
+        config["paths"]["vectors"],
+        create_embedder(config["embeddings"]),
+    )
+    print(f"Wrote {count} vectors to {config['paths']['vectors']}.")
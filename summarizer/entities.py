@@ -0,0 +1,236 @@
+import argparse
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from google.api_core.exceptions import PreconditionFailed
+from podcast_shared.entities import entity_key
+
+from blob_storage import GCSStorage, gcs_client
+from utils import load_yaml
+
+KINDS = ("topic", "term", "person")
+
+
+def _date_key(date: Any) -> str:
+    try:
+        return datetime.strptime(str(date), "%d-%m-%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return str(date or "")
+
+
+def summary_entities(summary: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Return the topic, term and participant names of a summary."""
+    metadata = summary.get("metadata") or {}
+    names = {
+        "topic": summary.get("topics") or [],
+        "term": list(summary.get("terms") or {}),
+        "person": metadata.get("participants") or [],
+    }
+    return {
+        kind: [name for name in values if isinstance(name, str) and name.strip()]
+        for kind, values in names.items()
+    }
+
+
+class EntityTable:
+    """Topics, terms and people of every summary, deduplicated across episodes.
+
+    The names and date of each episode are kept so that an episode can be
+    replaced or removed on its own. ``dumps`` adds the precomputed index the
+    web app renders from: for every kind and key, the most common spelling,
+    the other spellings, the number of episodes and their IDs, newest first.
+    The index is built once and then only the keys of a replaced or removed
+    episode are recomputed.
+    """
+
+    def __init__(
+        self,
+        episodes: Dict[str, Dict[str, Any]] = None,
+        entities: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None,
+    ):
+        self.episodes = dict(episodes or {})
+        self._entities = entities
+
+    def __len__(self) -> int:
+        return len(self.episodes)
+
+    @classmethod
+    def loads(cls, text: str) -> "EntityTable":
+        data = json.loads(text)
+        return cls(data["episodes"], data.get("entities"))
+
+    def add(self, summary_id: str, summary: Dict[str, Any]) -> bool:
+        """Index a summary, replacing an earlier version of it.
+
+        Returns False when the earlier version had the same names and date.
+        """
+        episode = {
+            "date": _date_key((summary.get("metadata") or {}).get("date")),
+            **summary_entities(summary),
+        }
+        previous = self.episodes.get(summary_id)
+        if previous == episode:
+            return False
+        self.episodes[summary_id] = episode
+        self._reindex(summary_id, previous, episode)
+        return True
+
+    def remove(self, summary_id: str):
+        previous = self.episodes.pop(summary_id, None)
+        if previous is not None:
+            self._reindex(summary_id, previous, None)
+
+    def _reindex(
+        self,
+        summary_id: str,
+        previous: Optional[Dict[str, Any]],
+        episode: Optional[Dict[str, Any]],
+    ):
+        """Recompute the keys an episode was or is now listed under."""
+        if self._entities is None:
+            return
+        for kind in KINDS:
+            entities = self._entities.setdefault(kind, {})
+            before, after = _keys(previous, kind), _keys(episode, kind)
+            for key in before | after:
+                members = [
+                    member
+                    for member in entities.get(key, {}).get("episodes", [])
+                    if member != summary_id
+                ]
+                if key in after:
+                    members.append(summary_id)
+                if not members:
+                    entities.pop(key, None)
+                    continue
+                names = Counter()
+                for member in members:
+                    for name in self.episodes[member].get(kind, []):
+                        if entity_key(name, kind) == key:
+                            names[name.strip()] += 1
+                entities[key] = self._entity(names, members)
+
+    def _entity(self, names: Counter, members: Iterable[str]) -> Dict[str, Any]:
+        ranked = sorted(names, key=lambda name: (-names[name], name))
+        episodes = sorted(
+            members,
+            key=lambda summary_id: (self.episodes[summary_id]["date"], summary_id),
+            reverse=True,
+        )
+        return {
+            "name": ranked[0],
+            "aliases": ranked[1:],
+            "count": len(episodes),
+            "episodes": episodes,
+        }
+
+    def index(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Group the episodes of every kind by entity key."""
+        if self._entities is not None:
+            return self._entities
+        spellings = {kind: {} for kind in KINDS}
+        members = {kind: {} for kind in KINDS}
+        for summary_id, episode in self.episodes.items():
+            for kind in KINDS:
+                for name in episode.get(kind, []):
+                    key = entity_key(name, kind)
+                    if not key:
+                        continue
+                    spellings[kind].setdefault(key, Counter())[name.strip()] += 1
+                    members[kind].setdefault(key, set()).add(summary_id)
+
+        self._entities = {
+            kind: {
+                key: self._entity(names, members[kind][key])
+                for key, names in sorted(spellings[kind].items())
+            }
+            for kind in KINDS
+        }
+        return self._entities
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {"entities": self.index(), "episodes": self.episodes},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+
+
+def _keys(episode: Optional[Dict[str, Any]], kind: str) -> Set[str]:
+    if episode is None:
+        return set()
+    keys = {entity_key(name, kind) for name in episode.get(kind, [])}
+    keys.discard("")
+    return keys
+
+
+def update_entities(
+    bucket_name: str, entities_path: str, summary: Dict[str, Any], max_attempts: int = 5
+):
+    """Add a freshly written summary to the entity index in Google Cloud Storage.
+
+    Only the entities of that summary are recomputed, and nothing is written
+    when its names and date did not change. Like the manifest, the
+    read-modify-write is guarded by a generation precondition and retried
+    when another writer got there first.
+    """
+    bucket = gcs_client().bucket(bucket_name)
+
+    for _ in range(max_attempts):
+        blob = bucket.get_blob(entities_path)
+        table, expected_generation = EntityTable(), 0
+        if blob is not None:
+            expected_generation = blob.generation
+            table = EntityTable.loads(blob.download_as_text())
+        if not table.add(summary["metadata"]["id"], summary):
+            return
+        try:
+            bucket.blob(entities_path).upload_from_string(
+                table.dumps(),
+                content_type="application/json",
+                if_generation_match=expected_generation,
+            )
+            return
+        except PreconditionFailed:
+            continue
+    raise RuntimeError(f"Could not update {entities_path} after {max_attempts} tries")
+
+
+def rebuild_entities(bucket_name: str, summaries_dir: str, entities_path: str) -> int:
+    """Regenerate the entity index from every summary stored under a prefix.
+
+    Summaries are downloaded concurrently.
+    """
+    storage = GCSStorage(bucket_name)
+    names = [
+        name for name in storage.list_names(summaries_dir) if name.endswith(".json")
+    ]
+    table = EntityTable()
+    for name, text in storage.download_many(names).items():
+        summary = json.loads(text)
+        table.add(summary["metadata"]["id"], summary)
+
+    storage.bucket.blob(entities_path).upload_from_string(
+        table.dumps(), content_type="application/json"
+    )
+    return len(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the topic, term and people index from the summaries."
+    )
+    parser.add_argument("--config", default="config.yml")
+    args = parser.parse_args()
+
+    config = load_yaml(args.config)
+    count = rebuild_entities(
+        config["paths"]["bucket_name"],
+        config["paths"]["summaries"],
+        config["paths"]["entities"],
+    )
+    print(
+        f"Indexed the entities of {count} summaries in {config['paths']['entities']}."
+    )
@@ -0,0 +1,338 @@
+import contextvars
+import csv
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+R = TypeVar("R")
+
+# Columns of the CSV report, one row per recorded event
+EVENT_FIELDS = [
+    "stage",
+    "episode",
+    "model",
+    "started",
+    "seconds",
+    "prompt_tokens",
+    "completion_tokens",
+    "cached",
+    "saved_tokens",
+    "saved_seconds",
+]
+
+_active: Optional["RunRecorder"] = None
+_episode: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "episode", default=None
+)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the ``q``-th percentile of the values, interpolating linearly."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower, upper = math.floor(position), math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _latency(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50_seconds": round(percentile(values, 50), 4),
+        "p95_seconds": round(percentile(values, 95), 4),
+    }
+
+
+class RunRecorder:
+    """Timings and token usage of every stage of one summarization run.
+
+    Each event records a stage (``read``, ``split``, ``llm``, ``combine``,
+    ``write`` and so on), the episode it belongs to and its duration; ``llm``
+    events also carry the model and the prompt and completion tokens of the
+    response. ``prices`` maps models to USD per million prompt and completion
+    tokens and is used to estimate the cost of a run.
+    """
+
+    def __init__(
+        self,
+        prices: Optional[Dict[str, Dict[str, float]]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.prices = prices or {}
+        self.clock = clock
+        self.started = clock()
+        self.finished: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self) -> Iterator["RunRecorder"]:
+        """Record the stages of the code run inside the block."""
+        global _active
+        previous, _active = _active, self
+        try:
+            yield self
+        finally:
+            _active = previous
+            self.finished = self.clock()
+
+    def record(self, stage: str, seconds: float, **fields):
+        """Add one event, attributed to the current episode unless given."""
+        event = dict.fromkeys(EVENT_FIELDS)
+        event.update(
+            stage=stage,
+            episode=_episode.get(),
+            started=self.clock() - seconds,
+            seconds=seconds,
+        )
+        event.update(fields)
+        with self._lock:
+            self.events.append(event)
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int):
+        """Estimate the cost in USD of a call, or None for an unpriced model."""
+        price = self.prices.get(model)
+        if price is None:
+            return None
+        return (
+            prompt_tokens * price["prompt"] + completion_tokens * price["completion"]
+        ) / 1_000_000
+
+    def report(self) -> Dict[str, Any]:
+        """Aggregate the events per stage, per model and per episode."""
+        with self._lock:
+            events = list(self.events)
+        finished = self.finished if self.finished is not None else self.clock()
+        wall = max(finished - self.started, 1e-9)
+
+        stages: Dict[str, List[float]] = {}
+        models: Dict[str, Dict[str, Any]] = {}
+        episodes: Dict[str, Dict[str, Any]] = {}
+        repairs = {"count": 0, "saved_tokens": 0, "saved_seconds": 0.0}
+        for event in events:
+            stages.setdefault(event["stage"], []).append(event["seconds"])
+            if event["stage"] == "repair":
+                repairs["count"] += 1
+                repairs["saved_tokens"] += event["saved_tokens"] or 0
+                repairs["saved_seconds"] += event["saved_seconds"] or 0.0
+            episode = None
+            if event["episode"] is not None:
+                episode = episodes.setdefault(
+                    event["episode"],
+                    {
+                        "start": event["started"],
+                        "end": event["started"] + event["seconds"],
+                        "llm_calls": 0,
+                        "prompt_tokens": 0,
+                        "completion_tokens": 0,
+                        "cost": 0.0,
+                    },
+                )
+                episode["start"] = min(episode["start"], event["started"])
+                episode["end"] = max(
+                    episode["end"], event["started"] + event["seconds"]
+                )
+            if event["stage"] != "llm":
+                continue
+
+            prompt = event["prompt_tokens"] or 0
+            completion = event["completion_tokens"] or 0
+            cost = (
+                0.0
+                if event["cached"]
+                else self.cost(event["model"], prompt, completion)
+            )
+            model = models.setdefault(
+                event["model"],
+                {
+                    "calls": 0,
+                    "cached": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "latencies": [],
+                    "cost": 0.0,
+                },
+            )
+            model["calls"] += 1
+            model["cached"] += bool(event["cached"])
+            model["prompt_tokens"] += prompt
+            model["completion_tokens"] += completion
+            if not event["cached"]:
+                model["latencies"].append(event["seconds"])
+            if cost is None:
+                model["cost"] = None
+            elif model["cost"] is not None:
+                model["cost"] += cost
+            if episode is not None:
+                episode["llm_calls"] += 1
+                episode["prompt_tokens"] += prompt
+                episode["completion_tokens"] += completion
+                episode["cost"] += cost or 0.0
+
+        tokens = sum(
+            m["prompt_tokens"] + m["completion_tokens"] for m in models.values()
+        )
+        return {
+            "run": {
+                "started": self.started,
+                "seconds": round(wall, 3),
+                "episodes": len(episodes),
+                "episodes_per_minute": round(len(episodes) * 60 / wall, 2),
+                "tokens": tokens,
+                "tokens_per_second": round(tokens / wall, 1),
+                "cost": round(sum(m["cost"] or 0.0 for m in models.values()), 6),
+            },
+            # Completion tokens and seconds kept by re-requesting only the
+            # missing fields of truncated or invalid summaries
+            "repairs": {
+                **repairs,
+                "saved_seconds": round(repairs["saved_seconds"], 3),
+            },
+            "stages": {
+                stage: {
+                    "count": len(seconds),
+                    "total_seconds": round(sum(seconds), 4),
+                    **_latency(seconds),
+                }
+                for stage, seconds in sorted(stages.items())
+            },
+            "models": {
+                name: {
+                    "calls": model["calls"],
+                    "cached": model["cached"],
+                    "prompt_tokens": model["prompt_tokens"],
+                    "completion_tokens": model["completion_tokens"],
+                    **_latency(model["latencies"]),
+                    "cost": None if model["cost"] is None else round(model["cost"], 6),
+                }
+                for name, model in sorted(models.items())
+            },
+            "episodes": {
+                name: {
+                    "seconds": round(episode["end"] - episode["start"], 4),
+                    "llm_calls": episode["llm_calls"],
+                    "prompt_tokens": episode["prompt_tokens"],
+                    "completion_tokens": episode["completion_tokens"],
+                    "cost": round(episode["cost"], 6),
+                }
+                for name, episode in sorted(episodes.items())
+            },
+        }
+
+    def write(self, path: str) -> str:
+        """Write the report, as CSV events for ``.csv`` paths and JSON otherwise.
+
+        The JSON report holds the aggregates and every event with all its
+        fields; the CSV report has the ``EVENT_FIELDS`` columns.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(
+                    file, fieldnames=EVENT_FIELDS, extrasaction="ignore"
+                )
+                writer.writeheader()
+                writer.writerows(events)
+            else:
+                json.dump({**self.report(), "events": events}, file, indent=2)
+        return path
+
+
+def active() -> Optional[RunRecorder]:
+    """Return the recorder of the current run, if one is active."""
+    return _active
+
+
+@contextmanager
+def for_episode(episode_id: str) -> Iterator[None]:
+    """Attribute the events recorded inside the block to an episode."""
+    token = _episode.set(episode_id)
+    try:
+        yield
+    finally:
+        _episode.reset(token)
+
+
+def in_context(function: Callable[..., R]) -> Callable[..., R]:
+    """Wrap a function so that it keeps the caller's episode on another thread."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs) -> R:
+        return context.copy().run(function, *args, **kwargs)
+
+    return run
+
+
+@contextmanager
+def timed(stage: str, **fields) -> Iterator[Dict[str, Any]]:
+    """Time the block as a stage of the active run.
+
+    The yielded dict can be filled with further fields of the event, such as
+    the token usage of a response. Nothing is recorded without a recorder.
+    """
+    started = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        if _active is not None:
+            _active.record(stage, time.perf_counter() - started, **fields)
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render the aggregates of a run report as plain-text tables."""
+    run = report["run"]
+    lines = [
+        f"{run['episodes']} episodes in {run['seconds']:.1f}s "
+        f"({run['episodes_per_minute']} episodes/min, "
+        f"{run['tokens_per_second']} tokens/s), estimated cost ${run['cost']:.4f}",
+        "",
+        f"{'Stage':<12}{'Count':>7}{'Total s':>10}{'p50 s':>9}{'p95 s':>9}",
+    ]
+    repairs = report["repairs"]
+    if repairs["count"]:
+        lines.insert(
+            1,
+            f"{repairs['count']} summaries repaired, saving "
+            f"{repairs['saved_tokens']} completion tokens and "
+            f"{repairs['saved_seconds']:.1f}s over full retries",
+        )
+    for stage, stats in report["stages"].items():
+        lines.append(
+            f"{stage:<12}{stats['count']:>7}{stats['total_seconds']:>10.2f}"
+            f"{stats['p50_seconds']:>9.3f}{stats['p95_seconds']:>9.3f}"
+        )
+
+    width = max([len("Model")] + [len(model) for model in report["models"]])
+    lines += [
+        "",
+        f"{'Model':<{width}}  {'Calls':>6}{'Cached':>7}{'Prompt':>10}"
+        f"{'Completion':>11}{'p50 s':>8}{'p95 s':>8}{'Cost $':>10}",
+    ]
+    for model, stats in report["models"].items():
+        cost = "-" if stats["cost"] is None else f"{stats['cost']:.4f}"
+        lines.append(
+            f"{model:<{width}}  {stats['calls']:>6}{stats['cached']:>7}"
+            f"{stats['prompt_tokens']:>10}{stats['completion_tokens']:>11}"
+            f"{stats['p50_seconds']:>8.2f}{stats['p95_seconds']:>8.2f}{cost:>10}"
+        )
+
+    width = max([len("Episode")] + [len(name) for name in report["episodes"]])
+    lines += [
+        "",
+        f"{'Episode':<{width}}  {'Seconds':>8}{'Calls':>7}{'Tokens':>9}{'Cost $':>10}",
+    ]
+    for name, stats in report["episodes"].items():
+        tokens = stats["prompt_tokens"] + stats["completion_tokens"]
+        lines.append(
+            f"{name:<{width}}  {stats['seconds']:>8.1f}{stats['llm_calls']:>7}"
+            f"{tokens:>9}{stats['cost']:>10.4f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+def cache_key(
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    """Hash everything that determines a completion into a cache key."""
+    payload = json.dumps(
+        [model, system_prompt, user_prompt, temperature, max_tokens],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Persistent SQLite cache of LLM responses keyed by ``cache_key``.
+
+    Entries are evicted least recently used first once their total size
+    exceeds ``max_bytes`` (0 disables eviction). Hits and misses are counted
+    for the lifetime of the object.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, content TEXT, "
+            "size INTEGER, accessed REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+            return row[0]
+
+    def put(self, key: str, model: str, content: str):
+        """Store a response and evict old entries beyond ``max_bytes``."""
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, size, time.time()),
+            )
+            if self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def discard(self, key: str):
+        """Remove the cached response for a key, if there is one."""
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _evict(self):
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        ):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def purge(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._db.execute("VACUUM")
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit and miss counts and the number and size of entries."""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
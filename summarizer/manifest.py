@@ -0,0 +1,123 @@
+import argparse
+import json
+from typing import Any, Dict, List
+
+from google.api_core.exceptions import PreconditionFailed
+
+from blob_storage import GCSStorage, gcs_client
+from utils import load_yaml
+
+METADATA_KEYS = ("id", "title", "date", "podcast", "participants")
+
+
+def manifest_row(summary: Dict[str, Any], generation: int, size: int) -> Dict[str, Any]:
+    """Reduce a summary to the fields needed by the listing page and search.
+
+    Quotes and terms are only kept as plain text for the search index.
+    """
+    metadata = summary["metadata"]
+    return {
+        "metadata": {key: metadata.get(key) for key in METADATA_KEYS},
+        "topics": summary.get("topics", []),
+        "conclusions": summary.get("conclusions", ""),
+        "search": {
+            "quotes": [
+                quote.get("quote", "") if isinstance(quote, dict) else str(quote)
+                for quote in summary.get("quotes", [])
+            ],
+            "terms": list(summary.get("terms", {})),
+        },
+        "generation": generation,
+        "size": size,
+    }
+
+
+def parse_manifest(text: str) -> List[Dict[str, Any]]:
+    """Parse a JSON-lines manifest into a list of rows."""
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def dump_manifest(rows: List[Dict[str, Any]]) -> str:
+    """Serialize manifest rows as JSON lines, ordered by episode ID."""
+    rows = sorted(rows, key=lambda row: row["metadata"]["id"])
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+
+def merge_manifest(text: str, row: Dict[str, Any]) -> str:
+    """Insert or replace the row for an episode in a serialized manifest."""
+    rows = {existing["metadata"]["id"]: existing for existing in parse_manifest(text)}
+    rows[row["metadata"]["id"]] = row
+    return dump_manifest(list(rows.values()))
+
+
+def update_manifest(
+    bucket_name: str,
+    manifest_path: str,
+    summary: Dict[str, Any],
+    generation: int,
+    size: int,
+    max_attempts: int = 5,
+):
+    """Add a freshly written summary to the manifest in Google Cloud Storage.
+
+    The read-modify-write is guarded by a generation precondition so that
+    concurrent writers never drop each other's rows.
+    """
+    bucket = gcs_client().bucket(bucket_name)
+    row = manifest_row(summary, generation, size)
+
+    for _ in range(max_attempts):
+        blob = bucket.get_blob(manifest_path)
+        if blob is None:
+            text, expected_generation = "", 0
+        else:
+            text, expected_generation = blob.download_as_text(), blob.generation
+        try:
+            bucket.blob(manifest_path).upload_from_string(
+                merge_manifest(text, row),
+                content_type="application/x-ndjson",
+                if_generation_match=expected_generation,
+            )
+            return
+        except PreconditionFailed:
+            continue
+    raise RuntimeError(f"Could not update {manifest_path} after {max_attempts} tries")
+
+
+def rebuild_manifest(bucket_name: str, summaries_dir: str, manifest_path: str) -> int:
+    """Regenerate the manifest from every summary stored under a prefix.
+
+    Summaries are downloaded concurrently.
+    """
+    storage = GCSStorage(bucket_name)
+    blobs = [
+        blob
+        for blob in storage.bucket.list_blobs(prefix=summaries_dir)
+        if blob.name.endswith(".json")
+    ]
+    texts = storage.download_many(blob.name for blob in blobs)
+    rows = [
+        manifest_row(json.loads(texts[blob.name]), blob.generation, blob.size)
+        for blob in blobs
+    ]
+
+    storage.bucket.blob(manifest_path).upload_from_string(
+        dump_manifest(rows), content_type="application/x-ndjson"
+    )
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the summary manifest from the summaries in the bucket."
+    )
+    parser.add_argument("--config", default="config.yml")
+    args = parser.parse_args()
+
+    config = load_yaml(args.config)
+    count = rebuild_manifest(
+        config["paths"]["bucket_name"],
+        config["paths"]["summaries"],
+        config["paths"]["manifest"],
+    )
+    print(f"Wrote {count} rows to {config['paths']['manifest']}.")
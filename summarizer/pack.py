@@ -0,0 +1,168 @@
+import argparse
+import json
+import struct
+import zlib
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from blob_storage import GCSStorage
+from utils import load_yaml
+
+# A pack starts with this header, little-endian: magic, flags, number of
+# summaries, width of the ID column, a reserved word and the index offset
+MAGIC = b"SUMPACK1"
+HEADER = struct.Struct("<8sIIIIQ")
+# Flag set when every record is zlib-compressed on its own
+COMPRESSED = 1
+
+
+def _generation(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def dumps_pack(
+    documents: Dict[str, Tuple[Any, Dict[str, Any]]], compress: bool = True
+) -> bytes:
+    """Serialize summaries, keyed by ID with the generation they were read at.
+
+    After the header come the records, one compact JSON document per
+    summary in ID order, compressed one by one when ``compress`` is set so
+    that a single summary can be read without the others. The index follows
+    as columns aligned to 8 bytes: record offsets (uint64), generations
+    (int64), record lengths (uint32) and the sorted IDs, UTF-8 padded with
+    NUL bytes to a fixed width, so that readers can memory-map the file and
+    look up an ID with a binary search.
+    """
+    ids = sorted(documents, key=lambda summary_id: summary_id.encode("utf-8"))
+    records, offsets, lengths, generations = [], [], [], []
+    position = HEADER.size
+    for summary_id in ids:
+        generation, document = documents[summary_id]
+        record = json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+        record = record.encode("utf-8")
+        if compress:
+            record = zlib.compress(record)
+        records.append(record)
+        offsets.append(position)
+        lengths.append(len(record))
+        generations.append(_generation(generation))
+        position += len(record)
+
+    padding = -position % 8
+    encoded_ids = [summary_id.encode("utf-8") for summary_id in ids]
+    width = max((len(summary_id) for summary_id in encoded_ids), default=1)
+    header = HEADER.pack(
+        MAGIC, COMPRESSED if compress else 0, len(ids), width, 0, position + padding
+    )
+    return b"".join(
+        [
+            header,
+            *records,
+            b"\0" * padding,
+            np.array(offsets, dtype="<u8").tobytes(),
+            np.array(generations, dtype="<i8").tobytes(),
+            np.array(lengths, dtype="<u4").tobytes(),
+            np.array(encoded_ids, dtype=f"S{width}").tobytes(),
+        ]
+    )
+
+
+def loads_pack(data: bytes) -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    """Parse a pack into summaries keyed by ID, with their generation."""
+    magic, flags, count, width, _, index_offset = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a summary pack")
+    offsets = np.frombuffer(data, "<u8", count, index_offset)
+    generations = np.frombuffer(data, "<i8", count, index_offset + 8 * count)
+    lengths = np.frombuffer(data, "<u4", count, index_offset + 16 * count)
+    ids = np.frombuffer(data, f"S{width}", count, index_offset + 20 * count)
+
+    documents = {}
+    for summary_id, offset, length, generation in zip(
+        ids, offsets, lengths, generations
+    ):
+        record = data[int(offset) : int(offset) + int(length)]
+        if flags & COMPRESSED:
+            record = zlib.decompress(record)
+        documents[summary_id.decode("utf-8")] = (int(generation), json.loads(record))
+    return documents
+
+
+def build_pack(
+    bucket_name: str, summaries_dir: str, pack_path: str, compress: bool = True
+) -> int:
+    """Pack every summary stored under a prefix into one object.
+
+    Summaries are downloaded concurrently.
+    """
+    storage = GCSStorage(bucket_name)
+    generations = {
+        name: generation
+        for name, generation in storage.list_generations(summaries_dir).items()
+        if name.endswith(".json")
+    }
+    texts = storage.download_many(generations)
+    documents = {
+        name[len(summaries_dir) : -len(".json")]: (generation, json.loads(texts[name]))
+        for name, generation in generations.items()
+    }
+
+    storage.bucket.blob(pack_path).upload_from_string(
+        dumps_pack(documents, compress), content_type="application/octet-stream"
+    )
+    return len(documents)
+
+
+def unpack(bucket_name: str, pack_path: str, summaries_dir: str) -> int:
+    """Write every summary of a pack back as a JSON object under a prefix.
+
+    Summaries are uploaded concurrently, formatted as by the summarizer.
+    """
+    storage = GCSStorage(bucket_name)
+    documents = loads_pack(storage.bucket.blob(pack_path).download_as_bytes())
+    storage.upload_many(
+        {
+            f"{summaries_dir}{summary_id}.json": json.dumps(
+                document, ensure_ascii=False, indent=4
+            )
+            for summary_id, (_, document) in documents.items()
+        }
+    )
+    return len(documents)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert the summaries in the bucket to and from a summary pack."
+    )
+    parser.add_argument(
+        "command",
+        choices=["build", "unpack"],
+        help="Pack the JSON summaries, or write the packed summaries back as JSON.",
+    )
+    parser.add_argument("--config", default="config.yml")
+    parser.add_argument(
+        "--no-compress", action="store_true", help="Store records uncompressed."
+    )
+    args = parser.parse_args()
+
+    config = load_yaml(args.config)
+    paths = config["paths"]
+    if args.command == "build":
+        count = build_pack(
+            paths["bucket_name"],
+            paths["summaries"],
+            paths["pack"],
+            compress=not args.no_compress,
+        )
+        print(f"Packed {count} summaries into {paths['pack']}.")
+    else:
+        count = unpack(paths["bucket_name"], paths["pack"], paths["summaries"])
+        print(
+            f"Wrote {count} summaries to {paths['summaries']}; rebuild the "
+            "manifest and the pack, since their generations changed."
+        )
@@ -1,80 +1,847 @@
+import argparse
 import json
 import os
+import socket
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
+from google.api_core.exceptions import PreconditionFailed
 from openai import OpenAI
 from tqdm import tqdm
 
+from batch import OpenAIBatchBackend, run_batch
+from blob_storage import GCSStorage
+from checkpoints import CheckpointStore, chunks_fingerprint, chunks_hash, format_status
+from embeddings import create_embedder, update_vectors
+from entities import update_entities
+from instrumentation import (
+    RunRecorder,
+    active,
+    for_episode,
+    format_report,
+    in_context,
+    timed,
+)
+from llm_cache import ResponseCache, cache_key
+from manifest import update_manifest
+from scheduler import RateLimitedClient
+from structured import generate_valid_summary, schema_validator
+from transcript_state import TranscriptState, file_hash
+
 from utils import (
     combine_summaries,
+    dedupe_summary,
     find_unsummarized_transcripts,
     generate_summary,
     get_metadata_from_path,
     load_yaml,
     read_text,
-    split_transcript,
+    open_text,
+    split_transcript_stream,
+    split_transcript_tokens,
+    summary_request,
+    token_counter,
     write_json_to_gcs,
 )
+from work_queue import Heartbeat, Lease, LeaseLost, SQLiteWorkQueue, run_worker
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def chunk_transcript(transcript_path: str, config: Dict[str, Any]) -> Iterator[str]:
+    """Yield the chunks of a transcript from the splitter selected by
+    ``chunking.mode``.
+
+    Character chunks are split from a stream as they are consumed, so only
+    the chunk being yielded and the splitter's look-ahead are held in memory;
+    their ``split`` stage includes reading. Token chunks need the whole
+    transcript to be read first.
+    """
+    chunking = config.get("chunking", {"mode": "chars"})
+    if chunking["mode"] == "tokens":
+        model = config["models"]["chunk"]
+        with timed("read"):
+            transcript = read_text(transcript_path)
+        with timed("split"):
+            chunks = split_transcript_tokens(
+                transcript,
+                chunking["max_tokens"][model],
+                token_counter(model),
+                overlap_tokens=chunking["overlap_tokens"],
+            )
+        yield from chunks
+        return
+
+    # Only the time spent splitting counts, not the time the consumer holds a chunk
+    seconds = 0.0
+    with open_text(transcript_path) as stream:
+        chunks = split_transcript_stream(stream)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            seconds += time.perf_counter() - started
+            if chunk is None:
+                break
+            yield chunk
+    recorder = active()
+    if recorder is not None:
+        recorder.record("split", seconds)
+
+
+def map_ahead(
+    executor: Executor, function: Callable[[T], R], items: Iterable[T], ahead: int
+) -> List[R]:
+    """Like ``executor.map``, but only read ``items`` as results come in.
+
+    At most ``ahead`` items are submitted past the oldest unfinished one, so
+    a lazily produced input is never held in memory as a whole.
+    """
+    futures: "deque[Future]" = deque()
+    results = []
+    for item in items:
+        if len(futures) >= ahead:
+            results.append(futures.popleft().result())
+        futures.append(executor.submit(function, item))
+    results.extend(future.result() for future in futures)
+    return results
+
+
+def request_summary(
+    client: OpenAI,
+    config: Dict[str, Any],
+    system_prompt: str,
+    user_prompt: str,
+    model: str,
+    cache: Optional[ResponseCache] = None,
+) -> Dict[str, Any]:
+    """Request a summary and decode it.
+
+    With a ``structured_output`` section the summary is validated against
+    the configured schema, and missing or invalid fields are requested again.
+    """
+    structured = config.get("structured_output")
+    if structured is None:
+        return json.loads(
+            generate_summary(client, system_prompt, user_prompt, model, cache)
+        )
+    return generate_valid_summary(
+        client,
+        system_prompt,
+        user_prompt,
+        model,
+        schema_validator(config["schema"]),
+        config["prompts"]["user_repair"],
+        cache,
+        stream=structured["streaming"],
+        max_repairs=structured["max_repairs"],
+    )
+
+
+def merge_prompt(config: Dict[str, Any], group: List[Dict[str, Any]]) -> str:
+    """Build the prompt that merges a group of consecutive summaries."""
+    with timed("combine"):
+        combined = dedupe_summary(combine_summaries(group))
+    return config["prompts"]["user_merge"].format(
+        content=json.dumps(combined, ensure_ascii=False, indent=4)
+    )
+
+
+def combined_prompt(config: Dict[str, Any], summaries: List[Dict[str, Any]]) -> str:
+    """Build the prompt that turns chunk summaries into the final summary."""
+    with timed("combine"):
+        combined_summaries = combine_summaries(summaries)
+        if config.get("combining", {"mode": "flat"})["mode"] == "tree":
+            combined_summaries = dedupe_summary(combined_summaries)
+    combined_summaries_txt = json.dumps(
+        combined_summaries, ensure_ascii=False, indent=4
+    )
+    return config["prompts"]["user_combined"].format(content=combined_summaries_txt)
+
+
+def tree_fan_out(config: Dict[str, Any]) -> int:
+    """Return ``combining.fan_out``, raising ValueError unless it is at least 2.
+
+    A fan-out of 1 merges every summary alone and 0 makes empty groups, so
+    neither ever shrinks a level.
+    """
+    fan_out = config["combining"]["fan_out"]
+    if isinstance(fan_out, bool) or not isinstance(fan_out, int) or fan_out < 2:
+        raise ValueError(f"combining.fan_out has to be at least 2, got {fan_out!r}")
+    return fan_out
+
+
+def combine_in_tree(
+    client: OpenAI,
+    config: Dict[str, Any],
+    system_prompt: str,
+    chunk_summaries: List[Dict[str, Any]],
+    executor: Executor,
+    cache: Optional[ResponseCache] = None,
+) -> List[Dict[str, Any]]:
+    """Merge chunk summaries in groups until at most ``fan_out`` remain.
+
+    Every level merges consecutive groups of ``combining.fan_out`` summaries
+    with the ``user_merge`` prompt, running the merges of a level in parallel
+    on the executor. Repeated topics, quotes, recommendations and terms are
+    dropped before each merge, so no prompt grows with the episode length.
+    """
+    fan_out = tree_fan_out(config)
+
+    def merge(group: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if len(group) == 1:
+            return group[0]
+        return request_summary(
+            client,
+            config,
+            system_prompt,
+            merge_prompt(config, group),
+            config["models"]["chunk"],
+            cache,
+        )
+
+    level = chunk_summaries
+    while len(level) > fan_out:
+        groups = [level[i : i + fan_out] for i in range(0, len(level), fan_out)]
+        level = list(executor.map(in_context(merge), groups))
+    return level
+
+
+def summarize_transcript(
+    client: OpenAI,
+    config: Dict[str, Any],
+    system_prompt: str,
+    transcript_path: str,
+    executor: Executor,
+    cache: Optional[ResponseCache] = None,
+    checkpoints: Optional[CheckpointStore] = None,
+    chunks_ahead: int = 8,
+) -> Dict[str, Any]:
+    """Summarize one transcript, running its chunk requests on the executor.
+
+    Chunks are read as they are submitted, at most ``chunks_ahead`` past the
+    oldest unfinished one, and their summaries are collected in chunk order
+    so that the combined prompt is the same as in a sequential run. With a
+    checkpoint store, chunks and the final summary stored by an earlier run
+    are reused and new ones are stored as soon as they are generated; the
+    transcript is then streamed once more beforehand, to fingerprint it.
+    """
+    metadata = get_metadata_from_path(transcript_path)
+    with for_episode(metadata["id"]):
+        return _summarize_episode(
+            client,
+            config,
+            system_prompt,
+            transcript_path,
+            metadata,
+            executor,
+            cache,
+            checkpoints,
+            chunks_ahead,
+        )
+
+
+def _summarize_episode(
+    client: OpenAI,
+    config: Dict[str, Any],
+    system_prompt: str,
+    transcript_path: str,
+    metadata: Dict[str, str],
+    executor: Executor,
+    cache: Optional[ResponseCache],
+    checkpoints: Optional[CheckpointStore],
+    chunks_ahead: int,
+) -> Dict[str, Any]:
+    done = {}
+    if checkpoints is not None:
+        # Stored chunks only count for the same chunks, so hash them first
+        digest, count = chunks_fingerprint(chunk_transcript(transcript_path, config))
+        done = checkpoints.start_episode(metadata["id"], transcript_path, digest, count)
+        final_sum_dict = checkpoints.combined(metadata["id"])
+        if final_sum_dict is not None:
+            return final_sum_dict
+
+    # generate summaries for each chunk, reading chunks as they are submitted
+    def summarize_chunk(item: Tuple[int, str]) -> Dict[str, Any]:
+        index, chunk = item
+        if index in done:
+            return done[index]
+        chunk_prompt = config["prompts"]["user_chunk"].format(content=chunk)
+        chunk_sum_dict = request_summary(
+            client,
+            config,
+            system_prompt,
+            chunk_prompt,
+            config["models"]["chunk"],
+            cache,
+        )
+        if checkpoints is not None:
+            checkpoints.save_chunk(metadata["id"], index, chunk_sum_dict)
+        return chunk_sum_dict
+
+    chunk_summaries = map_ahead(
+        executor,
+        in_context(summarize_chunk),
+        enumerate(chunk_transcript(transcript_path, config)),
+        chunks_ahead,
+    )
+
+    # combine summaries into a single file
+    if config.get("combining", {"mode": "flat"})["mode"] == "tree":
+        chunk_summaries = combine_in_tree(
+            client, config, system_prompt, chunk_summaries, executor, cache
+        )
+
+    # generate final summary
+    user_prompt_final = combined_prompt(config, chunk_summaries)
+    final_sum_dict = executor.submit(
+        in_context(request_summary),
+        client,
+        config,
+        system_prompt,
+        user_prompt_final,
+        config["models"]["combined"],
+        cache,
+    ).result()
+    final_sum_dict["metadata"].update(metadata)
+    if checkpoints is not None:
+        checkpoints.save_combined(metadata["id"], final_sum_dict)
+    return final_sum_dict
+
+
+def summary_path(config: Dict[str, Any], transcript_path: str) -> str:
+    """Return the object name of a transcript's summary in the bucket."""
+    return f"{config['paths']['summaries']}{os.path.basename(transcript_path).replace('.txt', '.json')}"
+
+
+def write_summary(
+    config: Dict[str, Any],
+    transcript_path: str,
+    summary: Dict[str, Any],
+    embedder=None,
+    if_generation_match: Optional[int] = None,
+):
+    """Write a final summary to Google Cloud Storage and add it to the manifest
+    and the entity index.
+
+    With an ``embedder`` the summary is also added to the vector table used
+    by semantic search. With ``if_generation_match`` nothing is written if
+    the summary changed since it was at that generation.
+    """
+    bucket_name = config["paths"]["bucket_name"]
+    summary_file_path = summary_path(config, transcript_path)
+    with for_episode(summary["metadata"]["id"]):
+        with timed("write"):
+            blob = write_json_to_gcs(
+                summary, bucket_name, summary_file_path, if_generation_match
+            )
+        with timed("manifest"):
+            update_manifest(
+                bucket_name,
+                config["paths"]["manifest"],
+                summary,
+                blob.generation,
+                blob.size,
+            )
+        with timed("entities"):
+            update_entities(bucket_name, config["paths"]["entities"], summary)
+        if embedder is not None:
+            with timed("vectors"):
+                update_vectors(
+                    bucket_name, config["paths"]["vectors"], summary, embedder
+                )
+
+
+def process_transcripts(
+    client: OpenAI,
+    config: Dict[str, Any],
+    system_prompt: str,
+    transcript_paths: List[str],
+    workers: int = 1,
+    cache: Optional[ResponseCache] = None,
+    checkpoints: Optional[CheckpointStore] = None,
+    embedder=None,
+) -> List[str]:
+    """Summarize transcripts with at most ``workers`` LLM requests in flight.
+
+    Up to ``workers`` episodes are processed at the same time and their chunk
+    requests share one bounded pool, so chunks of a long episode and chunks
+    of different episodes are fanned out together. Summaries are written as
+    soon as their episode finishes. An episode that fails is reported and
+    does not stop the others; the paths of the failed transcripts are
+    returned.
+    """
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="llm"
+    ) as llm_pool, ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="episode"
+    ) as episode_pool:
+        failed = []
+        futures = {
+            episode_pool.submit(
+                summarize_transcript,
+                client,
+                config,
+                system_prompt,
+                transcript_path,
+                llm_pool,
+                cache,
+                checkpoints,
+                2 * workers,
+            ): transcript_path
+            for transcript_path in transcript_paths
+        }
+        for future in tqdm(
+            as_completed(futures), total=len(futures), desc="Processing Transcripts"
+        ):
+            transcript_path = futures[future]
+            try:
+                summary = future.result()
+                write_summary(config, transcript_path, summary, embedder)
+            except Exception as exc:
+                print(f"Failed to process {transcript_path}: {exc}")
+                failed.append(transcript_path)
+                continue
+            print(f"Processed {transcript_path}.")
+            if checkpoints is not None:
+                checkpoints.mark_written(summary["metadata"]["id"])
+    return sorted(failed)
+
+
+def process_queue(
+    client: OpenAI,
+    config: Dict[str, Any],
+    system_prompt: str,
+    queue: SQLiteWorkQueue,
+    worker: str,
+    workers: int = 1,
+    cache: Optional[ResponseCache] = None,
+    checkpoints: Optional[CheckpointStore] = None,
+    embedder=None,
+) -> int:
+    """Summarize transcripts claimed from a shared queue until it is drained.
+
+    Up to ``workers`` transcripts are leased at the same time and their
+    chunk requests share one bounded pool, as in ``process_transcripts``.
+    The generation of a transcript's summary is read when it is claimed and
+    the summary is only written if it is still at that generation, so a
+    transcript that another worker took over is written once. Returns the
+    number of transcripts this process completed.
+    """
+    settings = config["queue"]
+    storage = GCSStorage(config["paths"]["bucket_name"])
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm") as llm_pool:
+
+        def handle(lease: Lease, heartbeat: Heartbeat):
+            generation = storage.generation(summary_path(config, lease.transcript_path))
+            summary = summarize_transcript(
+                client,
+                config,
+                system_prompt,
+                lease.transcript_path,
+                llm_pool,
+                cache,
+                checkpoints,
+                2 * workers,
+            )
+            if not heartbeat.renew():
+                raise LeaseLost(lease.episode_id)
+            try:
+                write_summary(
+                    config, lease.transcript_path, summary, embedder, generation or 0
+                )
+            except PreconditionFailed:
+                print(f"Summary of {lease.episode_id} was written by another worker.")
+            else:
+                print(f"Processed {lease.transcript_path}.")
+            if checkpoints is not None:
+                checkpoints.mark_written(lease.episode_id)
+
+        def work(index: int) -> int:
+            return run_worker(
+                queue,
+                handle,
+                f"{worker}-{index}",
+                settings["heartbeat_seconds"],
+                settings["poll_seconds"],
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="queue"
+        ) as queue_pool:
+            return sum(queue_pool.map(work, range(workers)))
+
+
+def process_transcripts_in_batches(
+    backend,
+    config: Dict[str, Any],
+    system_prompt: str,
+    transcript_paths: List[str],
+    cache: Optional[ResponseCache] = None,
+    checkpoints: Optional[CheckpointStore] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    embedder=None,
+):
+    """Summarize transcripts through a batch backend instead of live calls.
+
+    The chunk prompts of every transcript go into one batch, then each merge
+    level of the tree mode and finally the combined prompts go into one batch
+    each. Prompts answered by the cache or stored as checkpoints are not sent
+    again, and with checkpoints a restarted run resumes polling the batches
+    it already submitted. Episodes with a failed request are skipped and stay
+    pending; with ``structured_output``, so are episodes with a summary that
+    is not valid against the schema.
+    """
+    tree_mode = config.get("combining", {"mode": "flat"})["mode"] == "tree"
+    # Checked before any batch is paid for
+    fan_out = tree_fan_out(config) if tree_mode else None
+    batch = config["batch"]
+    run_id = time.strftime("%Y%m%d-%H%M%S")
+    validator = (
+        schema_validator(config["schema"]) if "structured_output" in config else None
+    )
+
+    def decode(content: Optional[str]) -> Optional[Dict[str, Any]]:
+        if content is None:
+            return None
+        try:
+            document = json.loads(content)
+        except json.JSONDecodeError:
+            return None
+        if validator is not None and validator.invalid_fields(document):
+            return None
+        return document
+
+    def run_stage(
+        stage: str, prompts: Dict[str, Tuple[str, str]]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        contents, requests, keys = {}, {}, {}
+        for custom_id, (user_prompt, model) in prompts.items():
+            body = summary_request(system_prompt, user_prompt, model)
+            if cache is not None:
+                keys[custom_id] = cache_key(
+                    model,
+                    system_prompt,
+                    user_prompt,
+                    body["temperature"],
+                    body["max_tokens"],
+                )
+                contents[custom_id] = cache.get(keys[custom_id])
+                if contents[custom_id] is not None:
+                    continue
+            requests[custom_id] = body
+
+        if requests:
+            requests_path = os.path.join(batch["directory"], f"{run_id}-{stage}.jsonl")
+            with timed("batch", batch=stage):
+                results = run_batch(
+                    backend,
+                    requests,
+                    requests_path,
+                    batch["poll_interval"],
+                    sleep,
+                    checkpoints,
+                )
+            for custom_id, content in results.items():
+                if decode(content) is not None and cache is not None:
+                    cache.put(keys[custom_id], prompts[custom_id][1], content)
+                contents[custom_id] = content
+        return {custom_id: decode(content) for custom_id, content in contents.items()}
+
+    def drop_failed(results: Dict[str, Optional[Dict[str, Any]]]):
+        for custom_id, result in results.items():
+            episode_id = custom_id.split("/")[0]
+            if result is None and episode_id in episodes:
+                print(f"Skipping {episode_id}: a batch request failed.")
+                del episodes[episode_id]
+
+    # Chunk summaries of every episode, reusing checkpoints
+    episodes: Dict[str, Dict[str, Any]] = {}
+    prompts = {}
+    for transcript_path in transcript_paths:
+        episode_id = get_metadata_from_path(transcript_path)["id"]
+        with for_episode(episode_id):
+            # Every prompt goes into the batch file, so all chunks are needed
+            chunks = list(chunk_transcript(transcript_path, config))
+        done = {}
+        if checkpoints is not None:
+            done = checkpoints.start_episode(
+                episode_id, transcript_path, chunks_hash(chunks), len(chunks)
+            )
+        episodes[episode_id] = {
+            "path": transcript_path,
+            "summaries": [done.get(index) for index in range(len(chunks))],
+            "final": checkpoints.combined(episode_id) if checkpoints else None,
+        }
+        if episodes[episode_id]["final"] is not None:
+            continue
+        for index, chunk in enumerate(chunks):
+            if index not in done:
+                prompts[f"{episode_id}/chunk/{index}"] = (
+                    config["prompts"]["user_chunk"].format(content=chunk),
+                    config["models"]["chunk"],
+                )
+
+    results = run_stage("chunks", prompts)
+    drop_failed(results)
+    for custom_id, result in results.items():
+        episode_id, _, index = custom_id.split("/")
+        if episode_id in episodes:
+            episodes[episode_id]["summaries"][int(index)] = result
+            if checkpoints is not None:
+                checkpoints.save_chunk(episode_id, int(index), result)
+
+    pending = {
+        episode_id: episode
+        for episode_id, episode in episodes.items()
+        if episode["final"] is None
+    }
+
+    # Merge levels of the tree mode, one batch per level across all episodes
+    if tree_mode:
+        level = 0
+        while any(len(episode["summaries"]) > fan_out for episode in pending.values()):
+            groups, prompts = {}, {}
+            for episode_id, episode in pending.items():
+                summaries = episode["summaries"]
+                if len(summaries) <= fan_out:
+                    continue
+                groups[episode_id] = [
+                    summaries[i : i + fan_out]
+                    for i in range(0, len(summaries), fan_out)
+                ]
+                for index, group in enumerate(groups[episode_id]):
+                    if len(group) > 1:
+                        prompts[f"{episode_id}/merge-{level}/{index}"] = (
+                            merge_prompt(config, group),
+                            config["models"]["chunk"],
+                        )
+
+            results = run_stage(f"merge-{level}", prompts)
+            drop_failed(results)
+            pending = {key: value for key, value in pending.items() if key in episodes}
+            for episode_id, episode_groups in groups.items():
+                if episode_id in pending:
+                    pending[episode_id]["summaries"] = [
+                        results.get(f"{episode_id}/merge-{level}/{index}") or group[0]
+                        for index, group in enumerate(episode_groups)
+                    ]
+            level += 1
+
+    # Final summaries
+    prompts = {
+        f"{episode_id}/combined": (
+            combined_prompt(config, episode["summaries"]),
+            config["models"]["combined"],
+        )
+        for episode_id, episode in pending.items()
+    }
+    results = run_stage("combined", prompts)
+    drop_failed(results)
+    for custom_id, result in results.items():
+        episode_id = custom_id.split("/")[0]
+        if episode_id in episodes:
+            result["metadata"].update(
+                get_metadata_from_path(episodes[episode_id]["path"])
+            )
+            episodes[episode_id]["final"] = result
+            if checkpoints is not None:
+                checkpoints.save_combined(episode_id, result)
+
+    for episode_id, episode in episodes.items():
+        write_summary(config, episode["path"], episode["final"], embedder)
+        if checkpoints is not None:
+            checkpoints.mark_written(episode_id)
+    print(f"Wrote {len(episodes)} of {len(transcript_paths)} summaries.")
 
 
 if __name__ == "__main__":
     # Configuration
     config = load_yaml("config.yml")
+    if config.get("combining", {"mode": "flat"})["mode"] == "tree":
+        tree_fan_out(config)
+
+    parser = argparse.ArgumentParser(description="Summarize new podcast transcripts.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["run", "status", "enqueue", "work"],
+        default="run",
+        help="Summarize pending transcripts, show per-episode progress, add "
+        "pending transcripts to the work queue or work on the queue.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=config["processing"]["workers"],
+        help="Maximum number of concurrent LLM requests.",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Submit prompts through the Batch API and wait for the results.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Call the API for every prompt, ignoring the response cache.",
+    )
+    parser.add_argument(
+        "--purge-cache",
+        action="store_true",
+        help="Delete every cached response before running.",
+    )
+    parser.add_argument(
+        "--worker-id",
+        default=f"{socket.gethostname()}-{os.getpid()}",
+        help="Name under which this process leases transcripts from the queue.",
+    )
+    args = parser.parse_args()
 
     TRANSCRIPTS_DIR = config["paths"]["transcripts"]
     SUMMARIES_DIR = config["paths"]["summaries"]
     BUCKET_NAME = config["paths"]["bucket_name"]
 
-    CHUNK_MODEL = config["models"]["chunk"]
-    COMBINED_MODEL = config["models"]["combined"]
+    # Find transcripts that are new or changed since they were summarized
+    untranslated_paths = []
+    if args.command != "work":
+        transcript_state = TranscriptState(config["transcripts"]["state"])
+        # Only the commands that go on to summarize mark transcripts queued
+        untranslated_paths = find_unsummarized_transcripts(
+            TRANSCRIPTS_DIR,
+            BUCKET_NAME,
+            SUMMARIES_DIR,
+            transcript_state,
+            manifest=config["paths"]["manifest"],
+            claim=args.command != "status",
+        )
+
+    # Workers on this machine or sharing its filesystem claim transcripts here
+    queue = SQLiteWorkQueue(
+        config["queue"]["path"],
+        config["queue"]["lease_seconds"],
+        config["queue"]["max_attempts"],
+    )
+    if args.command == "enqueue":
+        added = queue.enqueue(
+            (get_metadata_from_path(path)["id"], path, file_hash(path))
+            for path in untranslated_paths
+        )
+        print(f"Queued {added} of {len(untranslated_paths)} pending transcripts.")
+        raise SystemExit(0)
+
+    # Progress of every episode is recorded so that an interrupted run resumes
+    checkpoints = CheckpointStore(config["checkpoints"]["path"])
+    if args.command == "status":
+        print(format_status(checkpoints.status(), untranslated_paths))
+        print(
+            "Queue: "
+            + ", ".join(f"{count} {state}" for state, count in queue.counts().items())
+        )
+        raise SystemExit(0)
+
+    # Initialize OpenAI client; retries are left to the scheduler
+    retries = config["retries"]
+    client = RateLimitedClient(
+        OpenAI(max_retries=0, timeout=retries["timeout"]),
+        config["rate_limits"],
+        max_attempts=retries["max_attempts"],
+        base_delay=retries["base_delay"],
+        max_delay=retries["max_delay"],
+    )
+
+    # Responses are cached so that reruns only pay for prompts that changed
+    cache = ResponseCache(config["cache"]["path"], config["cache"]["max_bytes"])
+    if args.purge_cache:
+        cache.purge()
+    if args.no_cache:
+        cache = None
 
-    # Initialize OpenAI client
-    client = OpenAI()
+    # Summaries are embedded as they are written, for semantic search
+    embedder = create_embedder(config["embeddings"], client.client)
 
     # Generate system prompt
     schema = json.dumps(config["schema"], indent=4)
     system_prompt = config["prompts"]["system"].format(schema=schema)
 
-    # Find transcripts that have not been summarized
-    untranslated_paths = find_unsummarized_transcripts(
-        TRANSCRIPTS_DIR, BUCKET_NAME, SUMMARIES_DIR
-    )
+    # Every stage is timed and every LLM call's token usage recorded
+    recorder = RunRecorder(config["pricing"])
 
     # Process transcripts
-    if not untranslated_paths:
+    if args.command == "work":
+        with recorder.activate():
+            completed = process_queue(
+                client,
+                config,
+                system_prompt,
+                queue,
+                args.worker_id,
+                workers=args.workers,
+                cache=cache,
+                checkpoints=checkpoints,
+                embedder=embedder,
+            )
+        print(f"{args.worker_id} completed {completed} transcripts.")
+    elif not untranslated_paths:
         print("No transcripts to summarize.")
-    else:
-        for transcript_path in tqdm(untranslated_paths, desc="Processing Transcripts"):
-            print(f"Processing {transcript_path}...")
-            # Read transcript and split into chunks
-            transcript = read_text(transcript_path)
-            chunks = split_transcript(transcript)
-
-            # generate summaries for each chunk
-            chunk_summaries = []
-            for chunk in chunks:
-                chunk_prompt = config["prompts"]["user_chunk"].format(content=chunk)
-                chunk_sum = generate_summary(
-                    client, system_prompt, chunk_prompt, CHUNK_MODEL
-                )
-                chunk_sum_dict = json.loads(chunk_sum)
-                chunk_summaries.append(chunk_sum_dict)
-
-            # combine summaries into a single file
-            combined_summaries = combine_summaries(chunk_summaries)
-            combined_summaries_txt = json.dumps(
-                combined_summaries, ensure_ascii=False, indent=4
+    elif args.batch:
+        with recorder.activate():
+            process_transcripts_in_batches(
+                OpenAIBatchBackend(client.client),
+                config,
+                system_prompt,
+                untranslated_paths,
+                cache=cache,
+                checkpoints=checkpoints,
+                embedder=embedder,
             )
-
-            # generate final summary
-            user_prompt_final = config["prompts"]["user_combined"].format(
-                content=combined_summaries_txt
+    else:
+        with recorder.activate():
+            failed = process_transcripts(
+                client,
+                config,
+                system_prompt,
+                untranslated_paths,
+                workers=args.workers,
+                cache=cache,
+                checkpoints=checkpoints,
+                embedder=embedder,
             )
-            final_sum = generate_summary(
-                client, system_prompt, user_prompt_final, COMBINED_MODEL
+        if failed:
+            print(f"{len(failed)} of {len(untranslated_paths)} transcripts failed:")
+            for transcript_path in failed:
+                print(f"  {transcript_path}")
+        for model, stats in client.report().items():
+            print(
+                f"{model}: {stats['requests']} requests ({stats['retries']} retries), "
+                f"{stats['requests_per_minute']} requests/min, "
+                f"{stats['tokens_per_minute']} tokens/min"
             )
-            final_sum_dict = json.loads(final_sum)
-            final_sum_dict["metadata"].update(get_metadata_from_path(transcript_path))
-
-            # Write final summary to Google Cloud Storage
-            summary_file_path = f"{SUMMARIES_DIR}{os.path.basename(transcript_path).replace('.txt', '.json')}"
-            write_json_to_gcs(final_sum_dict, "ai-podcast-cards", summary_file_path)
+    if cache is not None:
+        stats = cache.stats()
+        print(
+            f"Response cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['entries']} entries ({stats['bytes']} bytes)"
+        )
+    if recorder.events:
+        report_path = os.path.join(
+            config["reports"]["directory"], time.strftime("run-%Y%m%d-%H%M%S")
+        )
+        recorder.write(f"{report_path}.json")
+        recorder.write(f"{report_path}.csv")
+        print(format_report(recorder.report()))
+        print(f"Run report written to {report_path}.json and {report_path}.csv")
@@ -0,0 +1,270 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+
+# Errors worth retrying; anything else (bad request, auth) fails immediately
+RETRYABLE_ERRORS = (
+    RateLimitError,
+    APITimeoutError,
+    APIConnectionError,
+    InternalServerError,
+)
+
+CHARS_PER_TOKEN = 4
+WINDOW_SECONDS = 60.0
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int = 0) -> int:
+    """Estimate the tokens a request counts against the tokens-per-minute limit.
+
+    Providers charge the prompt plus the requested completion budget, so the
+    estimate is the prompt length in characters divided by four plus
+    ``max_tokens``.
+    """
+    prompt_chars = sum(len(message["content"]) for message in messages)
+    return prompt_chars // CHARS_PER_TOKEN + len(messages) * 4 + (max_tokens or 0)
+
+
+class RateLimiter:
+    """Sliding one-minute window of requests and tokens for one model.
+
+    ``acquire`` blocks until a request of the given size fits in both the
+    requests-per-minute and tokens-per-minute budgets and records it; the
+    returned reservation can later be corrected to the actual usage.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.clock = clock
+        self.sleep = sleep
+        self._window: "deque[List[float]]" = deque()
+        self._lock = threading.Lock()
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        while self._window and self._window[0][0] <= now - WINDOW_SECONDS:
+            self._window.popleft()
+
+        excess_requests = len(self._window) + 1 - self.requests_per_minute
+        excess_tokens = (
+            sum(entry[1] for entry in self._window) + tokens - self.tokens_per_minute
+        )
+        # Wait until enough of the oldest requests have left the window
+        wait = 0.0
+        for timestamp, entry_tokens in self._window:
+            if excess_requests <= 0 and excess_tokens <= 0:
+                break
+            excess_requests -= 1
+            excess_tokens -= entry_tokens
+            wait = timestamp + WINDOW_SECONDS - now
+        return wait
+
+    def acquire(self, tokens: int) -> List[float]:
+        """Wait until ``tokens`` fit in the budget and reserve them."""
+        # A request larger than the whole budget still runs, on an empty window
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = self.clock()
+                wait = self._wait_time(tokens, now)
+                if wait <= 0:
+                    reservation = [now, tokens]
+                    self._window.append(reservation)
+                    return reservation
+            self.sleep(wait)
+
+    def settle(self, reservation: List[float], tokens: int):
+        """Replace the estimated tokens of a reservation with the actual usage."""
+        with self._lock:
+            reservation[1] = min(tokens, self.tokens_per_minute)
+
+
+class _ModelStats:
+    __slots__ = (
+        "requests",
+        "retries",
+        "prompt_tokens",
+        "completion_tokens",
+        "first",
+        "last",
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+
+
+class _Completions:
+    def __init__(self, create: Callable[..., Any]):
+        self.create = create
+
+
+class _Chat:
+    def __init__(self, create: Callable[..., Any]):
+        self.completions = _Completions(create)
+
+
+class _UsageStream:
+    """Streamed completion that reports the usage of its final chunk.
+
+    Chunks are passed through unchanged; once the stream is exhausted or
+    closed, ``on_usage`` is called with the usage it carried, or None.
+    """
+
+    def __init__(self, stream: Any, on_usage: Callable[[Any], None]):
+        self._stream = stream
+        self._on_usage = on_usage
+
+    def __iter__(self):
+        usage = None
+        try:
+            for chunk in self._stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                yield chunk
+        finally:
+            self._on_usage(usage)
+
+
+class RateLimitedClient:
+    """OpenAI client wrapper that schedules chat completions within rate limits.
+
+    Each request is held back until it fits in the requests-per-minute and
+    tokens-per-minute budget of its model and retried with jittered
+    exponential backoff on throttling, timeouts and server errors. It exposes
+    ``chat.completions.create`` so it can be passed wherever an ``OpenAI``
+    client is expected.
+    """
+
+    def __init__(
+        self,
+        client: OpenAI,
+        rate_limits: Dict[str, Dict[str, int]],
+        max_attempts: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.client = client
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.limiters = {
+            model: RateLimiter(
+                limits["requests_per_minute"],
+                limits["tokens_per_minute"],
+                clock=clock,
+                sleep=sleep,
+            )
+            for model, limits in rate_limits.items()
+        }
+        self.stats: Dict[str, _ModelStats] = {}
+        self._lock = threading.Lock()
+        self.chat = _Chat(self.create)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        response = getattr(error, "response", None)
+        retry_after = (
+            response.headers.get("retry-after") if response is not None else None
+        )
+        try:
+            return max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            return delay
+
+    def _record(self, model: str, started: float, response: Any = None):
+        with self._lock:
+            stats = self.stats.setdefault(model, _ModelStats())
+            if response is None:
+                stats.retries += 1
+                return
+            stats.requests += 1
+            stats.first = started if stats.first is None else min(stats.first, started)
+            stats.last = self.clock()
+
+    def _settle(self, model: str, reservation: Optional[List[float]], usage: Any):
+        if usage is None:
+            return
+        if reservation is not None:
+            self.limiters[model].settle(reservation, usage.total_tokens)
+        with self._lock:
+            stats = self.stats.setdefault(model, _ModelStats())
+            stats.prompt_tokens += usage.prompt_tokens
+            stats.completion_tokens += usage.completion_tokens
+            stats.last = self.clock()
+
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs) -> Any:
+        """Create a chat completion once the model's budget allows it.
+
+        Streamed completions carry their usage in the last chunk, so they are
+        settled once the returned stream has been read.
+        """
+        limiter = self.limiters.get(model)
+        tokens = estimate_tokens(messages, kwargs.get("max_tokens"))
+        started = self.clock()
+
+        for attempt in range(self.max_attempts):
+            reservation = limiter.acquire(tokens) if limiter else None
+            try:
+                response = self.client.chat.completions.create(
+                    model=model, messages=messages, **kwargs
+                )
+            except RETRYABLE_ERRORS as error:
+                if attempt == self.max_attempts - 1:
+                    raise
+                self._record(model, started)
+                self.sleep(self._backoff(attempt, error))
+                continue
+
+            self._record(model, started, response)
+            if kwargs.get("stream"):
+                return _UsageStream(
+                    response,
+                    lambda usage, reservation=reservation: self._settle(
+                        model, reservation, usage
+                    ),
+                )
+            self._settle(model, reservation, getattr(response, "usage", None))
+            return response
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Return request and token counts and the achieved rates per model."""
+        report = {}
+        with self._lock:
+            for model, stats in self.stats.items():
+                elapsed = stats.last - stats.first if stats.requests else 0.0
+                minutes = max(elapsed, 1.0) / WINDOW_SECONDS
+                tokens = stats.prompt_tokens + stats.completion_tokens
+                report[model] = {
+                    "requests": stats.requests,
+                    "retries": stats.retries,
+                    "prompt_tokens": stats.prompt_tokens,
+                    "completion_tokens": stats.completion_tokens,
+                    "requests_per_minute": round(stats.requests / minutes, 1),
+                    "tokens_per_minute": round(tokens / minutes, 1),
+                }
+        return report
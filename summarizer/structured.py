@@ -0,0 +1,275 @@
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from jsonschema import validators
+from openai import OpenAI
+
+from instrumentation import active, timed
+from llm_cache import ResponseCache, cache_key
+from scheduler import CHARS_PER_TOKEN
+from utils import summary_request
+
+_validators: Dict[str, "SchemaValidator"] = {}
+_validators_lock = threading.Lock()
+
+
+class PartialJSON:
+    """Incremental parser for a streamed JSON object.
+
+    Text is fed as it arrives and scanned once; every top-level member is
+    decoded as soon as the comma or brace closing it is seen. When a response
+    is cut off, ``fields`` holds every member that was complete.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.closed = False
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start: Optional[int] = None
+
+    def _complete_member(self, end: int) -> List[str]:
+        member = self.text[self._member_start : end].strip()
+        self._member_start = end + 1
+        if not member:
+            return []
+        try:
+            decoded = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            return []
+        self.fields.update(decoded)
+        return list(decoded)
+
+    def feed(self, delta: str) -> List[str]:
+        """Scan new text and return the keys of the members it completed."""
+        self.text += delta
+        completed = []
+        text, depth = self.text, self._depth
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif self.closed:
+                break
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                depth += 1
+                if depth == 1 and char == "{":
+                    self._member_start = index + 1
+            elif char in "}]":
+                if depth == 1 and self._member_start is not None:
+                    completed += self._complete_member(index)
+                    self.closed = True
+                depth -= 1
+            elif char == "," and depth == 1 and self._member_start is not None:
+                completed += self._complete_member(index)
+        self._position, self._depth = len(text), depth
+        return completed
+
+
+class SchemaValidator:
+    """Validator compiled once from the summary schema."""
+
+    def __init__(self, schema: Dict[str, Any]):
+        cls = validators.validator_for(schema)
+        cls.check_schema(schema)
+        self.schema = schema
+        self._validator = cls(schema)
+        self.required = list(schema.get("required", []))
+
+    def ordered(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Order a document's fields as the schema lists them."""
+        order = list(self.schema.get("properties", {}))
+        return dict(
+            sorted(
+                document.items(),
+                key=lambda item: order.index(item[0])
+                if item[0] in order
+                else len(order),
+            )
+        )
+
+    def invalid_fields(self, document: Any) -> List[str]:
+        """Return the required top-level fields that are missing or invalid."""
+        if not isinstance(document, dict):
+            return list(self.required)
+        invalid = set()
+        for error in self._validator.iter_errors(document):
+            if error.absolute_path:
+                invalid.add(str(error.absolute_path[0]))
+            elif error.validator == "required":
+                invalid.update(key for key in self.required if key not in document)
+        return [key for key in self.required if key in invalid] + sorted(
+            invalid - set(self.required)
+        )
+
+
+def schema_validator(schema: Dict[str, Any]) -> SchemaValidator:
+    """Return the compiled validator for a schema, compiling it on first use."""
+    key = json.dumps(schema, sort_keys=True)
+    with _validators_lock:
+        if key not in _validators:
+            _validators[key] = SchemaValidator(schema)
+        return _validators[key]
+
+
+def _complete(
+    client: OpenAI, request: Dict[str, Any], stream: bool
+) -> Tuple[PartialJSON, str, int, int]:
+    """Run one completion and return the parser, finish reason and token usage.
+
+    Streamed responses are parsed as their tokens arrive.
+    """
+    parser = PartialJSON()
+    finish_reason, usage = "stop", None
+    if stream:
+        chunks = client.chat.completions.create(
+            **request,
+            stream=True,
+            extra_body={"stream_options": {"include_usage": True}},
+        )
+        for chunk in chunks:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                parser.feed(choice.delta.content)
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+    else:
+        response = client.chat.completions.create(**request)
+        choice = response.choices[0]
+        parser.feed(choice.message.content or "")
+        finish_reason = getattr(choice, "finish_reason", "stop") or "stop"
+        usage = getattr(response, "usage", None)
+
+    if usage is not None:
+        return parser, finish_reason, usage.prompt_tokens, usage.completion_tokens
+    prompt_chars = sum(len(message["content"]) for message in request["messages"])
+    return (
+        parser,
+        finish_reason,
+        prompt_chars // CHARS_PER_TOKEN,
+        len(parser.text) // CHARS_PER_TOKEN,
+    )
+
+
+def generate_valid_summary(
+    client: OpenAI,
+    system_prompt: str,
+    user_prompt: str,
+    model: str,
+    validator: SchemaValidator,
+    repair_prompt: str,
+    cache: Optional[ResponseCache] = None,
+    stream: bool = True,
+    max_repairs: int = 2,
+    temperature: float = 0.5,
+    max_tokens: int = 1000,
+) -> Dict[str, Any]:
+    """Generate a summary that is valid against the schema.
+
+    The completion is parsed incrementally, streamed unless ``stream`` is
+    False. When it is cut off or has missing or invalid fields, the complete
+    valid fields are kept and only the others are requested again with
+    ``repair_prompt``, formatted with the original prompt as ``content`` and
+    the field names as ``fields``. Each repair is recorded with the
+    completion tokens and seconds that regenerating the whole summary would
+    have spent again. Only valid summaries are cached, and cached responses
+    are validated like fresh ones: an invalid entry is evicted, and its
+    valid fields are repaired or, without any, the summary is requested
+    again.
+    """
+    document: Optional[Dict[str, Any]] = None
+    if cache is not None:
+        key = cache_key(model, system_prompt, user_prompt, temperature, max_tokens)
+        content = cache.get(key)
+        if content is not None:
+            with timed("llm", model=model, cached=True):
+                parser = PartialJSON()
+                parser.feed(content)
+                invalid = validator.invalid_fields(parser.fields)
+            if not invalid:
+                return validator.ordered(parser.fields)
+            cache.discard(key)
+            if len(invalid) < len(validator.required):
+                document, finish_reason = parser.fields, "cached"
+                kept_tokens, kept_seconds = len(content) // CHARS_PER_TOKEN, 0.0
+
+    if document is None:
+        request = summary_request(
+            system_prompt, user_prompt, model, temperature, max_tokens
+        )
+        with timed("llm", model=model, cached=False) as event:
+            started = time.perf_counter()
+            parser, finish_reason, prompt_tokens, completion_tokens = _complete(
+                client, request, stream
+            )
+            event.update(
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+            )
+        kept_seconds = time.perf_counter() - started
+        kept_tokens = completion_tokens
+        document = parser.fields
+        invalid = validator.invalid_fields(document)
+
+    repairs, repair_seconds = 0, 0.0
+    while invalid:
+        if repairs == max_repairs:
+            raise RuntimeError(
+                f"{model} returned no valid {', '.join(invalid)} after "
+                f"{max_repairs} repairs ({finish_reason})"
+            )
+        repairs += 1
+
+        # Keep the valid fields and request only the others
+        document = {key: value for key, value in document.items() if key not in invalid}
+        repair_request = summary_request(
+            system_prompt,
+            repair_prompt.format(content=user_prompt, fields=", ".join(invalid)),
+            model,
+            temperature,
+            max_tokens,
+        )
+        started = time.perf_counter()
+        with timed("llm", model=model, cached=False) as event:
+            parser, finish_reason, prompt_tokens, completion_tokens = _complete(
+                client, repair_request, stream
+            )
+            event.update(
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+            )
+        repair_seconds += time.perf_counter() - started
+        document.update(
+            {key: value for key, value in parser.fields.items() if key in invalid}
+        )
+        invalid = validator.invalid_fields(document)
+
+    recorder = active()
+    if repairs and recorder is not None:
+        # Regenerating the whole summary would have spent the kept tokens again
+        recorder.record(
+            "repair",
+            repair_seconds,
+            model=model,
+            saved_tokens=kept_tokens,
+            saved_seconds=kept_seconds,
+        )
+
+    document = validator.ordered(document)
+    if cache is not None:
+        cache.put(key, model, json.dumps(document, ensure_ascii=False))
+    return document
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The summarizer modules import each other as top-level modules (``from utils
+# import ...``) because they are run as scripts from this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
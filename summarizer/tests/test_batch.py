@@ -0,0 +1,318 @@
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+
+from batch import LocalBatchBackend, parse_batch_output, run_batch
+from checkpoints import CheckpointStore
+from llm_cache import ResponseCache
+from process import process_transcripts_in_batches
+
+
+class StubClient:
+    """OpenAI client stand-in that answers chunk, merge and combined prompts"""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        if self.fail_on and self.fail_on in prompt:
+            raise RuntimeError("server error")
+        summary = {
+            "metadata": {},
+            "summary": prompt[:5],
+            "topics": [],
+            "quotes": [],
+            "terms": {},
+            "recommendations": [],
+            "conclusions": "",
+        }
+        message = SimpleNamespace(content=json.dumps(summary))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        "prompts": {
+            "user_chunk": "CHUNK {content}",
+            "user_merge": "MERGE {content}",
+            "user_combined": "COMBINE {content}",
+        },
+        "models": {"chunk": "chunk-model", "combined": "combined-model"},
+        "batch": {"directory": str(tmp_path / "batches"), "poll_interval": 5},
+    }
+
+
+def write_transcript(directory, name, chunks):
+    paragraphs = [f"part {i} " + "x" * 55000 for i in range(chunks)]
+    path = directory / f"{name}.txt"
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return str(path)
+
+
+def batch_files(config, kind):
+    directory = config["batch"]["directory"]
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if name.endswith(kind))
+
+
+def test_parse_batch_output():
+    lines = [
+        {
+            "custom_id": "ok",
+            "response": {
+                "status_code": 200,
+                "body": {"choices": [{"message": {"content": "{}"}}]},
+            },
+        },
+        {"custom_id": "error", "response": None, "error": {"message": "failed"}},
+        {
+            "custom_id": "truncated",
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "choices": [
+                        {"message": {"content": "{"}, "finish_reason": "length"}
+                    ]
+                },
+            },
+        },
+    ]
+
+    results = parse_batch_output("".join(json.dumps(line) + "\n" for line in lines))
+
+    assert results == {"ok": "{}", "error": None, "truncated": None}
+
+
+def test_run_batch_writes_requests_and_polls_until_completed(tmp_path):
+    backend = LocalBatchBackend(str(tmp_path / "backend"), StubClient())
+    sleep = Mock()
+    requests = {
+        "a": {"model": "m", "messages": [{"role": "user", "content": "first"}]},
+        "b": {"model": "m", "messages": [{"role": "user", "content": "second"}]},
+    }
+
+    results = run_batch(backend, requests, str(tmp_path / "requests.jsonl"), 5, sleep)
+
+    assert json.loads(results["a"])["summary"] == "first"
+    assert json.loads(results["b"])["summary"] == "secon"
+    sleep.assert_called_once_with(5)
+    with open(tmp_path / "requests.jsonl", encoding="utf-8") as file:
+        line = json.loads(file.readline())
+    assert line["url"] == "/v1/chat/completions"
+    assert line["custom_id"] == "a"
+
+
+def request(content):
+    return {"model": "m", "messages": [{"role": "user", "content": content}]}
+
+
+class ExpiringBackend(LocalBatchBackend):
+    """Local backend whose first batch expires after answering ``finished``
+    requests"""
+
+    def __init__(self, directory, client, finished):
+        super().__init__(directory, client)
+        self.finished = finished
+        self.submitted = []
+
+    def submit(self, requests_path):
+        batch_id = super().submit(requests_path)
+        self.submitted.append(batch_id)
+        return batch_id
+
+    def status(self, batch_id):
+        status = super().status(batch_id)
+        if batch_id != self.submitted[0] or status != "completed":
+            return status
+        with open(self._path(batch_id, "output"), encoding="utf-8") as file:
+            rows = file.readlines()
+        with open(self._path(batch_id, "output"), "w", encoding="utf-8") as file:
+            file.writelines(rows[: self.finished])
+        return "expired"
+
+
+def test_failed_batch_raises(tmp_path):
+    backend = Mock()
+    backend.status.return_value = "failed"
+
+    with pytest.raises(RuntimeError, match="failed"):
+        run_batch(backend, {"a": request("a")}, str(tmp_path / "r.jsonl"), sleep=Mock())
+
+
+def test_requests_are_split_into_batches_within_the_limits(tmp_path):
+    client = StubClient()
+    backend = LocalBatchBackend(str(tmp_path / "backend"), client)
+    requests = {str(i): request(f"prompt {i}") for i in range(5)}
+
+    results = run_batch(
+        backend, requests, str(tmp_path / "r.jsonl"), sleep=Mock(), max_requests=2
+    )
+
+    assert [json.loads(results[str(i)])["summary"] for i in range(5)] == ["promp"] * 5
+    files = sorted(name for name in os.listdir(tmp_path) if name.startswith("r"))
+    assert files == ["r-0.jsonl", "r-1.jsonl", "r-2.jsonl"]
+
+    # Every line is over half the byte limit, so each gets a file of its own
+    run_batch(backend, requests, str(tmp_path / "b.jsonl"), sleep=Mock(), max_bytes=200)
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("b-")]) == 5
+
+
+def test_restarted_run_polls_the_stored_batch(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    backend = LocalBatchBackend(str(tmp_path / "backend"), StubClient())
+    requests = {"a": request("first"), "b": request("second")}
+
+    with pytest.raises(KeyboardInterrupt):
+        run_batch(
+            backend,
+            requests,
+            str(tmp_path / "r1.jsonl"),
+            sleep=Mock(side_effect=KeyboardInterrupt),
+            checkpoints=store,
+        )
+    results = run_batch(
+        backend, requests, str(tmp_path / "r2.jsonl"), sleep=Mock(), checkpoints=store
+    )
+
+    assert json.loads(results["b"])["summary"] == "secon"
+    inputs = [name for name in os.listdir(tmp_path / "backend") if "input" in name]
+    assert len(inputs) == 1
+    assert store._db.execute("SELECT COUNT(*) FROM batches").fetchone() == (0,)
+    store.close()
+
+
+def test_expired_batches_keep_finished_requests_and_resubmit_the_rest(tmp_path):
+    client = StubClient()
+    backend = ExpiringBackend(str(tmp_path / "backend"), client, finished=2)
+    requests = {name: request(name * 5) for name in "abcd"}
+
+    results = run_batch(backend, requests, str(tmp_path / "r.jsonl"), sleep=Mock())
+
+    assert {key: json.loads(value)["summary"] for key, value in results.items()} == {
+        name: name * 5 for name in "abcd"
+    }
+    assert len(backend.submitted) == 2
+    assert sorted(client.prompts) == [
+        "aaaaa",
+        "bbbbb",
+        "ccccc",
+        "ccccc",
+        "ddddd",
+        "ddddd",
+    ]
+    with open(tmp_path / "r-retry1.jsonl", encoding="utf-8") as file:
+        assert [json.loads(line)["custom_id"] for line in file] == ["c", "d"]
+
+
+@patch("process.write_summary")
+def test_batch_run_summarizes_every_transcript(write_summary, tmp_path, config):
+    client = StubClient()
+    backend = LocalBatchBackend(str(tmp_path / "backend"), client)
+    paths = [
+        write_transcript(tmp_path, "dwarkesh_podcast_230327", chunks=3),
+        write_transcript(tmp_path, "latent_space_240101", chunks=2),
+    ]
+
+    process_transcripts_in_batches(backend, config, "system", paths, sleep=Mock())
+
+    assert batch_files(config, ".jsonl")[0].endswith("-chunks.jsonl")
+    assert batch_files(config, ".jsonl")[1].endswith("-combined.jsonl")
+    assert [prompt[:5] for prompt in client.prompts] == ["CHUNK"] * 5 + ["COMBI"] * 2
+    written = {call.args[2]["metadata"]["id"] for call in write_summary.call_args_list}
+    assert written == {"dwarkesh_podcast_230327", "latent_space_240101"}
+
+
+@patch("process.write_summary")
+def test_batch_run_merges_levels_in_tree_mode(write_summary, tmp_path, config):
+    config["combining"] = {"mode": "tree", "fan_out": 2}
+    client = StubClient()
+    backend = LocalBatchBackend(str(tmp_path / "backend"), client)
+    paths = [write_transcript(tmp_path, "dwarkesh_podcast_230327", chunks=5)]
+
+    process_transcripts_in_batches(backend, config, "system", paths, sleep=Mock())
+
+    stages = [name.split("-", 2)[-1] for name in batch_files(config, ".jsonl")]
+    assert stages == [
+        "chunks.jsonl",
+        "combined.jsonl",
+        "merge-0.jsonl",
+        "merge-1.jsonl",
+    ]
+    assert [prompt[:5] for prompt in client.prompts].count("MERGE") == 3
+    assert write_summary.call_count == 1
+
+
+def test_batch_run_rejects_a_fan_out_below_two_before_submitting(tmp_path, config):
+    config["combining"] = {"mode": "tree", "fan_out": 1}
+    client = StubClient()
+    backend = LocalBatchBackend(str(tmp_path / "backend"), client)
+    paths = [write_transcript(tmp_path, "dwarkesh_podcast_230327", chunks=5)]
+
+    with pytest.raises(ValueError, match="fan_out"):
+        process_transcripts_in_batches(backend, config, "system", paths, sleep=Mock())
+    assert client.prompts == []
+
+
+@patch("process.write_summary")
+def test_episodes_with_failed_requests_are_skipped(write_summary, tmp_path, config):
+    backend = LocalBatchBackend(str(tmp_path / "backend"), StubClient("part 1"))
+    paths = [
+        write_transcript(tmp_path, "dwarkesh_podcast_230327", chunks=2),
+        write_transcript(tmp_path, "latent_space_240101", chunks=1),
+    ]
+
+    process_transcripts_in_batches(backend, config, "system", paths, sleep=Mock())
+
+    assert [call.args[1] for call in write_summary.call_args_list] == [paths[1]]
+
+
+@patch("process.write_summary")
+def test_cached_prompts_are_not_submitted_again(write_summary, tmp_path, config):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    client = StubClient()
+    backend = LocalBatchBackend(str(tmp_path / "backend"), client)
+    paths = [write_transcript(tmp_path, "dwarkesh_podcast_230327", chunks=2)]
+
+    process_transcripts_in_batches(
+        backend, config, "system", paths, cache=cache, sleep=Mock()
+    )
+    process_transcripts_in_batches(
+        backend, config, "system", paths, cache=cache, sleep=Mock()
+    )
+
+    assert len(client.prompts) == 3
+    assert len(batch_files(config, ".jsonl")) == 2
+    assert write_summary.call_count == 2
+    cache.close()
+
+
+@patch("process.write_summary")
+def test_summaries_invalid_against_the_schema_are_skipped(
+    write_summary, tmp_path, config
+):
+    config["structured_output"] = {"streaming": False, "max_repairs": 0}
+    config["schema"] = {
+        "type": "object",
+        "properties": {"conclusions": {"type": "string", "minLength": 1}},
+        "required": ["summary", "conclusions"],
+    }
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    backend = LocalBatchBackend(str(tmp_path / "backend"), StubClient())
+    paths = [write_transcript(tmp_path, "dwarkesh_podcast_230327", chunks=2)]
+
+    process_transcripts_in_batches(
+        backend, config, "system", paths, cache=cache, sleep=Mock()
+    )
+
+    write_summary.assert_not_called()
+    assert cache.stats()["entries"] == 0
+    cache.close()
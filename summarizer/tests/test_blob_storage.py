@@ -0,0 +1,26 @@
+import json
+from unittest.mock import patch
+
+from podcast_shared import storage as storage_module
+from blob_storage import GCSStorage
+from utils import write_json_to_gcs
+
+
+@patch.object(storage_module, "_client", None)
+@patch.object(storage_module, "_pool_size", 0)
+@patch("podcast_shared.storage.AuthorizedSession")
+@patch("podcast_shared.storage.google.auth.default", return_value=("credentials", None))
+@patch("podcast_shared.storage.storage.Client")
+def test_writes_reuse_one_pooled_client(MockClient, default, MockSession):
+    bucket = MockClient.return_value.bucket.return_value
+
+    write_json_to_gcs({"id": 1}, "bucket", "summaries/ep1.json")
+    write_json_to_gcs({"id": 2}, "bucket", "summaries/ep2.json")
+    GCSStorage("bucket").download_many(["summaries/ep1.json", "summaries/ep2.json"])
+
+    session = MockSession.return_value
+    MockClient.assert_called_once_with(credentials="credentials", _http=session)
+    upload = bucket.blob.return_value.upload_from_string
+    assert json.loads(upload.call_args.args[0]) == {"id": 2}
+    assert upload.call_args.kwargs["content_type"] == "application/json"
+    assert bucket.blob.return_value.download_as_text.call_count == 2
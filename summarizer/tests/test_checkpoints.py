@@ -0,0 +1,129 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+import pytest
+
+from checkpoints import CheckpointStore, chunks_fingerprint, chunks_hash, format_status
+from utils import split_transcript
+from process import process_transcripts, summarize_transcript
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def config():
+    return {
+        "prompts": {"user_chunk": "{content}", "user_combined": "COMBINE"},
+        "models": {"chunk": "chunk-model", "combined": "combined-model"},
+    }
+
+
+def chunk_summary(index):
+    return {
+        "metadata": {},
+        "summary": f"summary {index}",
+        "topics": [],
+        "quotes": [],
+        "terms": {},
+        "recommendations": [],
+        "conclusions": "",
+    }
+
+
+def write_transcript(directory, name, chunks=3):
+    paragraphs = [f"CHUNK-{i} " + "x" * 55000 for i in range(chunks)]
+    path = directory / f"{name}.txt"
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return str(path)
+
+
+def test_start_episode_returns_stored_chunks(store):
+    assert store.start_episode("ep", "ep.txt", "hash", 3) == {}
+    store.save_chunk("ep", 1, chunk_summary(1))
+
+    assert store.start_episode("ep", "ep.txt", "hash", 3) == {1: chunk_summary(1)}
+
+
+def test_changed_transcript_discards_progress(store):
+    store.start_episode("ep", "ep.txt", "hash", 3)
+    store.save_chunk("ep", 0, chunk_summary(0))
+    store.save_combined("ep", {"summary": "final"})
+
+    assert store.start_episode("ep", "ep.txt", "other", 3) == {}
+    assert store.combined("ep") is None
+
+
+def test_chunks_are_fingerprinted_from_a_generator():
+    chunks = ["first", "second", "third"]
+
+    assert chunks_fingerprint(chunk for chunk in chunks) == (chunks_hash(chunks), 3)
+
+
+def test_interrupted_episode_resumes_at_the_missing_chunk(tmp_path, store, config):
+    path = write_transcript(tmp_path, "dwarkesh_podcast_230327")
+    store.start_episode(
+        "dwarkesh_podcast_230327",
+        path,
+        chunks_hash(split_transcript(open(path).read())),
+        3,
+    )
+    store.save_chunk("dwarkesh_podcast_230327", 0, chunk_summary(0))
+    store.save_chunk("dwarkesh_podcast_230327", 2, chunk_summary(2))
+
+    with patch("process.generate_summary") as generate_summary:
+        generate_summary.side_effect = [
+            json.dumps(chunk_summary(1)),
+            json.dumps({"metadata": {}, "summary": "final"}),
+        ]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            summary = summarize_transcript(
+                Mock(), config, "system", path, executor, checkpoints=store
+            )
+
+    prompts = [call.args[2] for call in generate_summary.call_args_list]
+    assert prompts[0].startswith("CHUNK-1")
+    assert prompts[1] == "COMBINE"
+    assert summary["summary"] == "final"
+    assert store.combined("dwarkesh_podcast_230327") == summary
+
+
+@patch("process.write_summary")
+@patch("process.generate_summary")
+def test_written_episodes_are_marked_and_reused(
+    generate_summary, write_summary, tmp_path, store, config
+):
+    path = write_transcript(tmp_path, "latent_space_240101", chunks=1)
+    generate_summary.side_effect = [
+        json.dumps(chunk_summary(0)),
+        json.dumps({"metadata": {}, "summary": "final"}),
+    ]
+
+    process_transcripts(Mock(), config, "system", [path], checkpoints=store)
+    process_transcripts(Mock(), config, "system", [path], checkpoints=store)
+
+    assert generate_summary.call_count == 2
+    assert write_summary.call_count == 2
+    (row,) = store.status()
+    assert row["written"] and row["chunks_done"] == row["chunks_total"] == 1
+
+
+def test_format_status(store):
+    store.start_episode("dwarkesh_podcast_230327", "a.txt", "hash", 4)
+    store.save_chunk("dwarkesh_podcast_230327", 0, chunk_summary(0))
+    store.start_episode("latent_space_240101", "b.txt", "hash", 2)
+    store.mark_written("latent_space_240101")
+
+    status = format_status(
+        store.status(), ["transcripts/dwarkesh_podcast_230327.txt", "new_episode.txt"]
+    )
+
+    lines = status.splitlines()
+    assert lines[1].split() == ["dwarkesh_podcast_230327", "1/4", "no"]
+    assert lines[2].split() == ["new_episode", "-", "no"]
+    assert lines[-1] == "1 in progress, 1 not started, 1 written."
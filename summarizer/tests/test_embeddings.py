@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+from google.api_core.exceptions import PreconditionFailed
+
+from embeddings import (
+    HashingEmbedder,
+    OpenAIEmbedder,
+    VectorTable,
+    embed_summaries,
+    embedding_text,
+    update_vectors,
+)
+
+
+def make_summary(summary_id, topics, conclusions, podcast="Dwarkesh Podcast"):
+    return {
+        "metadata": {"id": summary_id, "podcast": podcast},
+        "topics": topics,
+        "conclusions": conclusions,
+    }
+
+
+def test_embedding_text_uses_topics_and_conclusions():
+    summary = make_summary("ep1", ["Scaling laws", "Compute"], "More compute.")
+
+    assert embedding_text(summary) == (
+        "Topics: Scaling laws; Compute\nConclusions: More compute."
+    )
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(64)
+
+    vectors = embedder.embed(["scaling laws", "Scaling Laws", "export controls", ""])
+
+    assert vectors.shape == (4, 64)
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(vectors[:3], axis=1), 1, rtol=1e-6)
+    np.testing.assert_array_equal(vectors[0], vectors[1])
+    assert vectors[0] @ vectors[2] < 0.5
+    assert not vectors[3].any()
+
+
+def test_openai_embedder_sends_batches():
+    client = Mock()
+    client.embeddings.create.side_effect = lambda model, input, dimensions: (
+        SimpleNamespace(data=[SimpleNamespace(embedding=[3.0, 4.0]) for _ in input])
+    )
+    embedder = OpenAIEmbedder(client, dimensions=2, batch_size=2)
+
+    vectors = embedder.embed(["a", "b", "c"])
+
+    assert client.embeddings.create.call_count == 2
+    np.testing.assert_allclose(vectors, [[0.6, 0.8]] * 3)
+
+
+def test_vector_table_round_trip_and_upsert():
+    embedder = HashingEmbedder(32)
+    table = embed_summaries(
+        embedder,
+        [
+            make_summary("ep2", ["Compute"], "Chips."),
+            make_summary("ep1", ["Alignment"], "RLHF.", podcast="Latent Space"),
+        ],
+    )
+    replacement = embedder.embed(["Interpretability"])
+    table.upsert(["ep2", "ep3"], ["Dwarkesh Podcast", ""], np.vstack([replacement] * 2))
+
+    loaded = VectorTable.loads(table.dumps())
+
+    assert loaded.model == "hashing-32"
+    assert loaded.ids == ["ep1", "ep2", "ep3"]
+    assert loaded.podcasts == ["Latent Space", "Dwarkesh Podcast", ""]
+    np.testing.assert_allclose(loaded.vectors[1], replacement[0], atol=1e-3)
+
+
+def test_upsert_rejects_other_dimensions():
+    table = VectorTable.empty("hashing-32", 32)
+
+    with pytest.raises(ValueError, match="dimensions"):
+        table.upsert(["ep1"], [""], np.zeros((1, 16), dtype=np.float32))
+
+
+@patch("embeddings.gcs_client")
+def test_update_vectors_retries_on_concurrent_write(gcs_client):
+    embedder = HashingEmbedder(32)
+    existing = embed_summaries(embedder, [make_summary("ep1", ["AGI"], "Soon.")])
+    bucket = Mock()
+    gcs_client.return_value.bucket.return_value = bucket
+    bucket.get_blob.return_value = Mock(generation=3)
+    bucket.get_blob.return_value.download_as_bytes.return_value = existing.dumps()
+    upload = bucket.blob.return_value.upload_from_string
+    upload.side_effect = [PreconditionFailed("changed"), None]
+
+    update_vectors(
+        "bucket", "embeddings.npz", make_summary("ep2", ["Chips"], "Ok."), embedder
+    )
+
+    assert upload.call_count == 2
+    assert upload.call_args.kwargs["if_generation_match"] == 3
+    assert VectorTable.loads(upload.call_args.args[0]).ids == ["ep1", "ep2"]
+
+
+@patch("embeddings.gcs_client")
+def test_update_vectors_replaces_table_of_another_model(gcs_client):
+    existing = embed_summaries(HashingEmbedder(16), [make_summary("ep1", [], "")])
+    bucket = Mock()
+    gcs_client.return_value.bucket.return_value = bucket
+    bucket.get_blob.return_value = Mock(generation=3)
+    bucket.get_blob.return_value.download_as_bytes.return_value = existing.dumps()
+    upload = bucket.blob.return_value.upload_from_string
+
+    update_vectors(
+        "bucket", "embeddings.npz", make_summary("ep2", [], ""), HashingEmbedder(32)
+    )
+
+    table = VectorTable.loads(upload.call_args.args[0])
+    assert (table.model, table.ids) == ("hashing-32", ["ep2"])
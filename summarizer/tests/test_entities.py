@@ -0,0 +1,142 @@
+import json
+from unittest.mock import Mock, patch
+
+from google.api_core.exceptions import PreconditionFailed
+
+from entities import EntityTable, entity_key, update_entities
+
+
+def summary(summary_id, date, topics, participants, terms=()):
+    return {
+        "metadata": {
+            "id": summary_id,
+            "title": summary_id,
+            "date": date,
+            "participants": participants,
+        },
+        "topics": topics,
+        "terms": {term: "A definition." for term in terms},
+    }
+
+
+def test_entity_key_ignores_case_accents_punctuation_and_titles():
+    assert entity_key("Scaling Laws") == entity_key("  scaling-laws. ")
+    assert entity_key("Gödel's theorem") == "godel-s-theorem"
+    assert entity_key("Dr. Kurt Gödel", "person") == "kurt-godel"
+    assert entity_key("Dr. Kurt Gödel") == "dr-kurt-godel"
+    assert entity_key("Dr.", "person") == "dr"
+
+
+def test_spellings_are_merged_and_episodes_sorted_newest_first():
+    table = EntityTable()
+    table.add("ep1", summary("ep1", "27-03-2023", ["Scaling Laws"], ["Dr. Jane Doe"]))
+    table.add("ep2", summary("ep2", "01-01-2024", ["scaling laws"], ["Jane Doe"]))
+    table.add(
+        "ep3",
+        summary("ep3", "15-06-2023", ["Scaling laws", "RLHF"], ["Jane Doe"], ["RLHF"]),
+    )
+
+    index = table.index()
+
+    scaling = index["topic"]["scaling-laws"]
+    assert scaling["name"] == "Scaling Laws"
+    assert sorted(scaling["aliases"]) == ["Scaling laws", "scaling laws"]
+    assert scaling["count"] == 3
+    assert scaling["episodes"] == ["ep2", "ep3", "ep1"]
+    assert index["person"]["jane-doe"] == {
+        "name": "Jane Doe",
+        "aliases": ["Dr. Jane Doe"],
+        "count": 3,
+        "episodes": ["ep2", "ep3", "ep1"],
+    }
+    assert index["term"]["rlhf"]["episodes"] == ["ep3"]
+
+
+def test_replacing_and_removing_a_summary_updates_the_index():
+    table = EntityTable()
+    table.add("ep1", summary("ep1", "27-03-2023", ["AGI"], ["Jane Doe"]))
+    table.add("ep2", summary("ep2", "28-03-2023", ["AGI", "Alignment"], ["Jane Doe"]))
+
+    table.add("ep2", summary("ep2", "28-03-2023", ["Alignment"], ["John Roe"]))
+    assert table.index()["topic"]["agi"]["episodes"] == ["ep1"]
+    assert table.index()["person"]["john-roe"]["episodes"] == ["ep2"]
+
+    table.remove("ep1")
+    index = table.index()
+    assert "agi" not in index["topic"]
+    assert "jane-doe" not in index["person"]
+
+
+def test_table_round_trips_through_json():
+    table = EntityTable()
+    table.add("ep1", summary("ep1", "27-03-2023", ["Café culture"], ["Zoë"]))
+
+    text = table.dumps()
+
+    assert EntityTable.loads(text).index() == table.index()
+    assert json.loads(text)["entities"]["person"]["zoe"]["name"] == "Zoë"
+
+
+@patch("entities.gcs_client")
+def test_update_entities_adds_to_the_stored_index_and_retries(gcs_client):
+    stored = EntityTable()
+    stored.add("ep1", summary("ep1", "27-03-2023", ["AGI"], ["Jane Doe"]))
+    bucket = Mock()
+    gcs_client.return_value.bucket.return_value = bucket
+    bucket.get_blob.return_value = Mock(generation=3)
+    bucket.get_blob.return_value.download_as_text.return_value = stored.dumps()
+    upload = bucket.blob.return_value.upload_from_string
+    upload.side_effect = [PreconditionFailed("changed"), None]
+
+    update_entities(
+        "bucket", "entities.json", summary("ep2", "28-03-2023", ["agi"], ["Jane Doe"])
+    )
+
+    assert upload.call_count == 2
+    assert upload.call_args.kwargs["if_generation_match"] == 3
+    written = json.loads(upload.call_args.args[0])
+    assert written["entities"]["topic"]["agi"]["episodes"] == ["ep2", "ep1"]
+
+
+def test_incremental_updates_match_a_full_rebuild():
+    table = EntityTable()
+    table.add("ep1", summary("ep1", "27-03-2023", ["AGI", "RLHF"], ["Dr. Jane Doe"]))
+    table.add("ep2", summary("ep2", "28-03-2023", ["agi"], ["Jane Doe"], ["RLHF"]))
+    table = EntityTable.loads(table.dumps())
+
+    table.add("ep3", summary("ep3", "01-01-2023", ["Agi"], ["Jane Doe"]))
+    table.add("ep1", summary("ep1", "29-03-2023", ["AGI"], ["John Roe"]))
+    table.remove("ep2")
+
+    assert table.index() == EntityTable(table.episodes).index()
+
+
+@patch("entities.gcs_client")
+def test_update_entities_only_recomputes_the_changed_episode(gcs_client):
+    stored = EntityTable()
+    stored.add("ep1", summary("ep1", "27-03-2023", ["AGI"], ["Jane Doe"]))
+    stored_json = json.loads(stored.dumps())
+    # Left alone unless the whole index is rebuilt
+    stored_json["entities"]["topic"]["agi"]["name"] = "Artificial general intelligence"
+    bucket = Mock()
+    gcs_client.return_value.bucket.return_value = bucket
+    bucket.get_blob.return_value = Mock(generation=3)
+    bucket.get_blob.return_value.download_as_text.return_value = json.dumps(stored_json)
+    upload = bucket.blob.return_value.upload_from_string
+
+    update_entities(
+        "bucket", "entities.json", summary("ep2", "28-03-2023", ["RLHF"], ["Jane Doe"])
+    )
+
+    written = json.loads(upload.call_args.args[0])
+    assert written["entities"]["topic"]["agi"]["name"] == (
+        "Artificial general intelligence"
+    )
+    assert written["entities"]["topic"]["rlhf"]["episodes"] == ["ep2"]
+    assert written["entities"]["person"]["jane-doe"]["episodes"] == ["ep2", "ep1"]
+
+    upload.reset_mock()
+    update_entities(
+        "bucket", "entities.json", summary("ep1", "27-03-2023", ["AGI"], ["Jane Doe"])
+    )
+    upload.assert_not_called()
@@ -0,0 +1,228 @@
+import csv
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from instrumentation import (
+    RunRecorder,
+    for_episode,
+    format_report,
+    percentile,
+    timed,
+)
+from process import process_transcripts
+from utils import generate_summary
+
+PRICES = {"small": {"prompt": 1.0, "completion": 2.0}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class UsageClient:
+    """OpenAI client stand-in whose responses report token usage."""
+
+    def __init__(self, prompt_tokens=100, completion_tokens=10):
+        self.usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        content = {
+            "metadata": {},
+            "summary": prompt[:20],
+            "topics": [],
+            "quotes": [],
+            "terms": {},
+            "recommendations": [],
+            "conclusions": "",
+        }
+        return SimpleNamespace(
+            choices=[
+                SimpleNamespace(message=SimpleNamespace(content=json.dumps(content)))
+            ],
+            usage=self.usage,
+        )
+
+
+@pytest.fixture
+def config():
+    return {
+        "prompts": {"user_chunk": "{content}", "user_combined": "COMBINE {content}"},
+        "models": {"chunk": "small", "combined": "large"},
+        "paths": {
+            "bucket_name": "bucket",
+            "summaries": "summaries/",
+            "manifest": "manifest.jsonl",
+            "entities": "entities.json",
+        },
+    }
+
+
+def test_percentile_interpolates_between_values():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([4.0, 1.0, 3.0, 2.0], 50) == 2.5
+    assert percentile(list(range(101)), 95) == 95
+
+
+def test_report_aggregates_stages_models_and_episodes():
+    clock = Clock()
+    recorder = RunRecorder(PRICES, clock=clock)
+    with recorder.activate():
+        with for_episode("ep1"):
+            recorder.record("split", 0.5)
+            for seconds in [1.0, 2.0, 3.0]:
+                recorder.record(
+                    "llm",
+                    seconds,
+                    model="small",
+                    prompt_tokens=1000,
+                    completion_tokens=100,
+                    cached=False,
+                )
+            recorder.record("llm", 0.001, model="small", cached=True)
+        with for_episode("ep2"):
+            recorder.record(
+                "llm", 4.0, model="large", prompt_tokens=10, completion_tokens=5
+            )
+        clock.now += 120
+
+    report = recorder.report()
+
+    assert report["run"]["episodes"] == 2
+    assert report["run"]["episodes_per_minute"] == 1.0
+    assert report["run"]["tokens"] == 3 * 1100 + 15
+    assert report["stages"]["split"]["count"] == 1
+    assert report["stages"]["llm"]["count"] == 5
+
+    small = report["models"]["small"]
+    assert small["calls"] == 4
+    assert small["cached"] == 1
+    assert small["p50_seconds"] == 2.0
+    assert small["p95_seconds"] == pytest.approx(2.9)
+    assert small["cost"] == pytest.approx(3 * (1000 * 1.0 + 100 * 2.0) / 1e6)
+    # A model without a price has no cost estimate
+    assert report["models"]["large"]["cost"] is None
+    assert report["run"]["cost"] == small["cost"]
+
+    assert report["episodes"]["ep1"]["llm_calls"] == 4
+    assert report["episodes"]["ep1"]["cost"] == small["cost"]
+    assert report["episodes"]["ep2"]["prompt_tokens"] == 10
+
+
+def test_nothing_is_recorded_without_an_active_recorder():
+    recorder = RunRecorder()
+    with timed("split"):
+        pass
+    with recorder.activate():
+        with timed("split"):
+            pass
+    with timed("split"):
+        pass
+
+    assert [event["stage"] for event in recorder.events] == ["split"]
+
+
+def test_generate_summary_records_latency_and_usage():
+    recorder = RunRecorder(PRICES)
+    with recorder.activate(), for_episode("ep1"):
+        generate_summary(UsageClient(), "system", "user", "small")
+
+    (event,) = recorder.events
+    assert event["stage"] == "llm"
+    assert event["episode"] == "ep1"
+    assert event["model"] == "small"
+    assert event["prompt_tokens"] == 100
+    assert event["completion_tokens"] == 10
+    assert event["cached"] is False
+    assert event["seconds"] >= 0
+
+
+@patch("process.update_entities")
+@patch("process.update_manifest")
+@patch("process.write_json_to_gcs")
+def test_run_attributes_every_stage_to_its_episode(
+    write_json_to_gcs, update_manifest, update_entities, tmp_path, config
+):
+    write_json_to_gcs.return_value = SimpleNamespace(generation=1, size=1)
+    paths = []
+    for name in ["podcast_1", "podcast_2"]:
+        path = tmp_path / f"{name}.txt"
+        path.write_text("\n\n".join(["x" * 55000] * 3), encoding="utf-8")
+        paths.append(str(path))
+
+    recorder = RunRecorder(PRICES)
+    with recorder.activate():
+        process_transcripts(UsageClient(), config, "system", paths, workers=4)
+
+    stages = {}
+    for event in recorder.events:
+        stages.setdefault(event["episode"], []).append(event["stage"])
+    assert set(stages) == {"podcast_1", "podcast_2"}
+    for episode_stages in stages.values():
+        assert sorted(episode_stages) == sorted(
+            [
+                "split",
+                "llm",
+                "llm",
+                "llm",
+                "combine",
+                "llm",
+                "write",
+                "manifest",
+                "entities",
+            ]
+        )
+
+    report = recorder.report()
+    assert report["models"]["small"]["calls"] == 6
+    assert report["models"]["large"]["calls"] == 2
+    assert report["episodes"]["podcast_1"]["llm_calls"] == 4
+
+
+def test_write_json_and_csv_reports(tmp_path):
+    recorder = RunRecorder(PRICES)
+    with recorder.activate(), for_episode("ep1"):
+        recorder.record(
+            "llm", 1.5, model="small", prompt_tokens=10, completion_tokens=2
+        )
+        recorder.record("write", 0.2)
+
+    recorder.write(str(tmp_path / "reports" / "run.json"))
+    recorder.write(str(tmp_path / "reports" / "run.csv"))
+
+    with open(tmp_path / "reports" / "run.json", encoding="utf-8") as file:
+        report = json.load(file)
+    assert report["models"]["small"]["prompt_tokens"] == 10
+    assert [event["stage"] for event in report["events"]] == ["llm", "write"]
+    with open(tmp_path / "reports" / "run.csv", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    assert [(row["stage"], row["episode"]) for row in rows] == [
+        ("llm", "ep1"),
+        ("write", "ep1"),
+    ]
+    assert rows[0]["prompt_tokens"] == "10"
+
+
+def test_format_report_lists_models_and_episodes():
+    recorder = RunRecorder(PRICES)
+    with recorder.activate(), for_episode("dwarkesh_podcast_230327"):
+        recorder.record(
+            "llm", 1.5, model="small", prompt_tokens=10, completion_tokens=2
+        )
+
+    table = format_report(recorder.report())
+
+    assert "1 episodes" in table
+    assert "small" in table
+    assert "dwarkesh_podcast_230327" in table
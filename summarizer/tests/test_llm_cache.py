@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from llm_cache import ResponseCache, cache_key
+from utils import generate_summary
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache" / "responses.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def completion(content, finish_reason="stop"):
+    choice = SimpleNamespace(
+        message=SimpleNamespace(content=content), finish_reason=finish_reason
+    )
+    return SimpleNamespace(choices=[choice])
+
+
+@pytest.mark.parametrize(
+    "changed",
+    [
+        ("other-model", "system", "user", 0.5, 1000),
+        ("model", "other system", "user", 0.5, 1000),
+        ("model", "system", "other user", 0.5, 1000),
+        ("model", "system", "user", 0.7, 1000),
+        ("model", "system", "user", 0.5, 2000),
+    ],
+)
+def test_cache_key_changes_with_every_input(changed):
+    assert cache_key("model", "system", "user", 0.5, 1000) == cache_key(
+        "model", "system", "user", 0.5, 1000
+    )
+    assert cache_key(*changed) != cache_key("model", "system", "user", 0.5, 1000)
+
+
+def test_responses_persist_across_instances(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = ResponseCache(path)
+    cache.put("key", "model", '{"summary": "cached"}')
+    cache.close()
+
+    cache = ResponseCache(path)
+    assert cache.get("key") == '{"summary": "cached"}'
+    assert cache.get("other") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "bytes": 21}
+    cache.close()
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_bytes=25)
+    cache.put("first", "model", "x" * 10)
+    cache.put("second", "model", "x" * 10)
+    cache.get("first")
+
+    cache.put("third", "model", "x" * 10)
+
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None
+    cache.close()
+
+
+def test_purge_removes_every_response(cache):
+    cache.put("key", "model", "content")
+
+    cache.purge()
+
+    assert cache.stats()["entries"] == 0
+
+
+def test_discard_removes_one_response(cache):
+    cache.put("a", "model", "first")
+    cache.put("b", "model", "second")
+
+    cache.discard("a")
+    cache.discard("missing")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "second"
+
+
+def test_generate_summary_only_calls_the_api_on_a_miss(cache):
+    client = Mock()
+    client.chat.completions.create.return_value = completion('{"summary": "A"}')
+
+    first = generate_summary(client, "system", "user", "model", cache)
+    second = generate_summary(client, "system", "user", "model", cache)
+    generate_summary(client, "system", "changed", "model", cache)
+
+    assert first == second == '{"summary": "A"}'
+    assert client.chat.completions.create.call_count == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_truncated_responses_are_not_cached(cache):
+    client = Mock()
+    client.chat.completions.create.return_value = completion('{"summ', "length")
+
+    generate_summary(client, "system", "user", "model", cache)
+    generate_summary(client, "system", "user", "model", cache)
+
+    assert client.chat.completions.create.call_count == 2
@@ -0,0 +1,80 @@
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+from google.api_core.exceptions import PreconditionFailed
+
+from manifest import manifest_row, merge_manifest, parse_manifest, update_manifest
+
+
+@pytest.fixture
+def summary():
+    return {
+        "metadata": {
+            "title": "Episode 1",
+            "date": "27-03-2023",
+            "participants": ["Dwarkesh Patel"],
+            "id": "dwarkesh_podcast_230327",
+            "podcast": "Dwarkesh Podcast",
+        },
+        "summary": "A summary.",
+        "topics": ["AGI"],
+        "quotes": [{"quote": "A quote.", "speaker": "Dwarkesh Patel"}],
+        "terms": {"AGI": "Artificial General Intelligence"},
+        "recommendations": ["Read more."],
+        "conclusions": "A conclusion.",
+    }
+
+
+def test_manifest_row_keeps_listing_fields_only(summary):
+    row = manifest_row(summary, 7, 512)
+
+    assert set(row) == {
+        "metadata",
+        "topics",
+        "conclusions",
+        "search",
+        "generation",
+        "size",
+    }
+    assert row["metadata"]["id"] == "dwarkesh_podcast_230327"
+    assert row["search"] == {"quotes": ["A quote."], "terms": ["AGI"]}
+    assert row["generation"] == 7
+
+
+@pytest.mark.parametrize(
+    "existing_ids, expected_ids",
+    [
+        ([], ["dwarkesh_podcast_230327"]),
+        (["latent_space_240101"], ["dwarkesh_podcast_230327", "latent_space_240101"]),
+        (["dwarkesh_podcast_230327"], ["dwarkesh_podcast_230327"]),
+    ],
+)
+def test_merge_manifest(summary, existing_ids, expected_ids):
+    text = "".join(
+        json.dumps({"metadata": {"id": summary_id}, "generation": 1}) + "\n"
+        for summary_id in existing_ids
+    )
+
+    rows = parse_manifest(merge_manifest(text, manifest_row(summary, 2, 10)))
+
+    assert [row["metadata"]["id"] for row in rows] == expected_ids
+    assert rows[expected_ids.index("dwarkesh_podcast_230327")]["generation"] == 2
+
+
+@patch("manifest.gcs_client")
+def test_update_manifest_retries_on_concurrent_write(gcs_client, summary):
+    # Arrange
+    bucket = Mock()
+    gcs_client.return_value.bucket.return_value = bucket
+    bucket.get_blob.return_value = Mock(generation=3)
+    bucket.get_blob.return_value.download_as_text.return_value = ""
+    upload = bucket.blob.return_value.upload_from_string
+    upload.side_effect = [PreconditionFailed("changed"), None]
+
+    # Act
+    update_manifest("bucket", "manifest.jsonl", summary, 1, 10)
+
+    # Assert
+    assert upload.call_count == 2
+    assert upload.call_args.kwargs["if_generation_match"] == 3
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from pack import HEADER, dumps_pack, loads_pack
+
+
+def summary(summary_id):
+    return {
+        "metadata": {"id": summary_id, "title": "Épisode", "date": "27-03-2023"},
+        "summary": "A summary. " * 20,
+        "topics": ["AGI"],
+        "quotes": [{"quote": "A quote.", "speaker": "Dwarkesh Patel"}],
+        "terms": {"AGI": "Artificial General Intelligence"},
+        "recommendations": ["Read more."],
+        "conclusions": "A conclusion.",
+    }
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_pack_round_trip(compress):
+    documents = {
+        summary_id: (index, summary(summary_id))
+        for index, summary_id in enumerate(["latent_space_2", "dwarkesh_1", "café_3"])
+    }
+
+    data = dumps_pack(documents, compress)
+
+    assert loads_pack(data) == documents
+    assert data[: HEADER.size].startswith(b"SUMPACK1")
+
+
+def test_compressed_pack_is_smaller_than_indented_json():
+    documents = {f"episode_{i}": (i, summary(f"episode_{i}")) for i in range(50)}
+    indented = sum(len(json.dumps(doc, indent=4)) for _, doc in documents.values())
+
+    assert len(dumps_pack(documents)) < indented / 2
+
+
+def test_empty_pack_and_foreign_files():
+    assert loads_pack(dumps_pack({})) == {}
+    with pytest.raises(ValueError, match="Not a summary pack"):
+        loads_pack(b"\0" * HEADER.size)
@@ -0,0 +1,262 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import process
+from process import combine_in_tree, process_transcripts, summarize_transcript
+
+
+class StubClient:
+    """OpenAI client stand-in that answers after a simulated latency.
+
+    Each chunk prompt is answered with a summary that names the chunk it came
+    from; the latency shrinks with the chunk number so that later chunks
+    finish first.
+    """
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        with self._lock:
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if prompt.startswith("COMBINE"):
+                time.sleep(self.latency)
+                content = json.dumps({"metadata": {}, "summary": prompt})
+            else:
+                chunk = prompt.split("CHUNK-")[1][0]
+                time.sleep(self.latency / (int(chunk) + 1))
+                content = json.dumps(chunk_summary(chunk))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+
+def chunk_summary(chunk):
+    return {
+        "metadata": {},
+        "summary": f"summary {chunk}",
+        "topics": [],
+        "quotes": [],
+        "terms": {},
+        "recommendations": [],
+        "conclusions": f"conclusion {chunk}",
+    }
+
+
+@pytest.fixture
+def config():
+    return {
+        "prompts": {"user_chunk": "{content}", "user_combined": "COMBINE {content}"},
+        "models": {"chunk": "chunk-model", "combined": "combined-model"},
+        "paths": {"bucket_name": "bucket", "summaries": "summaries/"},
+    }
+
+
+def write_transcript(directory, name, chunks=4):
+    # Paragraphs just under the splitter's 56000 characters give one chunk each
+    paragraphs = [f"CHUNK-{i} " + "x" * 55000 for i in range(chunks)]
+    path = directory / f"{name}.txt"
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return str(path)
+
+
+def test_chunk_summaries_are_combined_in_chunk_order(tmp_path, config):
+    client = StubClient()
+    path = write_transcript(tmp_path, "dwarkesh_podcast_230327")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        summary = summarize_transcript(client, config, "system", path, executor)
+
+    combined = json.loads(summary["summary"][len("COMBINE ") :])
+    assert combined["summary"] == ["summary 0", "summary 1", "summary 2", "summary 3"]
+    assert summary["metadata"]["id"] == "dwarkesh_podcast_230327"
+
+
+def test_chunks_are_read_as_their_summaries_complete(tmp_path, config):
+    client = StubClient(latency=0.02)
+    path = write_transcript(tmp_path, "dwarkesh_podcast_230327", chunks=8)
+    split = process.split_transcript_stream
+    unfinished = []
+
+    def spy(stream):
+        for index, chunk in enumerate(split(stream)):
+            with client._lock:
+                unfinished.append(index - (len(client.prompts) - client.in_flight))
+            yield chunk
+
+    with patch("process.split_transcript_stream", spy):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            summary = summarize_transcript(
+                client, config, "system", path, executor, chunks_ahead=2
+            )
+
+    combined = json.loads(summary["summary"][len("COMBINE ") :])
+    assert combined["summary"] == [f"summary {i}" for i in range(8)]
+    assert len(unfinished) == 8
+    assert max(unfinished) <= 2
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+@patch("process.write_summary")
+def test_process_transcripts_bounds_requests_in_flight(
+    write_summary, tmp_path, config, workers
+):
+    client = StubClient(latency=0.02)
+    paths = [write_transcript(tmp_path, f"podcast_{i}") for i in range(3)]
+
+    process_transcripts(client, config, "system", paths, workers=workers)
+
+    assert client.max_in_flight == workers
+    assert len(client.prompts) == 3 * 5
+    assert sorted(call.args[1] for call in write_summary.call_args_list) == paths
+
+
+@patch("process.write_summary")
+def test_failed_episodes_are_reported_separately(
+    write_summary, tmp_path, config, capsys
+):
+    paths = [write_transcript(tmp_path, f"podcast_{i}", chunks=2) for i in range(2)]
+    broken = tmp_path / "podcast_broken.txt"
+    # The stub client cannot answer a chunk without a CHUNK- marker
+    broken.write_text("no marker", encoding="utf-8")
+
+    failed = process_transcripts(
+        StubClient(latency=0.01), config, "system", [*paths, str(broken)], workers=2
+    )
+
+    output = capsys.readouterr().out
+    assert failed == [str(broken)]
+    assert sorted(call.args[1] for call in write_summary.call_args_list) == paths
+    assert f"Failed to process {broken}" in output
+    assert f"Processed {broken}" not in output
+    assert all(f"Processed {path}." in output for path in paths)
+
+
+@patch("process.write_summary")
+def test_concurrent_run_is_faster_than_sequential(write_summary, tmp_path, config):
+    paths = [write_transcript(tmp_path, f"podcast_{i}", chunks=2) for i in range(4)]
+
+    start = time.perf_counter()
+    process_transcripts(StubClient(), config, "system", paths, workers=1)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    process_transcripts(StubClient(), config, "system", paths, workers=8)
+    concurrent = time.perf_counter() - start
+
+    assert concurrent < sequential / 2
+
+
+class MergeStub:
+    """generate_summary stand-in that records how summaries were merged"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, client, system_prompt, user_prompt, model, cache=None):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        combined = json.loads(user_prompt)
+        with self._lock:
+            self.in_flight -= 1
+        merged = chunk_summary("")
+        merged["summary"] = "(" + "+".join(combined["summary"]) + ")"
+        merged["topics"] = combined["topics"]
+        merged["terms"] = combined["terms"]
+        return json.dumps(merged)
+
+
+def numbered_summaries(count):
+    summaries = []
+    for i in range(count):
+        summary = chunk_summary(i)
+        summary["summary"] = str(i)
+        summary["topics"] = ["AGI", f"topic {i}"]
+        summary["terms"] = {" agi ": "definition", f"term {i}": "definition"}
+        summaries.append(summary)
+    return summaries
+
+
+@pytest.fixture
+def tree_config(config):
+    config["prompts"]["user_merge"] = "{content}"
+    config["combining"] = {"mode": "tree", "fan_out": 4}
+    return config
+
+
+def test_tree_combine_merges_consecutive_groups_level_by_level(tree_config):
+    stub = MergeStub()
+
+    with patch("process.generate_summary", stub):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            level = combine_in_tree(
+                None, tree_config, "system", numbered_summaries(20), executor
+            )
+
+    assert [summary["summary"] for summary in level] == [
+        "((0+1+2+3)+(4+5+6+7)+(8+9+10+11)+(12+13+14+15))",
+        "(16+17+18+19)",
+    ]
+    assert stub.calls == 6
+    assert level[0]["topics"][:2] == ["AGI", "topic 0"]
+    assert [topic.lower() for topic in level[0]["topics"]].count("agi") == 1
+    assert list(level[0]["terms"])[:2] == [" agi ", "term 0"]
+
+
+@pytest.mark.parametrize("fan_out", [1, 0, -2, 2.5])
+def test_tree_combine_rejects_a_fan_out_below_two(tree_config, fan_out):
+    tree_config["combining"]["fan_out"] = fan_out
+
+    with pytest.raises(ValueError, match="fan_out has to be at least 2"):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            combine_in_tree(
+                None, tree_config, "system", numbered_summaries(5), executor
+            )
+
+
+def test_tree_combine_runs_merges_of_a_level_in_parallel(tree_config):
+    stub = MergeStub(latency=0.02)
+
+    with patch("process.generate_summary", stub):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            combine_in_tree(
+                None, tree_config, "system", numbered_summaries(16), executor
+            )
+
+    assert stub.max_in_flight == 4
+
+
+def test_tree_combine_keeps_few_summaries_unmerged(tree_config):
+    summaries = numbered_summaries(3)
+
+    with patch("process.generate_summary") as generate_summary:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            level = combine_in_tree(None, tree_config, "system", summaries, executor)
+
+    assert level == summaries
+    generate_summary.assert_not_called()
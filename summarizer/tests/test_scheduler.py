@@ -0,0 +1,137 @@
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import httpx
+import pytest
+from openai import BadRequestError, RateLimitError
+
+from scheduler import RateLimitedClient, RateLimiter, estimate_tokens
+
+
+class FakeClock:
+    """Clock whose sleep advances time instantly"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def api_error(error_class, status, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers, request=request)
+    return error_class("error", response=response, body=None)
+
+
+def completion(prompt_tokens=100, completion_tokens=50):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="{}"))],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ),
+    )
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_estimate_tokens_includes_completion_budget():
+    messages = [{"role": "user", "content": "x" * 400}]
+
+    assert estimate_tokens(messages) == 104
+    assert estimate_tokens(messages, max_tokens=1000) == 1104
+
+
+def test_requests_per_minute_budget(clock):
+    limiter = RateLimiter(2, 10_000, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire(10)
+    clock.now = 5.0
+    limiter.acquire(10)
+    limiter.acquire(10)
+
+    assert clock.sleeps == [55.0]
+
+
+def test_tokens_per_minute_budget_and_settle(clock):
+    limiter = RateLimiter(100, 1000, clock=clock, sleep=clock.sleep)
+
+    first = limiter.acquire(600)
+    limiter.settle(first, 300)
+    limiter.acquire(600)
+    assert clock.sleeps == []
+
+    limiter.acquire(600)
+    assert clock.sleeps == [60.0]
+
+
+def test_oversized_request_waits_for_an_empty_window(clock):
+    limiter = RateLimiter(100, 1000, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire(10)
+    reservation = limiter.acquire(5000)
+
+    assert clock.sleeps == [60.0]
+    assert reservation[1] == 1000
+
+
+def test_throttled_requests_are_retried_with_backoff(clock):
+    openai_client = Mock()
+    openai_client.chat.completions.create.side_effect = [
+        api_error(RateLimitError, 429, {"retry-after": "20"}),
+        api_error(RateLimitError, 429),
+        completion(),
+    ]
+    client = RateLimitedClient(
+        openai_client,
+        {"model": {"requests_per_minute": 100, "tokens_per_minute": 100_000}},
+        base_delay=1.0,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+    response = client.chat.completions.create(
+        model="model", messages=[{"role": "user", "content": "hi"}], max_tokens=10
+    )
+
+    assert response.usage.total_tokens == 150
+    assert clock.sleeps[0] == 20.0
+    assert 0 <= clock.sleeps[1] <= 2.0
+    report = client.report()["model"]
+    assert report["requests"] == 1
+    assert report["retries"] == 2
+    assert report["prompt_tokens"] == 100
+
+
+def test_retries_give_up_after_max_attempts(clock):
+    openai_client = Mock()
+    openai_client.chat.completions.create.side_effect = api_error(RateLimitError, 429)
+    client = RateLimitedClient(
+        openai_client, {}, max_attempts=3, clock=clock, sleep=clock.sleep
+    )
+
+    with pytest.raises(RateLimitError):
+        client.chat.completions.create(model="model", messages=[])
+
+    assert openai_client.chat.completions.create.call_count == 3
+
+
+def test_client_errors_are_not_retried(clock):
+    openai_client = Mock()
+    openai_client.chat.completions.create.side_effect = api_error(BadRequestError, 400)
+    client = RateLimitedClient(openai_client, {}, clock=clock, sleep=clock.sleep)
+
+    with pytest.raises(BadRequestError):
+        client.chat.completions.create(model="model", messages=[])
+
+    assert openai_client.chat.completions.create.call_count == 1
@@ -0,0 +1,294 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from instrumentation import RunRecorder, format_report
+from llm_cache import ResponseCache, cache_key
+from process import request_summary
+from scheduler import RateLimitedClient
+from structured import (
+    PartialJSON,
+    SchemaValidator,
+    generate_valid_summary,
+    schema_validator,
+)
+from utils import load_yaml
+
+REPAIR_PROMPT = "{content}\nMISSING: {fields}"
+SCHEMA = load_yaml(
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.yml")
+)["schema"]
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return SchemaValidator(SCHEMA)
+
+
+def summary():
+    return {
+        "metadata": {
+            "title": "Building AGI",
+            "date": "27-03-2023",
+            "participants": ["Ilya Sutskever", "Dwarkesh Patel"],
+        },
+        "summary": 'A talk about "alignment", scaling {and} [spies].',
+        "topics": ["Time to AGI", "Alignment"],
+        "quotes": [{"quote": "It's hard, I try.", "speaker": "Ilya Sutskever"}],
+        "terms": {"AGI": "Artificial General Intelligence."},
+        "recommendations": ["Do alignment research."],
+        "conclusions": "AGI needs alignment.",
+    }
+
+
+def stream_chunk(content=None, finish_reason=None, usage=None):
+    choices = []
+    if content is not None or finish_reason is not None:
+        delta = SimpleNamespace(content=content)
+        choices = [SimpleNamespace(delta=delta, finish_reason=finish_reason)]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class StreamingClient:
+    """OpenAI client stand-in that streams scripted responses in small deltas.
+
+    Each response is a text and a finish reason; the usage counts one token
+    per four characters.
+    """
+
+    def __init__(self, responses, stream=True):
+        self.responses = list(responses)
+        self.stream = stream
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, **kwargs):
+        assert stream == self.stream
+        self.requests.append(messages[-1]["content"])
+        text, finish_reason = self.responses.pop(0)
+        usage = SimpleNamespace(
+            prompt_tokens=len(messages[-1]["content"]) // 4,
+            completion_tokens=len(text) // 4,
+            total_tokens=len(messages[-1]["content"]) // 4 + len(text) // 4,
+        )
+        if not stream:
+            choice = SimpleNamespace(
+                message=SimpleNamespace(content=text), finish_reason=finish_reason
+            )
+            return SimpleNamespace(choices=[choice], usage=usage)
+        chunks = [stream_chunk(text[i : i + 7]) for i in range(0, len(text), 7)]
+        return chunks + [
+            stream_chunk(finish_reason=finish_reason),
+            stream_chunk(usage=usage),
+        ]
+
+
+def test_partial_json_reports_members_as_they_complete():
+    text = json.dumps(summary(), indent=2)
+    parser = PartialJSON()
+
+    completed = []
+    for char in text:
+        completed += parser.feed(char)
+
+    assert completed == list(summary())
+    assert parser.fields == summary()
+    assert parser.closed
+
+
+def test_partial_json_keeps_complete_members_of_truncated_output():
+    text = "```json\n" + json.dumps(summary())
+    truncated = text[: text.index('"quotes"') + 30]
+    parser = PartialJSON()
+
+    parser.feed(truncated)
+
+    assert list(parser.fields) == ["metadata", "summary", "topics"]
+    assert parser.fields["summary"] == summary()["summary"]
+    assert not parser.closed
+
+
+def test_validator_names_missing_and_invalid_fields(validator):
+    document = summary()
+    del document["terms"]
+    document["topics"] = "Alignment"
+    document["quotes"] = [{"quote": "No speaker"}]
+
+    assert validator.invalid_fields(document) == ["topics", "quotes", "terms"]
+    assert validator.invalid_fields(summary()) == []
+    assert validator.invalid_fields([]) == validator.required
+
+
+def test_schema_validator_is_compiled_once():
+    assert schema_validator(SCHEMA) is schema_validator(json.loads(json.dumps(SCHEMA)))
+
+
+def test_valid_stream_is_returned_without_repairs(validator):
+    client = StreamingClient([(json.dumps(summary()), "stop")])
+
+    result = generate_valid_summary(
+        client, "system", "CHUNK", "model", validator, REPAIR_PROMPT
+    )
+
+    assert result == summary()
+    assert client.requests == ["CHUNK"]
+
+
+def test_truncated_stream_only_requests_missing_fields(validator):
+    text = json.dumps(summary())
+    truncated = text[: text.index('"terms"') + 12]
+    rest = {key: summary()[key] for key in ["terms", "recommendations", "conclusions"]}
+    client = StreamingClient([(truncated, "length"), (json.dumps(rest), "stop")])
+    recorder = RunRecorder()
+
+    with recorder.activate():
+        result = generate_valid_summary(
+            client, "system", "CHUNK", "model", validator, REPAIR_PROMPT
+        )
+
+    assert result == summary()
+    assert list(result) == list(summary())
+    assert client.requests[1] == "CHUNK\nMISSING: terms, recommendations, conclusions"
+
+    (repair,) = [event for event in recorder.events if event["stage"] == "repair"]
+    assert repair["saved_tokens"] == len(truncated) // 4
+    assert repair["saved_seconds"] >= 0
+    report = recorder.report()
+    assert report["repairs"]["count"] == 1
+    assert report["repairs"]["saved_tokens"] == len(truncated) // 4
+    assert "1 summaries repaired" in format_report(report)
+
+
+def test_invalid_fields_are_replaced(validator):
+    document = summary()
+    document["quotes"] = ["A quote without a speaker"]
+    client = StreamingClient(
+        [
+            (json.dumps(document), "stop"),
+            (json.dumps({"quotes": summary()["quotes"], "summary": "ignored"}), "stop"),
+        ],
+        stream=False,
+    )
+
+    result = generate_valid_summary(
+        client, "system", "CHUNK", "model", validator, REPAIR_PROMPT, stream=False
+    )
+
+    assert result == summary()
+    assert client.requests[1].endswith("MISSING: quotes")
+
+
+def test_gives_up_after_max_repairs(validator):
+    client = StreamingClient([("{", "length"), ("{", "length")])
+
+    with pytest.raises(RuntimeError, match="after 1 repairs"):
+        generate_valid_summary(
+            client,
+            "system",
+            "CHUNK",
+            "model",
+            validator,
+            REPAIR_PROMPT,
+            max_repairs=1,
+        )
+
+
+def test_only_valid_summaries_are_cached(validator, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    text = json.dumps(summary())
+    truncated = text[: text.index('"conclusions"')]
+    client = StreamingClient(
+        [(truncated, "length"), (json.dumps({"conclusions": "Done."}), "stop")]
+    )
+
+    first = generate_valid_summary(
+        client, "system", "CHUNK", "model", validator, REPAIR_PROMPT, cache
+    )
+    second = generate_valid_summary(
+        client, "system", "CHUNK", "model", validator, REPAIR_PROMPT, cache
+    )
+
+    assert first == second
+    assert first["conclusions"] == "Done."
+    assert len(client.requests) == 2
+    cache.close()
+
+
+def test_invalid_cached_summaries_are_repaired_and_replaced(validator, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    key = cache_key("model", "system", "CHUNK", 0.5, 1000)
+    cached = summary()
+    cached["conclusions"] = ["Not a string."]
+    cache.put(key, "model", json.dumps(cached))
+    client = StreamingClient([(json.dumps({"conclusions": "Done."}), "stop")])
+
+    document = generate_valid_summary(
+        client, "system", "CHUNK", "model", validator, REPAIR_PROMPT, cache
+    )
+
+    assert document["conclusions"] == "Done."
+    assert document["summary"] == summary()["summary"]
+    assert client.requests == ["CHUNK\nMISSING: conclusions"]
+    assert json.loads(cache.get(key)) == document
+    cache.close()
+
+
+@pytest.mark.parametrize("content", ["not JSON", "[]", '{"topics": 3}'])
+def test_unusable_cached_summaries_are_evicted_and_requested_again(
+    validator, tmp_path, content
+):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    key = cache_key("model", "system", "CHUNK", 0.5, 1000)
+    cache.put(key, "model", content)
+    client = StreamingClient([(json.dumps(summary()), "stop")])
+
+    document = generate_valid_summary(
+        client, "system", "CHUNK", "model", validator, REPAIR_PROMPT, cache
+    )
+
+    assert document == validator.ordered(summary())
+    assert client.requests == ["CHUNK"]
+    assert json.loads(cache.get(key)) == document
+    cache.close()
+
+
+def test_streamed_usage_settles_the_rate_limited_client(validator):
+    text = json.dumps(summary())
+    client = RateLimitedClient(
+        StreamingClient([(text, "stop")]),
+        {"model": {"requests_per_minute": 10, "tokens_per_minute": 100_000}},
+    )
+
+    generate_valid_summary(
+        client, "system", "CHUNK" * 40, "model", validator, REPAIR_PROMPT
+    )
+
+    report = client.report()["model"]
+    assert report["requests"] == 1
+    assert report["prompt_tokens"] == 50
+    assert report["completion_tokens"] == len(text) // 4
+    assert report["tokens_per_minute"] > 0
+    (reservation,) = client.limiters["model"]._window
+    assert reservation[1] == 50 + len(text) // 4
+
+
+def test_request_summary_validates_with_structured_output():
+    config = {
+        "schema": SCHEMA,
+        "prompts": {"user_repair": REPAIR_PROMPT},
+        "structured_output": {"streaming": True, "max_repairs": 1},
+    }
+    text = json.dumps(summary())
+    client = StreamingClient(
+        [
+            (text[: text.index('"conclusions"')], "length"),
+            (json.dumps({"conclusions": "Done."}), "stop"),
+        ]
+    )
+
+    result = request_summary(client, config, "system", "CHUNK", "model")
+
+    assert result["conclusions"] == "Done."
+    assert len(client.requests) == 2
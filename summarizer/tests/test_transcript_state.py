@@ -0,0 +1,153 @@
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+import transcript_state
+from blob_storage import LocalStorage
+from transcript_state import TranscriptState
+from utils import find_unsummarized_transcripts
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = TranscriptState(str(tmp_path / "state.sqlite3"))
+    yield state
+    state.close()
+
+
+@pytest.fixture
+def transcripts(tmp_path):
+    directory = tmp_path / "transcripts"
+    directory.mkdir()
+    for name in ["ep1", "ep2", "ep3"]:
+        (directory / f"{name}.txt").write_text(f"Transcript of {name}")
+    (directory / "notes.md").write_text("not a transcript")
+    return directory
+
+
+def names(paths):
+    return [os.path.splitext(os.path.basename(path))[0] for path in paths]
+
+
+def test_new_transcripts_are_pending_and_summarized_ones_adopted(state, transcripts):
+    assert names(state.pending(str(transcripts), {"ep2": "1"})) == ["ep1", "ep3"]
+    assert names(state.pending(str(transcripts), {"ep1": "5", "ep2": "1"})) == ["ep3"]
+
+
+def test_modified_transcripts_are_queued_again(state, transcripts):
+    summaries = {"ep1": "1", "ep2": "1", "ep3": "1"}
+    assert state.claim(str(transcripts), summaries) == []
+
+    (transcripts / "ep2.txt").write_text("Corrected transcript of ep2")
+    assert names(state.claim(str(transcripts), summaries)) == ["ep2"]
+    assert names(state.claim(str(transcripts), summaries)) == ["ep2"]
+
+    summaries["ep2"] = "2"
+    assert state.claim(str(transcripts), summaries) == []
+
+
+def test_pending_does_not_write_the_state(state, transcripts):
+    summaries = {"ep1": "1", "ep2": "1", "ep3": "1"}
+    state.claim(str(transcripts), summaries)
+    (transcripts / "ep2.txt").write_text("Corrected transcript of ep2")
+    changes = state._db.total_changes
+
+    assert names(state.pending(str(transcripts), summaries)) == ["ep2"]
+    assert names(state.pending(str(transcripts), {"ep1": "1"})) == ["ep2", "ep3"]
+    assert state._db.total_changes == changes
+
+    # The summary is attributed to the corrected transcript once it was queued
+    assert names(state.claim(str(transcripts), summaries)) == ["ep2"]
+    assert state.claim(str(transcripts), {**summaries, "ep2": "2"}) == []
+
+
+def test_touched_transcripts_are_rehashed_but_not_queued(state, transcripts):
+    summaries = {"ep1": "1", "ep2": "1", "ep3": "1"}
+    state.claim(str(transcripts), summaries)
+    os.utime(transcripts / "ep1.txt", ns=(10**18, 10**18))
+
+    with patch.object(
+        transcript_state, "file_hash", wraps=transcript_state.file_hash
+    ) as file_hash:
+        assert state.claim(str(transcripts), summaries) == []
+
+    file_hash.assert_called_once_with(str(transcripts / "ep1.txt"))
+
+
+def test_deleted_summaries_and_transcripts(state, transcripts):
+    state.claim(str(transcripts), {"ep1": "1", "ep2": "1", "ep3": "1"})
+    os.remove(transcripts / "ep3.txt")
+
+    assert names(state.claim(str(transcripts), {"ep1": "1"})) == ["ep2"]
+    rows = state._db.execute("SELECT name FROM transcripts ORDER BY name").fetchall()
+    assert rows == [("ep1",), ("ep2",)]
+
+
+@patch("utils.GCSStorage")
+def test_find_unsummarized_transcripts_with_state(GCSStorage, tmp_path, state):
+    bucket = LocalStorage(str(tmp_path / "bucket"))
+    bucket.upload_text("summaries/ep1.json", "{}")
+    GCSStorage.return_value = bucket
+    directory = tmp_path / "transcripts"
+    directory.mkdir()
+    for name in ["ep1", "ep2"]:
+        (directory / f"{name}.txt").write_text(name)
+
+    paths = find_unsummarized_transcripts(str(directory), "bucket", "summaries/", state)
+
+    assert paths == [str(directory / "ep2.txt")]
+
+
+def test_summaries_are_only_listed_again_once_the_manifest_changed(tmp_path, state):
+    bucket = LocalStorage(str(tmp_path / "bucket"))
+    bucket.upload_text("summaries/ep1.json", "{}")
+    bucket.upload_text("manifest.jsonl", "ep1")
+    directory = tmp_path / "transcripts"
+    directory.mkdir()
+    for name in ["ep1", "ep2", "ep3"]:
+        (directory / f"{name}.txt").write_text(name)
+
+    def find(claim=True):
+        with patch.object(
+            bucket, "list_generations", wraps=bucket.list_generations
+        ) as list_generations, patch("utils.GCSStorage", return_value=bucket):
+            paths = find_unsummarized_transcripts(
+                str(directory), "bucket", "summaries/", state, "manifest.jsonl", claim
+            )
+        return names(paths), list_generations.call_count
+
+    assert find(claim=False) == (["ep2", "ep3"], 1)
+    assert find() == (["ep2", "ep3"], 1)
+    assert find() == (["ep2", "ep3"], 0)
+    assert find(claim=False) == (["ep2", "ep3"], 0)
+
+    bucket.upload_text("summaries/ep2.json", "{}")
+    os.utime(tmp_path / "bucket" / "manifest.jsonl", ns=(10**18, 10**18))
+    assert find() == (["ep3"], 1)
+    assert find() == (["ep3"], 0)
+
+
+def test_rescans_of_large_directories_only_stat(tmp_path, state):
+    directory = tmp_path / "transcripts"
+    directory.mkdir()
+    count = 100_000
+    for i in range(count):
+        (directory / f"ep{i}.txt").write_text(f"Transcript {i}")
+    summaries = {f"ep{i}": "1" for i in range(count) if i % 10}
+
+    assert len(state.claim(str(directory), summaries)) == count // 10
+
+    (directory / "ep1.txt").write_text("Edited transcript")
+    with patch.object(
+        transcript_state, "file_hash", wraps=transcript_state.file_hash
+    ) as file_hash:
+        start = time.perf_counter()
+        pending = state.pending(str(directory), summaries)
+        elapsed = time.perf_counter() - start
+
+    assert len(pending) == count // 10 + 1
+    assert str(directory / "ep1.txt") in pending
+    assert file_hash.call_count == 1
+    assert elapsed < 5
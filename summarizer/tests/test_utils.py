@@ -0,0 +1,176 @@
+import hashlib
+import io
+import random
+import tracemalloc
+
+import pytest
+
+from process import chunk_transcript
+from utils import (
+    dedupe_summary,
+    open_text,
+    split_transcript,
+    split_transcript_stream,
+    split_transcript_tokens,
+)
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def make_transcript(turns=200, words=30):
+    speakers = ["Dwarkesh Patel", "Ilya Sutskever"]
+    return "".join(
+        f"{speakers[turn % 2]}: " + "word " * words + "end.\n" for turn in range(turns)
+    )
+
+
+@pytest.mark.parametrize("max_tokens", [40, 100, 1000])
+def test_token_chunks_cover_transcript_within_budget(max_tokens):
+    transcript = make_transcript()
+
+    chunks = split_transcript_tokens(transcript, max_tokens, count_words)
+
+    assert "".join(chunks) == transcript
+    assert all(count_words(chunk) <= max_tokens for chunk in chunks)
+
+
+def test_token_chunks_end_at_speaker_turns():
+    chunks = split_transcript_tokens(make_transcript(), 100, count_words)
+
+    assert len(chunks) > 1
+    assert all(
+        chunk.split(":")[0] in {"Dwarkesh Patel", "Ilya Sutskever"} for chunk in chunks
+    )
+    assert all(chunk.endswith("end.\n") for chunk in chunks)
+
+
+def test_token_chunks_end_at_paragraph_breaks():
+    transcript = "\n\n".join("word " * 10 + "end." for _ in range(10))
+
+    chunks = split_transcript_tokens(transcript, 25, count_words)
+
+    assert "".join(chunks) == transcript
+    assert [count_words(chunk) for chunk in chunks] == [22, 22, 22, 22, 22]
+
+
+def test_oversized_segment_falls_back_to_words():
+    transcript = "word " * 95
+
+    chunks = split_transcript_tokens(transcript, 20, count_words)
+
+    assert "".join(chunks) == transcript
+    assert [count_words(chunk) for chunk in chunks] == [20, 20, 20, 20, 15]
+
+
+def test_token_chunks_overlap():
+    chunks = split_transcript_tokens(
+        make_transcript(turns=20), 100, count_words, overlap_tokens=40
+    )
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        overlap = chunk.split("\n")[0] + "\n"
+        assert previous.endswith(overlap)
+        assert count_words(chunk) <= 100
+
+
+def test_empty_transcript_has_no_chunks():
+    assert split_transcript_tokens("", 100, count_words) == []
+
+
+def test_chunk_transcript_selects_the_splitter(tmp_path):
+    transcript = make_transcript(turns=3000)
+    path = tmp_path / "podcast_240101.txt"
+    path.write_text(transcript, encoding="utf-8")
+    config = {
+        "models": {"chunk": "chunk-model"},
+        "chunking": {
+            "mode": "tokens",
+            "max_tokens": {"chunk-model": 10**6},
+            "overlap_tokens": 0,
+        },
+    }
+
+    assert list(chunk_transcript(str(path), {})) == split_transcript(transcript)
+    assert list(chunk_transcript(str(path), config)) == [transcript]
+
+
+class TrickleStream(io.StringIO):
+    """Text stream that returns at most a few characters per read"""
+
+    def __init__(self, text, seed=0):
+        super().__init__(text)
+        self.rng = random.Random(seed)
+
+    def read(self, size=-1):
+        return super().read(min(size, self.rng.randint(1, 7)))
+
+
+def random_text(rng, length):
+    pieces = ["word", "a", " ", ". ", "\n\n", "\n", "Ilya Sutskever: "]
+    return "".join(rng.choice(pieces) for _ in range(length))
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_stream_splitter_matches_split_transcript(seed):
+    rng = random.Random(seed)
+    transcript = random_text(rng, rng.randint(0, 300))
+    max_chars = rng.randint(1, 80)
+
+    chunks = list(split_transcript_stream(TrickleStream(transcript, seed), max_chars))
+
+    assert chunks == split_transcript(transcript, max_chars)
+
+
+def test_stream_splitter_matches_on_a_long_transcript():
+    transcript = make_transcript(turns=100_000)
+
+    chunks = list(split_transcript_stream(io.StringIO(transcript)))
+
+    assert chunks == split_transcript(transcript)
+
+
+def test_stream_splitter_memory_is_bounded_by_chunk_size(tmp_path):
+    # 256 MiB transcript written block by block
+    block = make_transcript(turns=4096)
+    blocks = 256 * 1024 * 1024 // len(block) + 1
+    path = tmp_path / "long_podcast_240101.txt"
+    expected = hashlib.sha256()
+    with open(path, "w", encoding="utf-8") as file:
+        for _ in range(blocks):
+            file.write(block)
+            expected.update(block.encode("utf-8"))
+
+    digest = hashlib.sha256()
+    longest = 0
+    tracemalloc.start()
+    with open_text(str(path)) as stream:
+        for chunk in split_transcript_stream(stream):
+            digest.update(chunk.encode("utf-8"))
+            longest = max(longest, len(chunk))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert digest.hexdigest() == expected.hexdigest()
+    assert longest <= 56000 + 1000
+    assert peak < 2 * 1024 * 1024
+
+
+def test_dedupe_summary_keeps_first_occurrences():
+    summary = {
+        "topics": ["Scaling laws", "AGI", "scaling  Laws", "agi"],
+        "quotes": [
+            {"quote": "It works.", "speaker": "Ilya Sutskever"},
+            {"quote": "it works.", "speaker": "Dwarkesh Patel"},
+        ],
+        "terms": {"RLHF": "first", "rlhf": "second", "AGI": "third"},
+        "recommendations": ["Read more.", "Read more."],
+    }
+
+    deduped = dedupe_summary(summary)
+
+    assert deduped["topics"] == ["Scaling laws", "AGI"]
+    assert deduped["quotes"] == [{"quote": "It works.", "speaker": "Ilya Sutskever"}]
+    assert deduped["terms"] == {"RLHF": "first", "AGI": "third"}
+    assert deduped["recommendations"] == ["Read more."]
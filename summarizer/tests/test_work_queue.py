@@ -0,0 +1,219 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+
+from blob_storage import LocalStorage
+from process import process_queue
+from work_queue import SQLiteWorkQueue, run_worker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = SQLiteWorkQueue(
+        str(tmp_path / "queue.sqlite3"), lease_seconds=60, max_attempts=2, clock=clock
+    )
+    yield queue
+    queue.close()
+
+
+def tasks(*names, digest="hash"):
+    return [(name, f"/transcripts/{name}.txt", digest) for name in names]
+
+
+def test_transcripts_are_leased_once(queue):
+    assert queue.enqueue(tasks("ep1", "ep2")) == 2
+
+    first, second = queue.claim("a"), queue.claim("b")
+
+    assert (first.episode_id, second.episode_id) == ("ep1", "ep2")
+    assert queue.claim("c") is None
+    assert queue.complete(first)
+    assert queue.counts() == {"pending": 0, "leased": 1, "done": 1, "failed": 0}
+
+
+def test_expired_lease_is_taken_over(queue, clock):
+    queue.enqueue(tasks("ep1"))
+    stalled = queue.claim("a")
+
+    clock.now += 30
+    assert queue.heartbeat(stalled)
+    clock.now += 61
+    taken_over = queue.claim("b")
+
+    assert taken_over.episode_id == "ep1" and taken_over.attempts == 2
+    assert not queue.heartbeat(stalled)
+    assert not queue.complete(stalled)
+    assert queue.complete(taken_over)
+
+
+def test_failures_are_retried_until_out_of_attempts(queue, clock):
+    queue.enqueue(tasks("ep1"))
+
+    assert queue.fail(queue.claim("a"), "boom")
+    lease = queue.claim("a")
+    clock.now += 61
+
+    assert queue.claim("b") is None
+    assert queue.counts()["failed"] == 1
+    assert not queue.complete(lease)
+
+
+def test_only_changed_or_failed_transcripts_are_queued_again(queue):
+    queue.enqueue(tasks("ep1", "ep2"))
+    queue.complete(queue.claim("a"))
+    lease = queue.claim("a")
+    queue.fail(lease, "boom")
+    queue.fail(queue.claim("a"), "boom")
+
+    assert queue.enqueue(tasks("ep1", "ep2")) == 1
+    assert queue.claim("a").episode_id == "ep2"
+    assert queue.enqueue(tasks("ep1", digest="changed")) == 1
+    assert queue.claim("a").episode_id == "ep1"
+
+
+def test_workers_share_the_queue(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    SQLiteWorkQueue(path).enqueue(tasks(*[f"ep{i}" for i in range(20)]))
+    handled = []
+
+    def work(name):
+        queue = SQLiteWorkQueue(path)
+        run_worker(
+            queue,
+            lambda lease, heartbeat: handled.append(lease.episode_id),
+            name,
+            poll_seconds=0.01,
+        )
+        queue.close()
+
+    threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(handled) == sorted(f"ep{i}" for i in range(20))
+
+
+def test_idle_worker_waits_for_leases_held_elsewhere(queue, clock):
+    queue.enqueue(tasks("ep1"))
+    queue.claim("crashed")
+
+    def sleep(seconds):
+        clock.now += seconds
+
+    handle = Mock()
+    assert run_worker(queue, handle, "b", poll_seconds=30, sleep=sleep) == 1
+    assert handle.call_args.args[0].attempts == 2
+
+
+def test_handler_errors_return_the_transcript_to_the_queue(queue):
+    queue.enqueue(tasks("ep1"))
+    handle = Mock(side_effect=[RuntimeError("boom"), None])
+
+    assert run_worker(queue, handle, "a") == 1
+    assert handle.call_count == 2
+
+
+def summary(text):
+    return {
+        "metadata": {},
+        "summary": text,
+        "topics": [],
+        "quotes": [],
+        "terms": {},
+        "recommendations": [],
+        "conclusions": text,
+    }
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        "prompts": {"user_chunk": "{content}", "user_combined": "COMBINE {content}"},
+        "models": {"chunk": "chunk-model", "combined": "combined-model"},
+        "paths": {
+            "bucket_name": "bucket",
+            "summaries": "summaries/",
+            "manifest": "manifest.jsonl",
+            "entities": "entities.json",
+        },
+        "queue": {"heartbeat_seconds": 60, "poll_seconds": 0.01},
+    }
+
+
+def run_queue(tmp_path, config, queue, generate_summary):
+    bucket = LocalStorage(str(tmp_path / "bucket"))
+
+    def write_json_to_gcs(content, bucket_name, file_path, if_generation_match):
+        bucket.upload_text(file_path, json.dumps(content), if_generation_match)
+        return SimpleNamespace(generation=bucket.generation(file_path), size=1)
+
+    with patch("process.GCSStorage", lambda bucket_name: bucket), patch(
+        "process.write_json_to_gcs", write_json_to_gcs
+    ), patch("process.update_manifest") as update_manifest, patch(
+        "process.update_entities"
+    ), patch("process.generate_summary", side_effect=generate_summary):
+        completed = process_queue(Mock(), config, "system", queue, "worker", workers=3)
+    return bucket, completed, update_manifest
+
+
+def test_process_queue_writes_every_summary_once(tmp_path, config, queue):
+    paths = []
+    for index in range(5):
+        path = tmp_path / f"podcast_{index}.txt"
+        path.write_text(f"Transcript {index}")
+        paths.append(str(path))
+    queue.enqueue((f"podcast_{i}", path, "hash") for i, path in enumerate(paths))
+
+    def generate_summary(client, system_prompt, user_prompt, model, cache=None):
+        time.sleep(0.01)
+        return json.dumps(summary(user_prompt))
+
+    bucket, completed, update_manifest = run_queue(
+        tmp_path, config, queue, generate_summary
+    )
+
+    assert completed == 5
+    assert bucket.list_names("summaries/") == [
+        f"summaries/podcast_{i}.json" for i in range(5)
+    ]
+    assert update_manifest.call_count == 5
+    assert queue.counts()["done"] == 5
+
+
+def test_summary_written_by_another_worker_is_kept(tmp_path, config, queue):
+    path = tmp_path / "podcast_0.txt"
+    path.write_text("Transcript")
+    queue.enqueue([("podcast_0", str(path), "hash")])
+    other = LocalStorage(str(tmp_path / "bucket"))
+
+    def generate_summary(client, system_prompt, user_prompt, model, cache=None):
+        # A worker whose lease expired finishes while this one is working
+        other.upload_text("summaries/podcast_0.json", '"other"')
+        return json.dumps(summary("mine"))
+
+    bucket, completed, update_manifest = run_queue(
+        tmp_path, config, queue, generate_summary
+    )
+
+    assert completed == 1
+    assert bucket.download_text("summaries/podcast_0.json") == '"other"'
+    update_manifest.assert_not_called()
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+def file_hash(path: str) -> str:
+    """Hash a file's content in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptState:
+    """Local SQLite record of every transcript and the summary it produced.
+
+    Each transcript is stored with its size, modification time and content
+    hash, the hash it had when its summary was written and that summary's
+    generation. A scan only stats the transcript directory and hashes files
+    whose size or modification time changed, then compares the result with
+    the summary generations. The last listing of those is kept with the
+    manifest generation it was taken at, so it is only repeated once the
+    manifest changed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS transcripts (
+                name TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                hash TEXT,
+                summarized_hash TEXT,
+                summary_generation TEXT,
+                queued_hash TEXT
+            );
+            CREATE TABLE IF NOT EXISTS summaries (
+                name TEXT PRIMARY KEY,
+                generation TEXT
+            );
+            CREATE TABLE IF NOT EXISTS listing (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                manifest_generation TEXT
+            );
+            """
+        )
+        self._db.commit()
+
+    def summary_generations(
+        self, manifest_generation: Optional[str]
+    ) -> Optional[Dict[str, str]]:
+        """Return the stored summary listing if it was taken at this manifest
+        generation, otherwise None."""
+        if manifest_generation is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT manifest_generation FROM listing WHERE id = 0"
+            ).fetchone()
+            if row is None or row[0] != manifest_generation:
+                return None
+            return dict(self._db.execute("SELECT name, generation FROM summaries"))
+
+    def pending(
+        self,
+        transcripts_dir: str,
+        summary_generations: Dict[str, str],
+        file_type: str = "txt",
+    ) -> List[str]:
+        """Return the paths of new and modified transcripts, sorted.
+
+        ``summary_generations`` maps the names of summarized episodes to the
+        generation of their summary. A transcript is pending when it has no
+        summary or its content changed since the summary was written.
+        Transcripts that are summarized but were never seen before count as
+        up to date. Nothing is written, so this only answers the question;
+        ``claim`` records the answer.
+        """
+        pending, _, _ = self._scan(transcripts_dir, summary_generations, file_type)
+        return pending
+
+    def claim(
+        self,
+        transcripts_dir: str,
+        summary_generations: Dict[str, str],
+        file_type: str = "txt",
+        manifest_generation: Optional[str] = None,
+    ) -> List[str]:
+        """Return the pending transcripts like ``pending`` and mark them queued.
+
+        A summary that appears or changes after a transcript was queued is
+        attributed to the content the transcript had when it was queued. With
+        a ``manifest_generation`` the summary listing is stored with it, for
+        ``summary_generations`` to return until the manifest changes.
+        """
+        pending, updates, removed = self._scan(
+            transcripts_dir, summary_generations, file_type
+        )
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                updates,
+            )
+            self._db.executemany("DELETE FROM transcripts WHERE name = ?", removed)
+            if manifest_generation is not None:
+                stored = self._db.execute(
+                    "SELECT manifest_generation FROM listing WHERE id = 0"
+                ).fetchone()
+                if stored is None or stored[0] != manifest_generation:
+                    self._db.execute("DELETE FROM summaries")
+                    self._db.executemany(
+                        "INSERT INTO summaries VALUES (?, ?)",
+                        summary_generations.items(),
+                    )
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO listing VALUES (0, ?)",
+                        (manifest_generation,),
+                    )
+            self._db.commit()
+        return pending
+
+    def _scan(
+        self,
+        transcripts_dir: str,
+        summary_generations: Dict[str, str],
+        file_type: str,
+    ) -> Tuple[List[str], List[tuple], List[tuple]]:
+        """Compare the directory with the stored rows, returning the pending
+        paths, the rows to write once they are claimed and the rows to drop."""
+        suffix = f".{file_type}"
+        with self._lock:
+            rows = {
+                row[0]: row[1:] for row in self._db.execute("SELECT * FROM transcripts")
+            }
+
+        updates, pending = [], []
+        seen = set()
+        missing = (None,) * 6
+        with os.scandir(transcripts_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.endswith(suffix) or not entry.is_file():
+                    continue
+                name = name[: -len(suffix)]
+                seen.add(name)
+                stat = entry.stat()
+                row = rows.get(name, missing)
+                size, mtime_ns, digest, summarized, generation, queued = row
+                summary_generation = summary_generations.get(name)
+                if (
+                    size == stat.st_size
+                    and mtime_ns == stat.st_mtime_ns
+                    and summary_generation == generation
+                ):
+                    # Unchanged since the last scan: the row holds the answer
+                    if summarized != digest:
+                        pending.append(entry.path)
+                        if queued != digest:
+                            updates.append((name, *row[:5], digest))
+                    continue
+
+                if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                    digest = file_hash(entry.path)
+                if summary_generation is not None and summary_generation != generation:
+                    # A summary was written or rewritten since the last scan
+                    summarized = queued or summarized or digest
+                    generation, queued = summary_generation, None
+                elif summary_generation is None:
+                    summarized, generation = None, None
+
+                if summarized != digest:
+                    pending.append(entry.path)
+                    queued = digest
+
+                new_row = (
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    digest,
+                    summarized,
+                    generation,
+                    queued,
+                )
+                if new_row != row:
+                    updates.append((name, *new_row))
+
+        removed = [(name,) for name in rows.keys() - seen]
+        pending.sort()
+        return pending, updates, removed
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,11 +1,17 @@
 import json
 import os
-from typing import Any, Dict, List
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
 
 import yaml
 from google.cloud import storage
 from openai import OpenAI
 
+from blob_storage import GCSStorage, gcs_client
+from instrumentation import timed
+from llm_cache import ResponseCache, cache_key
+from transcript_state import TranscriptState
+
 
 def list_files(directory_path: str, file_type: str = "txt") -> List[str]:
     """Retrieve and return a sorted list of filenames in a specified directory that match a given file extension."""
@@ -19,15 +25,45 @@ def list_files(directory_path: str, file_type: str = "txt") -> List[str]:
 
 def list_files_gcs(bucket_name: str, prefix: str) -> List[str]:
     """List all files in a GCS bucket folder specified by prefix."""
-    storage_client = storage.Client()
-    blobs = storage_client.list_blobs(bucket_name, prefix=prefix)
-    files = [blob.name for blob in blobs]
-    return files
+    return GCSStorage(bucket_name).list_names(prefix)
 
 
 def find_unsummarized_transcripts(
-    transcripts_dir: str, bucket_name: str, gcs_summary_folder: str
+    transcripts_dir: str,
+    bucket_name: str,
+    gcs_summary_folder: str,
+    state: Optional[TranscriptState] = None,
+    manifest: Optional[str] = None,
+    claim: bool = True,
 ) -> List[str]:
+    """Return the transcripts that need a summary.
+
+    With a ``state`` store, transcripts that changed since their summary was
+    written are returned too, and only changed files are read. With the name
+    of the ``manifest``, which changes with every summary written, the
+    summaries are only listed when it changed since the last claim. Unless
+    ``claim`` is set the state is not written.
+    """
+    if state is not None:
+        gcs = GCSStorage(bucket_name)
+        manifest_generation = None
+        if manifest:
+            generation = gcs.generation(manifest)
+            manifest_generation = None if generation is None else str(generation)
+        summaries = state.summary_generations(manifest_generation)
+        if summaries is None:
+            generations = gcs.list_generations(gcs_summary_folder)
+            summaries = {
+                os.path.splitext(os.path.basename(name))[0]: generation
+                for name, generation in generations.items()
+                if name.endswith(".json")
+            }
+        if claim:
+            return state.claim(
+                transcripts_dir, summaries, manifest_generation=manifest_generation
+            )
+        return state.pending(transcripts_dir, summaries)
+
     transcript_files = list_files(transcripts_dir, "txt")
     summary_files = list_files_gcs(bucket_name, prefix=gcs_summary_folder)
 
@@ -67,15 +103,21 @@ def read_text(file_path: str) -> str:
         return file.read()
 
 
-def write_json_to_gcs(content: Any, bucket_name: str, file_path: str):
-    """Writes the provided content to a JSON file in Google Cloud Storage."""
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(file_path)
+def write_json_to_gcs(
+    content: Any,
+    bucket_name: str,
+    file_path: str,
+    if_generation_match: Optional[int] = None,
+) -> storage.Blob:
+    """Writes the provided content to a JSON file in Google Cloud Storage and returns the blob.
 
+    With ``if_generation_match`` the write fails with ``PreconditionFailed``
+    unless the file is still at that generation (0 if it must not exist).
+    """
     json_content = json.dumps(content, ensure_ascii=False, indent=4)
-
-    blob.upload_from_string(json_content, content_type="application/json")
+    return GCSStorage(bucket_name).upload_text(
+        file_path, json_content, if_generation_match=if_generation_match
+    )
 
 
 def split_transcript(transcript: str, max_chars: int = 56000) -> list:
@@ -105,21 +147,215 @@ def split_transcript(transcript: str, max_chars: int = 56000) -> list:
     return chunks
 
 
-def generate_summary(
-    client: OpenAI, system_prompt: str, user_prompt: str, model: str
-) -> str:
-    """Generates a summary based on system and user prompts using the specified OpenAI model."""
-    response = client.chat.completions.create(
-        model=model,
-        response_format={"type": "json_object"},
-        messages=[
+def open_text(path: str) -> TextIO:
+    """Open a local file or a ``gs://bucket/name`` object for streaming text reads."""
+    if path.startswith("gs://"):
+        bucket_name, _, blob_name = path[len("gs://") :].partition("/")
+        blob = gcs_client().bucket(bucket_name).blob(blob_name)
+        return blob.open("rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def split_transcript_stream(stream: TextIO, max_chars: int = 56000) -> Iterator[str]:
+    """Yield the chunks of ``split_transcript`` while reading a text stream.
+
+    Only the next ``max_chars`` plus the look-ahead buffer are held in
+    memory, so the peak stays bounded by the chunk size however large the
+    transcript is. The chunks are identical to those of ``split_transcript``
+    for the same text.
+    """
+    delimiters = ["\n\n", ". ", " "]
+    buffer_size = min(1000, int(max_chars * 0.1))
+    window = max_chars + buffer_size
+
+    pending = ""
+    eof = False
+    while True:
+        # One character past the window tells whether the chunk is the last one
+        if not eof and len(pending) <= window:
+            parts = [pending]
+            missing = window + 1 - len(pending)
+            while missing > 0:
+                part = stream.read(missing)
+                if not part:
+                    eof = True
+                    break
+                parts.append(part)
+                missing -= len(part)
+            pending = "".join(parts)
+
+        if not pending:
+            return
+        end = max_chars
+        if end < len(pending):
+            for delimiter in delimiters:
+                split_index = pending.rfind(delimiter, 0, window)
+                if split_index != -1:
+                    end = split_index + 1 if delimiter == " " else split_index + 2
+                    break
+        yield pending[:end]
+        pending = pending[end:]
+
+
+# Paragraph breaks and new lines that open a speaker turn ("Name: ...")
+SEGMENT_BOUNDARY = re.compile(r"\n\s*\n|\n(?=[^\n:]{1,40}:\s)")
+# Finer boundaries for segments that exceed the token budget on their own
+FALLBACK_BOUNDARIES = [re.compile(r"(?<=[.!?])\s+"), re.compile(r"\s+")]
+
+
+def token_counter(model: str) -> Callable[[str], int]:
+    """Return a function that counts the tokens of a text for the given model.
+
+    The model's tiktoken encoding is used when it is available; otherwise the
+    count is estimated as four bytes of UTF-8 per token.
+    """
+    try:
+        import tiktoken
+
+        encoding = tiktoken.encoding_for_model(model)
+    except Exception as exc:
+        print(f"Estimating token counts for {model}: {exc}")
+        return lambda text: (len(text.encode("utf-8")) + 3) // 4
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def _split_after(text: str, pattern: re.Pattern) -> List[str]:
+    """Split text after every match of a pattern, keeping all characters."""
+    pieces, start = [], 0
+    for match in pattern.finditer(text):
+        if match.end() > start:
+            pieces.append(text[start : match.end()])
+            start = match.end()
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+def _fit_segment(
+    segment: str,
+    tokens: int,
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+    level: int = 0,
+) -> Iterator[Tuple[str, int]]:
+    """Break a segment at sentence, then word boundaries until it fits."""
+    if tokens <= max_tokens:
+        yield segment, tokens
+    elif level == len(FALLBACK_BOUNDARIES):
+        # No boundary left: cut the text in proportion to its token count
+        size = max(1, len(segment) * max_tokens // tokens)
+        for start in range(0, len(segment), size):
+            piece = segment[start : start + size]
+            yield piece, count_tokens(piece)
+    else:
+        for piece in _split_after(segment, FALLBACK_BOUNDARIES[level]):
+            yield from _fit_segment(
+                piece, count_tokens(piece), max_tokens, count_tokens, level + 1
+            )
+
+
+def split_transcript_tokens(
+    transcript: str,
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+    overlap_tokens: int = 0,
+) -> List[str]:
+    """Split a transcript into chunks of at most ``max_tokens`` tokens.
+
+    Chunks end at paragraph breaks or speaker turns, and only fall back to
+    sentence and word boundaries for a segment longer than the budget. Each
+    segment is tokenized once in a single pass over the transcript. With
+    ``overlap_tokens``, every chunk starts with the trailing segments of the
+    previous one, up to that many tokens.
+    """
+    chunks = []
+    current: List[Tuple[str, int]] = []
+    current_tokens = 0
+    carried = 0
+
+    for segment in _split_after(transcript, SEGMENT_BOUNDARY):
+        for piece, tokens in _fit_segment(
+            segment, count_tokens(segment), max_tokens, count_tokens
+        ):
+            if current_tokens + tokens > max_tokens and len(current) > carried:
+                chunks.append("".join(text for text, _ in current))
+                overlap: List[Tuple[str, int]] = []
+                overlap_total = 0
+                for text, text_tokens in reversed(current):
+                    if overlap_total + text_tokens > overlap_tokens:
+                        break
+                    overlap.insert(0, (text, text_tokens))
+                    overlap_total += text_tokens
+                if overlap_total + tokens > max_tokens:
+                    overlap, overlap_total = [], 0
+                current, current_tokens, carried = overlap, overlap_total, len(overlap)
+            current.append((piece, tokens))
+            current_tokens += tokens
+
+    if len(current) > carried:
+        chunks.append("".join(text for text, _ in current))
+    return chunks
+
+
+def summary_request(
+    system_prompt: str,
+    user_prompt: str,
+    model: str,
+    temperature: float = 0.5,
+    max_tokens: int = 1000,
+) -> Dict[str, Any]:
+    """Build the chat completion request body used for every summary."""
+    return {
+        "model": model,
+        "response_format": {"type": "json_object"},
+        "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
-        temperature=0.5,
-        max_tokens=1000,
-    )
-    return response.choices[0].message.content
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+
+def generate_summary(
+    client: OpenAI,
+    system_prompt: str,
+    user_prompt: str,
+    model: str,
+    cache: Optional[ResponseCache] = None,
+    temperature: float = 0.5,
+    max_tokens: int = 1000,
+) -> str:
+    """Generates a summary based on system and user prompts using the specified OpenAI model.
+
+    When a cache is given, a response for the same model, prompts and sampling
+    parameters is returned from it instead of calling the API. Each call is
+    recorded as an ``llm`` stage with its latency and token usage.
+    """
+    with timed("llm", model=model, cached=False) as event:
+        if cache is not None:
+            key = cache_key(model, system_prompt, user_prompt, temperature, max_tokens)
+            content = cache.get(key)
+            if content is not None:
+                event["cached"] = True
+                return content
+
+        response = client.chat.completions.create(
+            **summary_request(
+                system_prompt, user_prompt, model, temperature, max_tokens
+            )
+        )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            event["prompt_tokens"] = usage.prompt_tokens
+            event["completion_tokens"] = usage.completion_tokens
+    choice = response.choices[0]
+    content = choice.message.content
+
+    # Truncated completions are not cached so that a rerun requests them again
+    if cache is not None and getattr(choice, "finish_reason", "stop") == "stop":
+        cache.put(key, model, content)
+    return content
 
 
 def combine_summaries(chunk_summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -151,6 +387,43 @@ def combine_summaries(chunk_summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
     return combined_sum
 
 
+def _normalize_text(text: str) -> str:
+    return " ".join(str(text).split()).casefold()
+
+
+def dedupe_summary(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop repeated topics, quotes, recommendations and terms from a summary.
+
+    Entries are compared case-insensitively with whitespace collapsed, and the
+    first occurrence is kept so that the result does not depend on anything
+    but the input order.
+    """
+    keys = {
+        "topics": lambda topic: topic,
+        "quotes": lambda quote: quote.get("quote", "")
+        if isinstance(quote, dict)
+        else quote,
+        "recommendations": lambda recommendation: recommendation,
+    }
+    for key, text_of in keys.items():
+        seen, unique = set(), []
+        for item in summary.get(key, []):
+            normalized = _normalize_text(text_of(item))
+            if normalized not in seen:
+                seen.add(normalized)
+                unique.append(item)
+        summary[key] = unique
+
+    seen, terms = set(), {}
+    for term, description in summary.get("terms", {}).items():
+        normalized = _normalize_text(term)
+        if normalized not in seen:
+            seen.add(normalized)
+            terms[term] = description
+    summary["terms"] = terms
+    return summary
+
+
 def get_metadata_from_path(transcript_path: str) -> Dict[str, str]:
     """Extract the "id" and "podcast" metadata from the transcript file path."""
     transcript_filename = os.path.basename(transcript_path)
@@ -0,0 +1,274 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# States a task moves through; "leased" tasks whose lease expired are
+# claimed again like pending ones
+STATES = ("pending", "leased", "done", "failed")
+
+
+class LeaseLost(RuntimeError):
+    """Raised when a worker's lease was taken over before it finished."""
+
+
+@dataclass
+class Lease:
+    """A worker's claim on one transcript, valid until ``expires``."""
+
+    episode_id: str
+    transcript_path: str
+    digest: str
+    worker: str
+    token: str
+    attempts: int
+    expires: float
+
+
+class SQLiteWorkQueue:
+    """Work queue of transcripts shared by workers through a SQLite file.
+
+    Workers claim a transcript by taking a lease on it for ``lease_seconds``
+    and renew the lease with heartbeats while they work on it. A worker that
+    crashes or hangs stops renewing, so its transcript is claimed by another
+    worker once the lease expires. Every claim counts as an attempt; a
+    transcript that failed ``max_attempts`` times is marked failed until it
+    is enqueued again.
+
+    Claims are made in an immediate transaction, so any number of processes
+    can share the file as long as its filesystem supports SQLite's locks,
+    which rules out most network filesystems. Other backends implement the
+    same methods.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 3,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                episode_id TEXT PRIMARY KEY,
+                transcript_path TEXT,
+                transcript_hash TEXT,
+                state TEXT,
+                worker TEXT,
+                token TEXT,
+                expires REAL,
+                attempts INTEGER DEFAULT 0,
+                error TEXT,
+                updated REAL
+            );
+            CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, expires);
+            """
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def enqueue(self, tasks: Iterable[Tuple[str, str, str]]) -> int:
+        """Add transcripts as ``(episode_id, path, hash)`` and return how many.
+
+        A transcript already in the queue is only queued again when its hash
+        changed or it failed, so a finished episode is never processed twice.
+        """
+        now = self.clock()
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany(
+                "INSERT INTO tasks (episode_id, transcript_path, transcript_hash, "
+                "state, attempts, updated) VALUES (?, ?, ?, 'pending', 0, ?) "
+                "ON CONFLICT (episode_id) DO UPDATE SET "
+                "transcript_path = excluded.transcript_path, "
+                "transcript_hash = excluded.transcript_hash, state = 'pending', "
+                "worker = NULL, token = NULL, expires = NULL, attempts = 0, "
+                "error = NULL, updated = excluded.updated "
+                "WHERE tasks.transcript_hash != excluded.transcript_hash "
+                "OR tasks.state = 'failed'",
+                [(episode_id, path, digest, now) for episode_id, path, digest in tasks],
+            )
+            return db.total_changes - before
+
+    def claim(self, worker: str) -> Optional[Lease]:
+        """Lease the next pending transcript to a worker, or return None."""
+        now = self.clock()
+        with self._transaction() as db:
+            # Expired leases of transcripts out of attempts are not retried
+            db.execute(
+                "UPDATE tasks SET state = 'failed', token = NULL, "
+                "error = 'lease expired', updated = ? "
+                "WHERE state = 'leased' AND expires <= ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT episode_id, transcript_path, transcript_hash, attempts "
+                "FROM tasks WHERE state = 'pending' "
+                "OR (state = 'leased' AND expires <= ?) "
+                "ORDER BY episode_id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            episode_id, path, digest, attempts = row
+            lease = Lease(
+                episode_id,
+                path,
+                digest,
+                worker,
+                uuid.uuid4().hex,
+                attempts + 1,
+                now + self.lease_seconds,
+            )
+            db.execute(
+                "UPDATE tasks SET state = 'leased', worker = ?, token = ?, "
+                "expires = ?, attempts = ?, updated = ? WHERE episode_id = ?",
+                (worker, lease.token, lease.expires, lease.attempts, now, episode_id),
+            )
+        return lease
+
+    def _update_lease(self, lease: Lease, assignments: str, *values) -> bool:
+        with self._transaction() as db:
+            cursor = db.execute(
+                f"UPDATE tasks SET {assignments}, updated = ? "
+                "WHERE episode_id = ? AND token = ? AND state = 'leased'",
+                (*values, self.clock(), lease.episode_id, lease.token),
+            )
+            return cursor.rowcount == 1
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """Extend a lease and return whether the worker still holds it."""
+        expires = self.clock() + self.lease_seconds
+        if not self._update_lease(lease, "expires = ?", expires):
+            return False
+        lease.expires = expires
+        return True
+
+    def complete(self, lease: Lease) -> bool:
+        """Mark a leased transcript done; False if the lease was lost."""
+        return self._update_lease(
+            lease, "state = 'done', token = NULL, expires = NULL, error = NULL"
+        )
+
+    def fail(self, lease: Lease, error: str) -> bool:
+        """Return a transcript to the queue, or fail it when out of attempts."""
+        return self._update_lease(
+            lease,
+            "state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "token = NULL, expires = NULL, error = ?",
+            self.max_attempts,
+            error,
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of transcripts in every state."""
+        with self._lock:
+            rows = dict(
+                self._db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state")
+            )
+        return {state: rows.get(state, 0) for state in STATES}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class Heartbeat:
+    """Renew a lease every ``interval`` seconds in a background thread.
+
+    ``lost`` is set as soon as a renewal finds that the lease was taken over.
+    """
+
+    def __init__(self, queue: SQLiteWorkQueue, lease: Lease, interval: float):
+        self.queue = queue
+        self.lease = lease
+        self.interval = interval
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"heartbeat-{lease.episode_id}", daemon=True
+        )
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.renew():
+                return
+
+    def renew(self) -> bool:
+        """Renew the lease now and return whether it is still held."""
+        if not self.lost.is_set() and not self.queue.heartbeat(self.lease):
+            self.lost.set()
+        return not self.lost.is_set()
+
+    def __enter__(self) -> "Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(
+    queue: SQLiteWorkQueue,
+    handle: Callable[[Lease, Heartbeat], None],
+    worker: str,
+    heartbeat_seconds: float = 60.0,
+    poll_seconds: float = 10.0,
+    sleep: Callable[[float], None] = time.sleep,
+) -> int:
+    """Claim and handle transcripts until the queue is drained.
+
+    ``handle`` is called with each lease while a heartbeat keeps it alive.
+    A transcript whose handler raises is returned to the queue. While other
+    workers hold leases the worker keeps polling, so that it picks up their
+    transcripts if their leases expire. Returns the number of transcripts the
+    worker completed.
+    """
+    completed = 0
+    while True:
+        lease = queue.claim(worker)
+        if lease is None:
+            if not queue.counts()["leased"]:
+                return completed
+            sleep(poll_seconds)
+            continue
+
+        with Heartbeat(queue, lease, heartbeat_seconds) as heartbeat:
+            try:
+                handle(lease, heartbeat)
+            except LeaseLost:
+                print(f"{worker} lost its lease on {lease.episode_id}.")
+                continue
+            except Exception as error:
+                print(f"{worker} failed on {lease.episode_id}: {error!r}")
+                queue.fail(lease, repr(error))
+                continue
+        if queue.complete(lease):
+            completed += 1